@@ -1,4 +1,8 @@
+import atexit
 import collections
+import glob
+import threading
+import time as pytime
 
 from .util import *
 
@@ -4053,3 +4057,215 @@ class DropoutLayer(object):
             out.append(self.dropout_mask_eval_resample)
 
         return out
+
+
+CHECKPOINT_VERSION = re.compile('-([0-9]+)$')
+
+
+def get_checkpoint_state_filename(path):
+    """
+    Get the name of the state file that points to the current version of the checkpoint at **path** (see ``CheckpointWriter``).
+
+    :param path: ``str``; checkpoint path (e.g. ``'<outdir>/model.ckpt'``).
+    :return: ``str``; name of the state file (relative to the checkpoint directory).
+    """
+
+    return os.path.basename(path) + '.state'
+
+
+def get_checkpoint_path(path):
+    """
+    Resolve a checkpoint path to the prefix of the files of its most recently committed version.
+    Checkpoints written by ``CheckpointWriter`` are stored under versioned prefixes (e.g. ``model.ckpt-3``) and are located through a state file. Checkpoints written by older versions of CDR are stored directly under **path**.
+
+    :param path: ``str``; checkpoint path (e.g. ``'<outdir>/model.ckpt'``).
+    :return: ``str``; prefix to pass to ``Saver.restore()``.
+    """
+
+    dir = os.path.dirname(path)
+    state = tf.train.get_checkpoint_state(dir or '.', latest_filename=get_checkpoint_state_filename(path))
+    if state is not None and state.model_checkpoint_path:
+        return state.model_checkpoint_path
+
+    return path
+
+
+class CheckpointWriter(object):
+    """
+    Background writer for model checkpoints.
+    The caller snapshots variable values and the pickled model object into host memory, and a worker thread writes them to disk, so that training can continue while files are written.
+    Each save writes a primary and a backup copy of the checkpoint and object files.
+    Object files are written to a temporary path that is renamed into place once complete. Checkpoint data and index files are written under a fresh versioned prefix (e.g. ``model.ckpt-3``), and the save is committed by atomically repointing the checkpoint's state file (see ``get_checkpoint_path()``) at it, after which the files of the previous version are removed. An interrupted write therefore never leaves a checkpoint that pairs data and index files from different saves.
+    A save that has not yet started when a newer save to the same destination is requested is replaced by the newer one.
+    Object and meta graph files are only rewritten when their contents have changed since they were last written, since model metadata is typically fixed over the course of training.
+
+    :param variables: ``list`` of TensorFlow variables; variables to checkpoint, which will be saved under their graph names.
+    :param meta_graph_def: ``bytes`` or ``None``; serialized ``MetaGraphDef`` of the model graph, written alongside each checkpoint. If ``None``, no ``.meta`` files are written.
+    """
+
+    def __init__(self, variables, meta_graph_def=None):
+        self.names = [v.op.name for v in variables]
+        self.dtypes = [v.dtype.base_dtype for v in variables]
+        self.meta_graph_def = meta_graph_def
+
+        self.pending = collections.OrderedDict()
+        self.written = {} # Contents of the object files most recently written, keyed by path
+        self.busy = False
+        self.closed = False
+        self.error = None
+        self.cond = threading.Condition()
+
+        self.graph = None
+        self.session = None
+        self.saver = None
+        self.values_in = None
+        self.initializers = None
+
+        self.thread = threading.Thread(target=self._run, name='CheckpointWriter')
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, dir, suffix, values, obj, graph_attrs=None):
+        """
+        Schedule a save.
+
+        :param dir: ``str``; output directory.
+        :param suffix: ``str``; file suffix.
+        :param values: ``list`` of ``numpy`` arrays; values of the checkpointed variables, in order.
+        :param obj: ``bytes``; pickled model object.
+        :param graph_attrs: ``bytes`` or ``None``; serialized description of the model's graph attributes, written to ``m<suffix>.graph`` for use with the exported meta graph (see ``CDRModel.rehydrate()``). If ``None``, not written.
+        :return: ``None``
+        """
+
+        with self.cond:
+            self._raise_error()
+            assert not self.closed, 'Cannot write to a closed CheckpointWriter.'
+            self.pending[(dir, suffix)] = (values, obj, graph_attrs)
+            self.cond.notify_all()
+
+    def flush(self):
+        """
+        Block until all scheduled saves have been written.
+        Raises any error encountered by the worker since the last call to ``write()`` or ``flush()``.
+
+        :return: ``None``
+        """
+
+        with self.cond:
+            while self.pending or self.busy:
+                self.cond.wait()
+            self._raise_error()
+
+    def close(self):
+        """
+        Write all scheduled saves and stop the worker.
+
+        :return: ``None``
+        """
+
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        if self.session is not None:
+            self.session.close()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                (dir, suffix), (values, obj, graph_attrs) = self.pending.popitem(last=False)
+                self.busy = True
+            try:
+                self._save(dir, suffix, values, obj, graph_attrs)
+            except Exception as e:
+                self.error = e
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def _initialize_graph(self):
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.values_in = []
+            var_dict = {}
+            for i, (name, dtype) in enumerate(zip(self.names, self.dtypes)):
+                value_in = tf.placeholder(dtype, name='value_%d' % i)
+                var_dict[name] = tf.Variable(value_in, trainable=False, validate_shape=False, name='var_%d' % i)
+                self.values_in.append(value_in)
+            self.initializers = [var_dict[name].initializer for name in self.names]
+            self.saver = tf.train.Saver(var_dict, max_to_keep=None)
+        # Keep checkpoint writing off the GPU
+        self.session = tf.Session(graph=self.graph, config=tf.ConfigProto(device_count={'GPU': 0}))
+
+    def _save(self, dir, suffix, values, obj, graph_attrs):
+        if self.graph is None:
+            self._initialize_graph()
+        self.session.run(self.initializers, feed_dict=dict(zip(self.values_in, values)))
+
+        failed = True
+        i = 0
+
+        # Try/except to handle race conditions in Windows
+        while failed and i < 10:
+            try:
+                self._write_checkpoint(dir + '/model%s.ckpt' % suffix)
+                self._write_obj(dir + '/m%s.obj' % suffix, obj)
+                if graph_attrs is not None:
+                    self._write_obj(dir + '/m%s.graph' % suffix, graph_attrs)
+                self._write_checkpoint(dir + '/model%s_backup.ckpt' % suffix)
+                self._write_obj(dir + '/m%s_backup.obj' % suffix, obj)
+                if graph_attrs is not None:
+                    self._write_obj(dir + '/m%s_backup.graph' % suffix, graph_attrs)
+                failed = False
+            except Exception:
+                stderr('Write failure during save. Retrying...\n')
+                pytime.sleep(1)
+                i += 1
+        if i >= 10:
+            stderr('Could not save model to checkpoint file. Saving to backup...\n')
+            self._write_checkpoint(dir + '/model%s_backup.ckpt' % suffix)
+            self._write_obj(dir + '/m%s_backup.obj' % suffix, obj)
+            if graph_attrs is not None:
+                self._write_obj(dir + '/m%s_backup.graph' % suffix, graph_attrs)
+
+    def _write_checkpoint(self, path):
+        dir = os.path.dirname(path) or '.'
+        version = CHECKPOINT_VERSION.search(get_checkpoint_path(path))
+        version = 1 if version is None else int(version.group(1)) + 1
+        version_path = '%s-%d' % (path, version)
+        self.saver.save(self.session, version_path, write_meta_graph=False, write_state=False)
+        if self.meta_graph_def is not None:
+            self._write_obj(path + '.meta', self.meta_graph_def)
+
+        # Commit point: the state file is rewritten atomically
+        tf.train.update_checkpoint_state(dir, version_path, latest_filename=get_checkpoint_state_filename(path))
+        tf.train.update_checkpoint_state(dir, version_path)
+
+        # Remove superseded versions (including unversioned files from older versions of CDR)
+        for old_path in glob.glob(path + '-*') + glob.glob(path + '.index') + glob.glob(path + '.data-*'):
+            if not old_path.startswith(version_path + '.'):
+                os.remove(old_path)
+
+    def _write_obj(self, path, obj):
+        if self.written.get(path) == obj and os.path.exists(path):
+            return
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(obj)
+        os.replace(tmp_path, path)
+        self.written[path] = obj
@@ -0,0 +1,142 @@
+import argparse
+import sys
+import numpy as np
+
+from cdr.data import _apply_t_delta_cutoff_jit, _get_time_window_bounds_loop, \
+    _get_time_window_bounds_vectorized, compute_time_mask
+from cdr.util import stderr
+
+
+def compute_time_mask_reference(X_time, first_obs, last_obs, history_length=128, future_length=0):
+    # Original row-by-row implementation of compute_time_mask
+    first_obs = np.array(first_obs, dtype='int32')
+    last_obs = np.array(last_obs, dtype='int32')
+    X_time = np.array(X_time, dtype='float32')
+
+    time_mask = np.zeros((first_obs.shape[0], history_length + future_length), dtype='float32')
+
+    for i, first, last in zip(np.arange(first_obs.shape[0]), first_obs, last_obs):
+        sXt = X_time[first:last]
+        time_mask[i][-len(sXt):] = 1
+
+    return time_mask
+
+
+def sample_data(n_series, n_impulse, n_response, integer_times=False):
+    # Random series of impulses and responses, each sorted by series and then time.
+    # Every response series also occurs in the impulses.
+    X_codes = np.sort(np.random.randint(n_series, size=n_impulse))
+    X_codes[:n_series] = np.arange(n_series)
+    X_codes = np.sort(X_codes)
+    Y_codes = np.sort(np.random.choice(np.unique(X_codes), size=n_response))
+    if integer_times:
+        # Many ties, both within the impulses and between impulses and responses
+        X_time = np.random.randint(50, size=n_impulse).astype('float64')
+        Y_time = np.random.randint(50, size=n_response).astype('float64')
+    else:
+        X_time = np.random.uniform(0, 50, size=n_impulse)
+        Y_time = np.random.uniform(0, 50, size=n_response)
+    X_order = np.lexsort((X_time, X_codes))
+    Y_order = np.lexsort((Y_time, Y_codes))
+
+    return X_time[X_order], Y_time[Y_order], X_codes[X_order], Y_codes[Y_order]
+
+
+def check(name, passed):
+    stderr('%s: %s\n' % ('PASS' if passed else 'FAIL', name))
+    return passed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser('''
+        Checks the vectorized and compiled data preprocessing kernels (time window bounds and time masks) against their pure-Python reference implementations on randomized data.
+        Exits with a non-zero status if any check fails.
+    ''')
+    argparser.add_argument('-n', '--n_trials', type=int, default=20, help='Number of randomized datasets to check.')
+    argparser.add_argument('-s', '--seed', type=int, default=None, help='Random seed. If unspecified, not seeded.')
+    args = argparser.parse_args()
+
+    if args.seed is not None:
+        np.random.seed(args.seed)
+
+    if _apply_t_delta_cutoff_jit is None:
+        stderr('numba is not installed. Skipping checks of compiled kernels.\n')
+
+    passed = True
+    for trial in range(args.n_trials):
+        stderr('Trial %d/%d\n' % (trial + 1, args.n_trials))
+        X_time, Y_time, X_codes, Y_codes = sample_data(
+            n_series=np.random.randint(1, 10),
+            n_impulse=np.random.randint(10, 1000),
+            n_response=np.random.randint(1, 1000),
+            integer_times=trial % 2 == 1
+        )
+
+        for t_delta_cutoff in (None, np.random.uniform(0.5, 10)):
+            # Vectorized (Python cutoff recurrence) vs. row-by-row window bounds
+            start_ref, end_ref = _get_time_window_bounds_loop(
+                X_time,
+                Y_time,
+                X_codes[:, None],
+                Y_codes[:, None],
+                t_delta_cutoff=t_delta_cutoff,
+                verbose=False
+            )
+            start, end = _get_time_window_bounds_vectorized(
+                X_time,
+                Y_time,
+                X_codes,
+                Y_codes,
+                t_delta_cutoff=t_delta_cutoff,
+                use_jit=False
+            )
+            passed &= check(
+                '_get_time_window_bounds_vectorized vs. _get_time_window_bounds_loop (t_delta_cutoff=%s)' % t_delta_cutoff,
+                np.array_equal(start, start_ref) and np.array_equal(end, end_ref)
+            )
+
+            # Compiled vs. Python cutoff recurrence
+            if t_delta_cutoff and _apply_t_delta_cutoff_jit is not None:
+                start_jit, end_jit = _get_time_window_bounds_vectorized(
+                    X_time,
+                    Y_time,
+                    X_codes,
+                    Y_codes,
+                    t_delta_cutoff=t_delta_cutoff,
+                    use_jit=True
+                )
+                passed &= check(
+                    '_apply_t_delta_cutoff_jit vs. _apply_t_delta_cutoff (t_delta_cutoff=%s)' % t_delta_cutoff,
+                    np.array_equal(start_jit, start) and np.array_equal(end_jit, end)
+                )
+
+            # Vectorized vs. row-by-row time mask. Expected behavior: identical, except that responses with
+            # empty windows (no impulses) are now fully masked, whereas the reference unmasks their whole row.
+            for history_length, future_length in ((8, 0), (128, 0), (8, 4)):
+                time_mask = compute_time_mask(
+                    X_time,
+                    start,
+                    end,
+                    history_length=history_length,
+                    future_length=future_length
+                )
+                time_mask_ref = compute_time_mask_reference(
+                    X_time,
+                    start,
+                    end,
+                    history_length=history_length,
+                    future_length=future_length
+                )
+                empty = end <= start
+                passed &= check(
+                    'compute_time_mask vs. reference (history_length=%d, future_length=%d, %d empty windows)' % (history_length, future_length, empty.sum()),
+                    np.array_equal(time_mask[~empty], time_mask_ref[~empty]) and
+                    not time_mask[empty].any() and
+                    time_mask_ref[empty].all()
+                )
+
+    if passed:
+        stderr('All checks passed.\n')
+    else:
+        stderr('Some checks failed.\n')
+        sys.exit(1)
@@ -25,7 +25,8 @@ if __name__ == '__main__':
     argparser.add_argument('-a', '--algorithm', type=str, default='MAP', help='Algorithm ("sampling" or "MAP") to use for extracting predictions.')
     argparser.add_argument('-A', '--ablated_models', action='store_true', help='Perform convolution using ablated models. Otherwise only convolves using the full model in each ablation set.')
     argparser.add_argument('-e', '--extra_cols', action='store_true', help='Whether to include columns from the response dataframe in the outputs.')
-    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).")
+    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.")
+    argparser.add_argument('-F', '--fast_load', action='store_true', help='Load CDR models from the graph definitions exported with their checkpoints (where available) rather than reconstructing their graphs. Much faster for large models.')
     argparser.add_argument('--cpu_only', action='store_true', help='Use CPU implementation even if GPU is available.')
     args = argparser.parse_args()
 
@@ -63,6 +64,7 @@ if __name__ == '__main__':
                         Y_paths,
                         p.series_ids,
                         sep=p.sep,
+                        cache_dir=p.cache_dir,
                         categorical_columns=list(
                             set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
                     )
@@ -72,6 +74,7 @@ if __name__ == '__main__':
                         cdr_formula_list,
                         p.series_ids,
                         filters=p.filters,
+                        cache_dir=p.cache_dir,
                         history_length=p.history_length,
                         future_length=p.future_length,
                         t_delta_cutoff=p.t_delta_cutoff
@@ -91,6 +94,7 @@ if __name__ == '__main__':
                     Y_paths,
                     p.series_ids,
                     sep=p.sep,
+                    cache_dir=p.cache_dir,
                     categorical_columns=list(
                         set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
                 )
@@ -100,6 +104,7 @@ if __name__ == '__main__':
                     cdr_formula_list,
                     p.series_ids,
                     filters=p.filters,
+                    cache_dir=p.cache_dir,
                     history_length=p.history_length,
                     future_length=p.future_length,
                     t_delta_cutoff=p.t_delta_cutoff
@@ -118,7 +123,7 @@ if __name__ == '__main__':
                 m_path = m.replace(':', '+')
 
                 stderr('Retrieving saved model %s...\n' % m)
-                cdr_model = CDREnsemble(p.outdir, m_path)
+                cdr_model = CDREnsemble(p.outdir, m_path, predict_only=args.fast_load)
 
                 dv = formula.strip().split('~')[0].strip()
                 if partition_str in ('CVdev', 'CVtest'):
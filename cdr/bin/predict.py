@@ -10,7 +10,7 @@ from sklearn.metrics import f1_score
 pd.options.mode.chained_assignment = None
 
 from cdr.config import Config
-from cdr.io import read_tabular_data
+from cdr.io import read_tabular_data, iter_tabular_data
 from cdr.formula import Formula
 from cdr.data import add_responses, filter_invalid_responses, preprocess_data, compute_splitID, compute_partition, s, c, z, split_cdr_outputs
 from cdr.model import CDREnsemble
@@ -108,10 +108,18 @@ if __name__ == '__main__':
     argparser.add_argument('-t', '--twostep', action='store_true', help='For CDR models, predict from fitted LME model from two-step hypothesis test.')
     argparser.add_argument('-A', '--ablated_models', action='store_true', help='For two-step prediction from CDR models, predict from data convolved using the ablated model. Otherwise predict from data convolved using the full model.')
     argparser.add_argument('-e', '--extra_cols', action='store_true', help='For prediction from CDR models, dump prediction outputs and response metadata to a single csv.')
-    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).")
+    argparser.add_argument('--pred_sd', action='store_true', help='For prediction from CDR models using sampling (**-a sampling**), also dump the standard deviation of predictions over posterior samples (real-valued responses only).')
+    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.")
+    argparser.add_argument('-S', '--stream', action='store_true', help='Read data incrementally from disk and write CDR predictions as each chunk of complete time series is processed, rather than loading the full dataset into memory. Requires **-M predict**, a single dataset per partition, and data files that are sorted by the series IDs on disk. Baseline models are skipped. Not supported for models whose formulas use data-dependent transforms (``c.()``, ``z.()``, ``s.()``), since their statistics would be computed separately for each chunk.')
+    argparser.add_argument('--chunk_size', type=int, default=100000, help='If streaming (**-S**), approximate number of rows per data file to read from disk at a time.')
+    argparser.add_argument('-F', '--fast_load', action='store_true', help='Load CDR models from the graph definitions exported with their checkpoints (where available) rather than reconstructing their graphs. Much faster for large models.')
     argparser.add_argument('--cpu_only', action='store_true', help='Use CPU implementation even if GPU is available.')
     args = argparser.parse_args()
 
+    if args.stream:
+        assert args.mode == 'predict', 'Streaming (-S) is only supported with -M predict.'
+        assert not args.twostep, 'Streaming (-S) is not supported for two-step prediction.'
+
     for path in args.config_paths:
         p = Config(path)
 
@@ -131,6 +139,85 @@ if __name__ == '__main__':
         cdr_formula_list = [Formula(p.models[m]['formula']) for m in filter_models(model_names, cdr_only=True)]
         cdr_formula_name_list = [m for m in filter_models(p.model_names, cdr_only=True)]
 
+        if args.stream:
+            if not p.use_gpu_if_available or args.cpu_only:
+                os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+            stream_model_names = filter_models(model_names, cdr_only=True)
+            if len(stream_model_names) < len(model_names):
+                stderr('Streaming is only supported for CDR models. Skipping baseline models.\n')
+            for m in stream_model_names:
+                data_dependent_ops = Formula(p.models[m]['formula']).data_dependent_ops()
+                assert not data_dependent_ops, 'Streaming (-S) is not supported for model %s, whose formula uses data-dependent transforms (%s) that would be computed separately for each chunk. Rerun without -S.' % (m, ', '.join(data_dependent_ops))
+
+            for p_name in args.partition:
+                assert p_name not in ('CVdev', 'CVtest'), 'Streaming (-S) is not supported for cross-validation partitions.'
+                partitions = get_partition_list(p_name)
+                partition_str = '-'.join(partitions)
+                X_paths, Y_paths = paths_from_partition_cliarg(partitions, p)
+
+                for m in stream_model_names:
+                    p.set_model(m)
+                    m_path = m.replace(':', '+')
+                    if not os.path.exists(p.outdir + '/' + m_path):
+                        os.makedirs(p.outdir + '/' + m_path)
+                    with open(p.outdir + '/' + m_path + '/pred_inputs_%s.txt' % partition_str, 'w') as f:
+                        f.write('%s\n' % (' '.join(X_paths)))
+                        f.write('%s\n' % (' '.join(Y_paths)))
+                    if m not in model_cache:
+                        stderr('Retrieving saved model %s...\n' % m)
+                        _model = CDREnsemble(p.outdir, m_path, predict_only=args.fast_load)
+                        if args.algorithm.lower() == 'map':
+                            _model.set_weight_type('ll')
+                        else:
+                            _model.set_weight_type('uniform')
+                        model_cache[m] = _model
+
+                append = set()
+                for X, Y in iter_tabular_data(
+                        X_paths,
+                        Y_paths,
+                        p.series_ids,
+                        sep=p.sep,
+                        categorical_columns=list(set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf])),
+                        chunk_size=args.chunk_size
+                ):
+                    X, Y, select, X_in_Y_names = preprocess_data(
+                        X,
+                        Y,
+                        cdr_formula_list,
+                        p.series_ids,
+                        filters=p.filters,
+                        history_length=p.history_length,
+                        future_length=p.future_length,
+                        t_delta_cutoff=p.t_delta_cutoff,
+                        verbose=False
+                    )
+
+                    for m in stream_model_names:
+                        formula = p.models[m]['formula']
+                        dv = [x.strip() for x in formula.strip().split('~')[0].strip().split('+')]
+                        Y_valid, select_Y_valid = filter_invalid_responses(Y, dv)
+                        if not sum(len(_Y) for _Y in Y_valid):
+                            continue
+                        model_cache[m].predict(
+                            X,
+                            Y_valid,
+                            X_in_Y_names=X_in_Y_names,
+                            n_samples=args.nsamples,
+                            algorithm=args.algorithm,
+                            extra_cols=args.extra_cols,
+                            return_sd=args.pred_sd,
+                            dump=True,
+                            partition=partition_str,
+                            append=m in append,
+                            optimize_memory=args.optimize_memory,
+                            verbose=False
+                        )
+                        append.add(m)
+
+            continue
+
         evaluation_sets = []
         evaluation_set_partitions = []
         evaluation_set_names = []
@@ -147,6 +234,7 @@ if __name__ == '__main__':
                         Y_paths,
                         p.series_ids,
                         sep=p.sep,
+                        cache_dir=p.cache_dir,
                         categorical_columns=list(
                             set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
                     )
@@ -156,6 +244,7 @@ if __name__ == '__main__':
                         cdr_formula_list,
                         p.series_ids,
                         filters=p.filters,
+                        cache_dir=p.cache_dir,
                         history_length=p.history_length,
                         future_length=p.future_length,
                         t_delta_cutoff=p.t_delta_cutoff
@@ -175,6 +264,7 @@ if __name__ == '__main__':
                     Y_paths,
                     p.series_ids,
                     sep=p.sep,
+                    cache_dir=p.cache_dir,
                     categorical_columns=list(set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
                 )
                 X, Y, select, X_in_Y_names = preprocess_data(
@@ -183,6 +273,7 @@ if __name__ == '__main__':
                     cdr_formula_list,
                     p.series_ids,
                     filters=p.filters,
+                    cache_dir=p.cache_dir,
                     history_length=p.history_length,
                     future_length=p.future_length,
                     t_delta_cutoff=p.t_delta_cutoff
@@ -274,7 +365,7 @@ if __name__ == '__main__':
                     stderr('Retrieving saved model %s...\n' % m)
                     is_cdr = not (m.startswith('LM') or m.startswith('GAM'))
                     if is_cdr:
-                        _model = CDREnsemble(p.outdir, m_path)
+                        _model = CDREnsemble(p.outdir, m_path, predict_only=args.fast_load)
                     else:
                         with open(p.outdir + '/' + m_path + '/m.obj', 'rb') as m_file:
                             _model = pickle.load(m_file)
@@ -441,6 +532,7 @@ if __name__ == '__main__':
                                 n_samples=args.nsamples,
                                 algorithm=args.algorithm,
                                 extra_cols=args.extra_cols,
+                                return_sd=args.pred_sd,
                                 dump=True,
                                 partition=partition_str,
                                 optimize_memory=args.optimize_memory
@@ -27,7 +27,7 @@ if __name__ == '__main__':
     argparser.add_argument('-e', '--force_training_evaluation', action='store_true', help='Recompute training evaluation even for models that are already finished.')
     argparser.add_argument('-s', '--save_and_exit', action='store_true', help='Initialize, save, and exit (CDR only). Useful for bringing non-backward compatible trained models up to spec for plotting and evaluation.')
     argparser.add_argument('-S', '--skip_confirmation', action='store_true', help='If running with **-s**, skip interactive confirmation. Useful for batch re-saving many models. Use with caution, since old models will be overwritten without the option to confirm.')
-    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).")
+    argparser.add_argument('-O', '--optimize_memory', action='store_true', help="Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.")
     argparser.add_argument('--cpu_only', action='store_true', help='Use CPU implementation even if GPU is available.')
     args = argparser.parse_args()
 
@@ -63,6 +63,7 @@ if __name__ == '__main__':
         Y_paths,
         p.series_ids,
         sep=p.sep,
+        cache_dir=p.cache_dir,
         categorical_columns=list(set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
     )
     X, Y, select, X_in_Y_names = preprocess_data(
@@ -71,6 +72,7 @@ if __name__ == '__main__':
         cdr_formula_list,
         p.series_ids,
         filters=p.filters,
+        cache_dir=p.cache_dir,
         history_length=p.history_length,
         future_length=p.future_length,
         t_delta_cutoff=p.t_delta_cutoff,
@@ -271,6 +273,7 @@ if __name__ == '__main__':
                 if save:
                     stderr('Saving...\n')
                     cdr_model.save()
+                    cdr_model.flush_saves()
                     with open(cdr_model.outdir + '/initialization_summary.txt', 'w') as i_file:
                         i_file.write(cdr_model.initialization_summary())
                 continue
@@ -291,6 +294,7 @@ if __name__ == '__main__':
                         Y_paths_dev,
                         p.series_ids,
                         sep=p.sep,
+                        cache_dir=p.cache_dir,
                         categorical_columns=list(
                             set(p.split_ids + p.series_ids + [v for x in cdr_formula_list for v in x.rangf]))
                     )
@@ -300,6 +304,7 @@ if __name__ == '__main__':
                         cdr_formula_list,
                         p.series_ids,
                         filters=p.filters,
+                        cache_dir=p.cache_dir,
                         history_length=p.history_length,
                         future_length=p.future_length,
                         t_delta_cutoff=p.t_delta_cutoff,
@@ -101,6 +101,8 @@ class Config(object):
         if self.merge_cols is not None:
             self.merge_cols = self.merge_cols.split()
 
+        self.cache_dir = data.get('cache_dir', None)
+
         ###################
         # Global Settings #
         ###################
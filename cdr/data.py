@@ -1,7 +1,21 @@
 import re
+import os
+import copy
+import queue
+import hashlib
+import weakref
+import multiprocessing
+from collections import defaultdict, OrderedDict
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-from .util import flatten_dict, names2ix, stderr
+try:
+    import numba
+except ImportError:
+    numba = None
+from .io import read_cache, write_cache
+from .util import flatten_dict, names2ix, prefetch_batches, stderr
 
 op_finder = re.compile('([^()]+)\((.+)\) *')
 
@@ -39,6 +53,191 @@ def s(df):
     return df/df.std(axis=0)
 
 
+def apply_op(op, arr):
+    """
+    Apply op **op** to array **arr**.
+
+    :param op: ``str``; name of op.
+    :param arr: ``numpy`` or ``pandas`` array; source data.
+    :return: ``numpy`` array; transformed data.
+    """
+
+    if op in ['c', 'c.']:
+        out = c(arr)
+    elif op in ['z', 'z.']:
+        out = z(arr)
+    elif op in ['s', 's.']:
+        out = s(arr)
+    elif op == 'log':
+        out = np.log(np.maximum(arr, 1e-12))
+    elif op == 'log1p':
+        out = np.log(arr + 1)
+    elif op == 'exp':
+        out = np.exp(arr)
+    elif op.startswith('add'):
+        x = float(op[3:])
+        out = arr + x
+    elif op.startswith('subtract'):
+        x = float(op[8:])
+        out = arr - x
+    elif op.startswith('multiply'):
+        x = float(op[8:])
+        out = arr * x
+    elif op.startswith('divide'):
+        x = float(op[6:])
+        out = arr / x
+    elif op.startswith('pow'):
+        exponent = float(op[3:])
+        out = arr ** exponent
+    else:
+        raise ValueError('Unrecognized op: "%s".' % op)
+    return out
+
+
+OP_ALIASES = {
+    'c.': 'c',
+    'z.': 'z',
+    's.': 's'
+}
+
+
+class TransformPlan(object):
+    """
+    Deferred set of derived columns (transformed, interacted, and one-hot expanded predictors) to add to a data table.
+    Columns are registered by name as they are discovered (registering an existing name is a no-op), then computed from ``numpy`` arrays and attached to the table all at once by ``execute``, rather than inserted into (and copying) the table one at a time.
+    A single plan can be shared by all formulas preprocessed in a run (see ``preprocess_data``). Transformed columns are memoized by source column and (canonicalized) op chain, so a transform is computed once even if it is requested under different names (e.g. ``z.(x)`` and ``z(x)``) or as the prefix of a longer op chain (e.g. ``log(x)`` within ``z(log(x))``).
+    Supports the subset of the ``pandas`` ``DataFrame`` interface used while expanding impulses (``in``, iteration over column names, ``columns``, and column get/set by name).
+
+    :param X: ``pandas`` table; the data table.
+    """
+
+    def __init__(self, X):
+        self.X = X
+        self.steps = OrderedDict()
+        self.values = {}
+        self.op_cache = {}
+
+    def __contains__(self, name):
+        return name in self.steps or name in self.X
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    @property
+    def columns(self):
+        return list(self.X.columns) + [x for x in self.steps if x not in self.X]
+
+    def __getitem__(self, name):
+        if name in self.steps:
+            return pd.Series(self.get_values(name), index=self.X.index, name=name)
+        return self.X[name]
+
+    def __setitem__(self, name, value):
+        self.steps[name] = ('value', (np.asarray(value),))
+        self.values.pop(name, None)
+        self.op_cache = {k: v for k, v in self.op_cache.items() if k[0] != name}
+
+    def add_ops(self, name, src, ops):
+        """
+        Register column **name** as the result of applying **ops** in order to column **src**.
+
+        :param name: ``str``; name of new column.
+        :param src: ``str``; name of source column.
+        :param ops: ``list`` of ``str``; names of ops.
+        :return: ``None``
+        """
+
+        if name not in self:
+            self.steps[name] = ('ops', (src, tuple(ops)))
+
+    def add_interaction(self, name, srcs):
+        """
+        Register column **name** as the product of columns **srcs** (missing values are skipped, as in ``DataFrame.product``).
+
+        :param name: ``str``; name of new column.
+        :param srcs: ``list`` of ``str``; names of source columns.
+        :return: ``None``
+        """
+
+        if name not in self:
+            self.steps[name] = ('interaction', (tuple(srcs),))
+
+    def get_op_values(self, src, ops):
+        """
+        Get the result of applying **ops** in order to column **src**, reusing the longest previously computed prefix of the op chain.
+
+        :param src: ``str``; name of source column.
+        :param ops: ``tuple`` of ``str``; names of ops.
+        :return: ``numpy`` vector; transformed values.
+        """
+
+        ops = tuple(OP_ALIASES.get(op, op) for op in ops)
+        k = len(ops)
+        while k > 0 and (src, ops[:k]) not in self.op_cache:
+            k -= 1
+        if k:
+            out = self.op_cache[(src, ops[:k])]
+        else:
+            out = self.get_values(src)
+        for j in range(k, len(ops)):
+            out = np.asarray(apply_op(ops[j], pd.Series(out, index=self.X.index)))
+            self.op_cache[(src, ops[:j + 1])] = out
+
+        return out
+
+    def get_values(self, name):
+        """
+        Get the values of column **name**, computing them (and any registered columns they depend on) if needed.
+
+        :param name: ``str``; name of column.
+        :return: ``numpy`` vector; column values.
+        """
+
+        if name in self.values:
+            return self.values[name]
+        if name not in self.steps:
+            return self.X[name].values
+
+        kind, args = self.steps[name]
+        if kind == 'value':
+            out = args[0]
+        elif kind == 'ops':
+            out = self.get_op_values(*args)
+        elif kind == 'interaction':
+            out = None
+            for src in args[0]:
+                x = np.asarray(self.get_values(src), dtype=float)
+                x = np.where(np.isnan(x), 1., x)
+                out = x if out is None else out * x
+        else:
+            raise ValueError('Unrecognized transform step type: "%s".' % kind)
+        self.values[name] = out
+
+        return out
+
+    def execute(self):
+        """
+        Compute all registered columns and attach them to the table.
+
+        :return: ``pandas`` table; the table with all registered columns added.
+        """
+
+        new_cols = OrderedDict()
+        for name in self.steps:
+            vals = self.get_values(name)
+            if name in self.X:
+                self.X[name] = vals
+            else:
+                new_cols[name] = vals
+        if new_cols:
+            self.X = pd.concat([self.X, pd.DataFrame(new_cols, index=self.X.index)], axis=1)
+        self.steps = OrderedDict()
+        self.values = {}
+        self.op_cache = {}
+
+        return self.X
+
+
 def corr(A, B):
     # Assumes A and B are n x a and n x b matrices and computes a x b pairwise correlations
     A_centered = A - A.mean(axis=0, keepdims=True)
@@ -239,7 +438,7 @@ def build_CDR_response_data(
     :param Y_category_map: ``dict`` or ``None``; map from category labels to integers for each categorical response.
     :param response_to_df_ix: ``dict`` or ``None``; map from response names to lists of indices of the response files that contain them.
     :param gf_names: ``list`` or ``None``; list of names of random grouping factor variables. If ``None`` and **Y_gf** provided, will use all columns of **Y_gf**.
-    :param gf_map: ``list`` of ``dict`` or ``None``; list maps from random grouping factor levels to their indices, one map per grouping factor variable in **gf_names**.
+    :param gf_map: ``list`` of ``dict`` or ``None``; list maps from random grouping factor levels to their indices, one map per grouping factor variable in **gf_names**. Elements may also be precomputed lookups from ``get_gf_lookup``, which avoids rebuilding them on every call.
     :return: 7-tuple of ``numpy`` arrays; let N, R, XF, YF, Z, and K respectively be the number of rows (sum total number of rows in **Y**), number of response dimensions, number of distinct predictor files (X), number of distinct response files (Y), number of random grouping factor variables, and number of response_aligned predictors. Outputs are (1) responses with shape (N, R) or ``None`` if **Y** is ``None``, (2) an XF-tuple of first observation vectors indexing start indices for each entry in X, (3) a YF-tuple of first observation vectors indexing end indices for each entry in X, (4) response timestamps with shape (N,), (5) response masks (masking out any missing response variables per row) with shape (N, R), (6) random grouping factor matrix with shape (N, Z), or ``None`` if no random grouping factors provided, and (7) response-aligned predictors with shape (N, K).
     """
 
@@ -386,8 +585,7 @@ def build_CDR_response_data(
                 _gf_names = gf_names
             _Y_gf = _Y_gf[_gf_names]
             if gf_map is not None:
-                for j, col in enumerate(_gf_names):
-                    _Y_gf[col] = pd.Series(_Y_gf[col].astype(str)).map(gf_map[j])
+                _Y_gf = map_gf_table(_Y_gf, gf_map)
             Y_gf_out.append(_Y_gf)
 
         # X_in_Y
@@ -443,6 +641,7 @@ def build_CDR_impulse_data(
         future_length=0,
         int_type='int32',
         float_type='float32',
+        time_type=None
 ):
     """
     Construct impulse data arrays in the required format for CDR fitting/evaluation for a single response array.
@@ -457,91 +656,552 @@ def build_CDR_impulse_data(
     :param future_length: ``int``; maximum number of future (forward) observations.
     :param int_type: ``str``; name of int type.
     :param float_type: ``str``; name of float type.
+    :param time_type: ``str`` or ``None``; name of float type of impulse timestamps. If ``None``, use **float_type**.
     :return: triple of ``numpy`` arrays; let N, T, I, R respectively be the number of rows in **Y**, history length, number of impulse dimensions, and number of response dimensions. Outputs are (1) impulses with shape (N, T, I), (2) impulse timestamps with shape (N, T, I), and impulse mask with shape (N, T, I).
     """
 
-    # Process impulses
+    return ImpulseWindows(
+        X,
+        first_obs,
+        last_obs,
+        X_in_Y_names=X_in_Y_names,
+        X_in_Y=X_in_Y,
+        impulse_names=impulse_names,
+        history_length=history_length,
+        future_length=future_length,
+        int_type=int_type,
+        float_type=float_type,
+        time_type=time_type
+    )[:]
+
+
+def trim_impulse_windows(X, X_time, X_mask):
+    """
+    Drop timesteps that contain no observed impulses in any row of a minibatch of expanded impulse data.
+    Windows are padded out to the full history/future length, but most rows have far fewer real events, so a minibatch typically needs only a fraction of the padded time dimension.
+    Only the leading (oldest) and trailing (latest) padding shared by all rows is removed, so the remaining timesteps are unchanged and fully masked steps contribute nothing to the model outputs.
+    Not valid if outputs are to be returned per timestep, since this changes the size of the time dimension.
+
+    :param X: ``numpy`` array; expanded impulses with shape (N, T, I).
+    :param X_time: ``numpy`` array; expanded impulse timestamps with shape (N, T, I).
+    :param X_mask: ``numpy`` array; expanded impulse mask with shape (N, T, I).
+    :return: triple of ``numpy`` arrays; views of **X**, **X_time**, and **X_mask** trimmed along the time dimension (at least one timestep is always kept).
+    """
+
+    T = X_mask.shape[1]
+    observed = np.flatnonzero(X_mask.any(axis=(0, 2)))
+    if len(observed):
+        start, end = observed[0], observed[-1] + 1
+    else:
+        start, end = T - 1, T
+    if start == 0 and end == T:
+        return X, X_time, X_mask
 
-    if X_in_Y_names is None:
-        X_in_Y_names = []
-    impulse_names_X = sorted(list(set(impulse_names).difference(set(X_in_Y_names))))
-    impulse_names_X_todo = set(impulse_names_X)
-    impulse_names_X_tmp = []
+    return X[:, start:end], X_time[:, start:end], X_mask[:, start:end]
 
-    X_2d = []
-    X_time_out = []
-    X_mask_out = []
 
-    window_length = history_length + future_length
+def compress_impulse_data(X, X_time, X_mask, Y_time, storage_type='float16'):
+    """
+    Convert expanded impulse data to a compact storage format for holding in host memory.
+    Impulses are stored as **storage_type**, the mask as ``bool``, and timestamps as ``float32`` offsets back from the associated response time.
+    The offsets are no more precise than the dtype of **X_time**: unless impulse timestamps were built in ``float64`` (e.g. with ``time_type='float64'``, as under the ``precise_t_delta`` model setting), any precision already lost to large absolute timestamps is not recovered.
+    Invert with ``decompress_impulse_data`` at feed time.
+
+    :param X: ``numpy`` array; expanded impulses with shape (N, T, I).
+    :param X_time: ``numpy`` array; expanded impulse timestamps with shape (N, T, I).
+    :param X_mask: ``numpy`` array; expanded impulse mask with shape (N, T, I).
+    :param Y_time: ``numpy`` vector; response timestamps with shape (N,).
+    :param storage_type: ``str``; name of float type in which to store impulses.
+    :return: triple of ``numpy`` arrays; the compressed impulses, timestamp offsets, and mask.
+    """
 
-    for i, _X in enumerate(X):
-        impulse_names_1d_cur = impulse_names_X_todo.intersection(set(_X.columns))
-        if len(impulse_names_1d_cur) > 0:
-            impulse_names_X_todo = impulse_names_X_todo - impulse_names_1d_cur
-            impulse_names_1d_cur = sorted(list(impulse_names_1d_cur))
-            impulse_names_X_tmp += impulse_names_1d_cur
-            _X_2d, _X_time_2d, _X_mask = expand_impulse_sequence(
-                _X[impulse_names_1d_cur],
-                _X.time,
-                first_obs[i],
-                last_obs[i],
-                window_length,
-                int_type=int_type,
-                float_type=float_type
-            )
+    X_mask = X_mask.astype(bool)
+    X_time_offset = np.asarray(Y_time, dtype=np.float64)[:, None, None] - X_time
+    X_time_offset = np.where(X_mask, X_time_offset, 0.).astype(np.float32)
+    X = X.astype(storage_type)
+
+    return X, X_time_offset, X_mask
+
+
+def decompress_impulse_data(X, X_time_offset, X_mask, Y_time, float_type='float32', time_type=None):
+    """
+    Recover model-ready impulse data from the compact storage format of ``compress_impulse_data``.
+    Typically applied to a single minibatch just before it is fed to the model.
+
+    :param X: ``numpy`` array; compressed impulses with shape (N, T, I).
+    :param X_time_offset: ``numpy`` array; timestamp offsets from the response time with shape (N, T, I).
+    :param X_mask: ``numpy`` array; boolean impulse mask with shape (N, T, I).
+    :param Y_time: ``numpy`` vector; response timestamps with shape (N,).
+    :param float_type: ``str``; name of float type of outputs.
+    :param time_type: ``str`` or ``None``; name of float type of output timestamps. If ``None``, use **float_type**.
+    :return: triple of ``numpy`` arrays; the impulses, impulse timestamps, and impulse mask.
+    """
+
+    FLOAT_NP = getattr(np, float_type)
+    X_time = np.asarray(Y_time, dtype=np.float64)[:, None, None] - X_time_offset
+    X_time = np.where(X_mask, X_time, 0.).astype(time_type or float_type)
+
+    return X.astype(FLOAT_NP), X_time, X_mask.astype(FLOAT_NP)
+
+
+def get_t_delta(X_time, Y_time, float_type='float32'):
+    """
+    Compute the offsets of impulse timestamps back from their response timestamps.
+    The difference is taken in ``float64`` and only then cast to **float_type**, so that offsets remain precise even when absolute timestamps are too large to be represented exactly in **float_type**.
+
+    :param X_time: ``numpy`` array; expanded impulse timestamps with shape (N, T, I).
+    :param Y_time: ``numpy`` vector; response timestamps with shape (N,).
+    :param float_type: ``str``; name of float type of output.
+    :return: ``numpy`` array; time offsets with shape (N, T, I).
+    """
+
+    t_delta = np.asarray(Y_time, dtype=np.float64)[:, None, None] - np.asarray(X_time, dtype=np.float64)
+
+    return t_delta.astype(float_type)
+
+
+class ImpulseWindows(object):
+    """
+    Lazy windowed view of impulse data for CDR fitting/evaluation for a single response array.
+    Impulses from each table in **X** are stored once in a padded buffer, and the (B, T, I) impulse, timestamp, and mask
+    arrays for a batch of responses are only materialized when indexed (``windows[indices]``), via a strided
+    window view over the buffer. Memory therefore scales with the number of impulses rather than with the number
+    of responses times the history length.
+
+    :param X: ``list`` of ``pandas`` tables; impulse (predictor) data.
+    :param first_obs: ``list`` of index vectors (``list``, ``pandas`` series, or ``numpy`` vector) of first observations; the list contains vectors of row indices, one for each element of **X**, of the first impulse in the time series associated with the response.
+    :param last_obs: ``list`` of index vectors (``list``, ``pandas`` series, or ``numpy`` vector) of last observations; the list contains vectors of row indices, one for each element of **X**, of the last impulse in the time series associated with the response.
+    :param X_in_Y_names: ``list`` of ``str``; names of predictors contained in **Y** rather than **X**. If ``None``, no such predictors.
+    :param X_in_Y: ``pandas`` ``DataFrame`` or ``None``; table of predictors contained in **Y** rather than **X**. If ``None``, no such predictors.
+    :param impulse_names: ``list`` of ``str``; names of columns in **X** to be used as impulses by the model. If ``None``, all columns returned.
+    :param history_length: ``int``; maximum number of history (backward) observations.
+    :param future_length: ``int``; maximum number of future (forward) observations.
+    :param int_type: ``str``; name of int type.
+    :param float_type: ``str``; name of float type.
+    :param time_type: ``str`` or ``None``; name of float type of impulse timestamps. If ``None``, use **float_type**.
+    """
+
+    def __init__(
+            self,
+            X,
+            first_obs,
+            last_obs,
+            X_in_Y_names=None,
+            X_in_Y=None,
+            impulse_names=None,
+            history_length=128,
+            future_length=0,
+            int_type='int32',
+            float_type='float32',
+            time_type=None
+    ):
+        if X_in_Y_names is None:
+            X_in_Y_names = []
+        self.INT_NP = getattr(np, int_type)
+        self.FLOAT_NP = getattr(np, float_type)
+        self.window_length = history_length + future_length
+
+        impulse_names_X = sorted(list(set(impulse_names).difference(set(X_in_Y_names))))
+        impulse_names_X_todo = set(impulse_names_X)
+        impulse_names_X_tmp = []
+
+        self.buffers = []
+        self.first_obs = []
+        self.last_obs = []
+        for i, _X in enumerate(X):
+            impulse_names_1d_cur = impulse_names_X_todo.intersection(set(_X.columns))
+            if len(impulse_names_1d_cur) > 0:
+                impulse_names_X_todo = impulse_names_X_todo - impulse_names_1d_cur
+                impulse_names_1d_cur = sorted(list(impulse_names_1d_cur))
+                impulse_names_X_tmp += impulse_names_1d_cur
+                buffer = pad_impulse_sequence(
+                    _X[impulse_names_1d_cur],
+                    _X.time,
+                    self.window_length,
+                    float_type=float_type,
+                    time_type=time_type
+                )
+            else:
+                buffer = None
+            self.buffers.append(buffer)
+            self.first_obs.append(np.array(first_obs[i], dtype=self.INT_NP))
+            self.last_obs.append(np.array(last_obs[i], dtype=self.INT_NP))
+
+        assert len(impulse_names_X_todo) == 0, 'Not all impulses were processed during CDR data array construction. Remaining impulses: %s' % impulse_names_X_todo
+
+        self.impulse_names = impulse_names
+        self.impulse_names_X = impulse_names_X_tmp
+        self.X_in_Y_names = X_in_Y_names
+        if X_in_Y_names:
+            assert X_in_Y is not None, 'X_in_Y must be provided if X_in_Y_names is not ``None``.'
+            self.X_in_Y = X_in_Y[X_in_Y_names].values
+            self.X_in_Y_time = X_in_Y.time.values
         else:
-            _X_2d = np.zeros((len(first_obs[i]), window_length, 0))
-            _X_time_2d = np.zeros_like(_X_2d)
-            _X_mask = np.zeros_like(_X_2d)
-        X_2d.append(_X_2d)
-        X_time_out.append(_X_time_2d)
-        X_mask_out.append(_X_mask)
-
-    assert len(impulse_names_X_todo) == 0, 'Not all impulses were processed during CDR data array construction. Remaining impulses: %s' % impulse_names_X_todo
-    impulse_names_X = impulse_names_X_tmp
-
-    X_out = np.concatenate(X_2d, axis=-1)
-    X_out = X_out[:,:,names2ix(impulse_names_X, impulse_names_X_tmp)]
-    X_time_out = np.concatenate(X_time_out, axis=-1)
-    X_mask_out = np.concatenate(X_mask_out, axis=-1)
-
-    if X_in_Y_names:
-        assert X_in_Y is not None, 'X_in_Y must be provided if X_in_Y_names is not ``None``.'
-        if len(impulse_names_X):
-            T = X_out.shape[1]
+            self.X_in_Y = None
+            self.X_in_Y_time = None
+
+        self.ix = names2ix(impulse_names, impulse_names_X_tmp + X_in_Y_names)
+        self.aligned = np.array_equal(self.ix, np.arange(len(self.ix)))
+
+    def __len__(self):
+        if len(self.first_obs):
+            return len(self.first_obs[0])
+        return len(self.X_in_Y)
+
+    def __getitem__(self, ix):
+        """
+        Materialize impulse arrays for a subset of responses.
+
+        :param ix: ``slice`` or vector of row indices into the response array.
+        :return: triple of ``numpy`` arrays; impulses with shape (B, T, I), impulse timestamps with shape (B, T, I), and impulse mask with shape (B, T, I).
+        """
+
+        X_2d = []
+        X_time_out = []
+        X_mask_out = []
+
+        for buffer, first_obs, last_obs in zip(self.buffers, self.first_obs, self.last_obs):
+            if buffer is None:
+                _X_2d = np.zeros((len(first_obs[ix]), self.window_length, 0))
+                _X_time_2d = np.zeros_like(_X_2d)
+                _X_mask = np.zeros_like(_X_2d)
+            else:
+                _X_2d, _X_time_2d, _X_mask = gather_impulse_windows(
+                    buffer,
+                    first_obs[ix],
+                    last_obs[ix],
+                    self.window_length
+                )
+            X_2d.append(_X_2d)
+            X_time_out.append(_X_time_2d)
+            X_mask_out.append(_X_mask)
+
+        X_out = np.concatenate(X_2d, axis=-1)
+        X_time_out = np.concatenate(X_time_out, axis=-1)
+        X_mask_out = np.concatenate(X_mask_out, axis=-1)
+
+        if self.X_in_Y_names:
+            if len(self.impulse_names_X):
+                T = X_out.shape[1]
+            else:
+                T = 1
+                X_out = X_out[:, :T]
+                X_time_out = X_time_out[:, :T]
+                X_mask_out = X_mask_out[:, :T]
+            X_in_Y = self.X_in_Y[ix]
+            X_in_Y_shape = (X_out.shape[0], T, len(self.X_in_Y_names))
+            _X_in_Y = np.zeros(X_in_Y_shape)
+            _X_in_Y[:, -1, :] = X_in_Y
+            X_out = np.concatenate([X_out, _X_in_Y], axis=2)
+
+            time_X_2d_new = np.zeros(X_in_Y_shape)
+            time_X_2d_new[:, -1, :] = self.X_in_Y_time[ix][..., None]
+            X_time_out = np.concatenate([X_time_out, time_X_2d_new], axis=2)
+
+            time_mask_new = np.zeros(X_in_Y_shape)
+            time_mask_new[:, -1, :] = 1.
+            X_mask_out = np.concatenate([X_mask_out, time_mask_new], axis=2)
+
+        # Ensure that impulses are properly aligned
+        if not self.aligned:
+            X_out = X_out[:, :, self.ix]
+            X_time_out = X_time_out[:, :, self.ix]
+            X_mask_out = X_mask_out[:, :, self.ix]
+
+        # Find and mask non-finite predictor values
+        X_finite = np.isfinite(X_out)
+        X_mask_out *= X_finite
+
+        # Fill na to prevent non-finite values from entering the computation graph
+        X_out = np.nan_to_num(X_out)
+
+        return X_out, X_time_out, X_mask_out
+
+    def iter_batches(self, ixs, depth=0):
+        """
+        Materialize impulse arrays for a sequence of response subsets, in order.
+
+        :param ixs: iterable of ``slice`` or vectors of row indices into the response array.
+        :param depth: ``int``; number of batches to prepare ahead of time in a background thread. If ``0``, batches are prepared on demand.
+        :return: generator of triples of ``numpy`` arrays (see ``__getitem__``)
+        """
+
+        return prefetch_batches(self.__getitem__, ixs, depth=depth)
+
+    def parallelize(self, n_workers, batch_size=1024):
+        """
+        Get a view of these impulse windows that is materialized by a pool of **n_workers** worker processes reading the impulse buffers from shared memory.
+
+        :param n_workers: ``int``; number of worker processes.
+        :param batch_size: ``int``; typical maximum number of responses per request.
+        :return: ``ParallelImpulseWindows``
+        """
+
+        return ParallelImpulseWindows(self, n_workers, batch_size=batch_size)
+
+    def close(self):
+        """
+        Release any resources held by these impulse windows.
+
+        :return: ``None``
+        """
+
+        pass
+
+
+_IMPULSE_WINDOWS = None
+_IMPULSE_WINDOWS_SHM = None
+
+
+def _init_impulse_windows_worker(windows, buffer_specs, slot_names):
+    global _IMPULSE_WINDOWS, _IMPULSE_WINDOWS_SHM
+    shms = {}
+    buffers = []
+    for spec in buffer_specs:
+        if spec is None:
+            buffers.append(None)
         else:
-            T = 1
-            X_out = X_out[:, :T]
-            X_time_out = X_time_out[:, :T]
-            X_mask_out = X_mask_out[:, :T]
-        X_in_Y_shape = (X_out.shape[0], T, len(X_in_Y_names))
-        _X_in_Y = np.zeros(X_in_Y_shape)
-        _X_in_Y[:, -1, :] = X_in_Y[X_in_Y_names].values
-        X_out = np.concatenate([X_out, _X_in_Y], axis=2)
-
-        time_X_2d_new = np.zeros(X_in_Y_shape)
-        time_X_2d_new[:, -1, :] = X_in_Y.time.values[..., None]
-        X_time_out = np.concatenate([X_time_out, time_X_2d_new], axis=2)
-
-        time_mask_new = np.zeros(X_in_Y_shape)
-        time_mask_new[:,-1,:] = 1.
-        X_mask_out = np.concatenate([X_mask_out, time_mask_new], axis=2)
-
-    # Ensure that impulses are properly aligned
-    impulse_names_cur = impulse_names_X + X_in_Y_names
-    ix = names2ix(impulse_names, impulse_names_cur)
-    X_out = X_out[:,:,ix]
-    X_time_out = X_time_out[:,:,ix]
-    X_mask_out = X_mask_out[:,:,ix]
-
-    # Find and mask non-finite predictor values
-    X_finite = np.isfinite(X_out)
-    X_mask_out *= X_finite
+            arrs = []
+            for name, shape, dtype in spec[:2]:
+                shms[name] = shared_memory.SharedMemory(name=name)
+                arrs.append(np.ndarray(shape, dtype=dtype, buffer=shms[name].buf))
+            buffers.append((arrs[0], arrs[1], spec[2]))
+    for name in slot_names:
+        shms[name] = shared_memory.SharedMemory(name=name)
+    windows.buffers = buffers
+    _IMPULSE_WINDOWS = windows
+    _IMPULSE_WINDOWS_SHM = shms
+
+
+def _get_impulse_windows(ix, slot_name):
+    out = _IMPULSE_WINDOWS[ix]
+    slot = _IMPULSE_WINDOWS_SHM[slot_name]
+    if sum(x.nbytes for x in out) > slot.size:
+        # Too large for the output slot, return through the result pipe instead
+        return out, None
+    specs = []
+    offset = 0
+    for x in out:
+        np.ndarray(x.shape, dtype=x.dtype, buffer=slot.buf, offset=offset)[:] = x
+        specs.append((x.shape, x.dtype, offset))
+        offset += x.nbytes
+
+    return None, specs
+
+
+def _release_impulse_windows(pool, shms):
+    pool.shutdown(wait=True)
+    for shm in shms:
+        shm.close()
+        shm.unlink()
+
+
+class ParallelImpulseWindows(object):
+    """
+    Process-parallel version of ``ImpulseWindows``.
+    The padded impulse buffers are copied once into shared memory, and worker processes materialize (B, T, I) arrays for requested subsets of responses from there, writing them into shared output slots.
+    Use ``iter_batches`` to keep all workers busy with upcoming batches.
+    Shared memory is released by ``close`` or when the object is garbage collected.
+
+    :param windows: ``ImpulseWindows``; impulse windows to parallelize.
+    :param n_workers: ``int``; number of worker processes.
+    :param batch_size: ``int``; maximum number of responses per request, used to size the output slots. Larger requests are still supported but are returned more slowly.
+    """
 
-    # Fill na to prevent non-finite values from entering the computation graph
-    X_out = np.nan_to_num(X_out)
+    def __init__(self, windows, n_workers, batch_size=1024):
+        self.n_workers = n_workers
+        self.n = len(windows)
+
+        shms = []
+        buffer_specs = []
+        for buffer in windows.buffers:
+            if buffer is None:
+                buffer_specs.append(None)
+            else:
+                spec = []
+                for arr in buffer[:2]:
+                    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                    shms.append(shm)
+                    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+                    spec.append((shm.name, arr.shape, arr.dtype))
+                spec.append(buffer[2])
+                buffer_specs.append(tuple(spec))
+
+        # One output slot per request that can be in flight. Each slot holds the impulse, timestamp, and mask arrays.
+        slot_size = 3 * batch_size * max(windows.window_length, 1) * max(len(windows.impulse_names), 1) * 8
+        self.slots = {}
+        self.free_slots = queue.Queue()
+        for _ in range(2 * n_workers):
+            shm = shared_memory.SharedMemory(create=True, size=slot_size)
+            shms.append(shm)
+            self.slots[shm.name] = shm
+            self.free_slots.put(shm.name)
+
+        # Everything except the (large) impulse buffers is sent to each worker once
+        meta = copy.copy(windows)
+        meta.buffers = []
+
+        self.pool = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_impulse_windows_worker,
+            initargs=(meta, buffer_specs, list(self.slots))
+        )
+        self._finalizer = weakref.finalize(self, _release_impulse_windows, self.pool, shms)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, ix):
+        slot_name = self.free_slots.get()
+        try:
+            out, specs = self.pool.submit(_get_impulse_windows, ix, slot_name).result()
+            if out is None:
+                buf = self.slots[slot_name].buf
+                out = tuple(np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset).copy() for shape, dtype, offset in specs)
+        finally:
+            self.free_slots.put(slot_name)
+
+        return out
+
+    def iter_batches(self, ixs, depth=None):
+        """
+        Materialize impulse arrays for a sequence of response subsets, in order, preparing upcoming batches in parallel.
+
+        :param ixs: iterable of ``slice`` or vectors of row indices into the response array.
+        :param depth: ``int`` or ``None``; number of batches to prepare ahead of time. If ``None``, equal to the number of workers.
+        :return: generator of triples of ``numpy`` arrays (see ``ImpulseWindows.__getitem__``)
+        """
+
+        if depth is None:
+            depth = self.n_workers
+
+        return prefetch_batches(self.__getitem__, ixs, depth=depth, n_workers=max(depth, 1))
 
-    return X_out, X_time_out, X_mask_out
+    def parallelize(self, n_workers, batch_size=1024):
+        return self
+
+    def close(self):
+        """
+        Shut down the worker pool and release shared memory.
+
+        :return: ``None``
+        """
+
+        self._finalizer()
+
+
+def get_gf_lookup(gf_map):
+    """
+    Precompute a vectorized lookup table from a map of random grouping factor levels to indices, for use with ``map_gf_levels``.
+
+    :param gf_map: ``dict``; map from levels (as ``str``) to indices. If a ``defaultdict``, unknown levels are mapped to its default value, otherwise to NaN.
+    :return: 2-tuple; ``pandas`` ``Index`` of levels and ``numpy`` vector of their indices, with the index for unknown levels appended at the end.
+    """
+
+    levels = pd.Index(list(gf_map.keys()))
+    ix = list(gf_map.values())
+    if isinstance(gf_map, defaultdict) and gf_map.default_factory is not None:
+        ix.append(gf_map.default_factory())
+    else:
+        ix.append(np.nan)
+
+    return levels, np.array(ix)
+
+
+def map_gf_levels(values, gf_map):
+    """
+    Map random grouping factor levels to their indices.
+    Equivalent to mapping ``values.astype(str)`` through **gf_map**, but only the unique values (and missing values, which are labeled by their own string values) are converted and looked up, and the result is then gathered for all rows at once.
+
+    :param values: ``pandas`` ``Series`` or ``numpy`` vector; random grouping factor levels.
+    :param gf_map: ``dict`` or lookup from ``get_gf_lookup``; map from levels (as ``str``) to indices.
+    :return: ``numpy`` vector; level indices.
+    """
+
+    if isinstance(gf_map, dict):
+        gf_map = get_gf_lookup(gf_map)
+    levels, ix = gf_map
+
+    if values.dtype == object and \
+            pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'integer', 'floating', 'boolean', 'empty'):
+        # Values of different types can compare equal (e.g. 1, 1.0 and True) but have different string values
+        values = np.array([str(x) for x in values], dtype=object)
+    codes, uniques = pd.factorize(values)
+    unique_ix = levels.get_indexer(pd.Index(uniques).astype(str))
+    # Missing values (e.g. None or NaN) are all coded -1, so label them by their own string values
+    missing = codes < 0
+    if missing.any():
+        missing_codes, missing_labels = pd.factorize(
+            np.array([str(x) for x in np.asarray(values)[missing]], dtype=object)
+        )
+        codes[missing] = missing_codes + len(unique_ix)
+        unique_ix = np.append(unique_ix, levels.get_indexer(missing_labels))
+    # Unknown levels are -1, which selects the index for unknown levels at the end of ``ix``
+    unique_ix = ix.take(unique_ix)
+
+    return unique_ix.take(codes)
+
+
+def map_gf_table(Y_gf, gf_map):
+    """
+    Map each column of a table of random grouping factor levels to level indices using ``map_gf_levels``.
+
+    :param Y_gf: ``pandas`` ``DataFrame``; random grouping factor levels, one column per grouping factor.
+    :param gf_map: ``list`` of ``dict`` or of lookups from ``get_gf_lookup``; one map per column of **Y_gf**.
+    :return: ``numpy`` array; level indices with shape (len(Y_gf), number of grouping factors).
+    """
+
+    if not len(Y_gf.columns):
+        return np.zeros((len(Y_gf), 0), dtype=int)
+
+    return np.stack([map_gf_levels(Y_gf[col], gf_map[i]) for i, col in enumerate(Y_gf.columns)], axis=1)
+
+
+def combine_gf_levels(Y_gf, sep='_'):
+    """
+    Combine several random grouping factor columns into a single factor whose levels are the jointly unique combinations of their levels, labeled by joining the string values of each column with **sep** (e.g. for grouping factors like ``subject:item``).
+    Each column is factorized and the codes are combined arithmetically, so only the unique combinations are converted to strings.
+
+    :param Y_gf: ``pandas`` ``DataFrame``; random grouping factor levels, one column per factor to combine.
+    :param sep: ``str``; separator between levels in combined labels.
+    :return: ``numpy`` vector; combined level labels.
+    """
+
+    dtypes = list(Y_gf.dtypes)
+    # Rows of a table with mixed numeric types are upcast to a common type before conversion to string
+    if all(pd.api.types.is_numeric_dtype(x) and not pd.api.types.is_bool_dtype(x) for x in dtypes):
+        common_type = np.result_type(*[np.dtype(x) for x in dtypes])
+    else:
+        common_type = None
+
+    codes = np.zeros(len(Y_gf), dtype='int64')
+    labels = np.full(1, '', dtype=object)
+    for i, col in enumerate(Y_gf.columns):
+        vals = Y_gf[col].values
+        _codes, uniques = pd.factorize(vals)
+        uniques = np.asarray(uniques)
+        if common_type is not None:
+            uniques = uniques.astype(common_type)
+        _labels = [str(x) for x in uniques]
+        # Missing values (e.g. None or NaN) are all coded -1, so label them by their own string values
+        missing = _codes < 0
+        if missing.any():
+            missing_codes, missing_labels = pd.factorize(np.array([str(x) for x in vals[missing]], dtype=object))
+            _codes[missing] = missing_codes + len(_labels)
+            _labels += list(missing_labels)
+        _labels = np.array(_labels, dtype=object)
+        if i > 0:
+            labels = labels[:, None] + sep
+        else:
+            labels = labels[:, None]
+        labels = (labels + _labels[None, :]).reshape(-1)
+        codes = codes * len(_labels) + _codes
+        # Keep only the combinations that occur, so the label table stays small
+        codes, combos = pd.factorize(codes)
+        labels = labels[combos]
+
+    return labels[codes]
 
 
 def get_rangf_array(
@@ -555,7 +1215,7 @@ def get_rangf_array(
 
     :param Y: ``pandas`` table or ``list`` of ``pandas`` tables; response data.
     :param rangf_names: ``list`` of ``str``; names of columns containing random grouping factor levels (order is preserved, changing the order will change the resulting array).
-    :param rangf_map: ``list`` of ``dict``; map for each random grouping factor from levels to unique indices.
+    :param rangf_map: ``list`` of ``dict`` or of lookups from ``get_gf_lookup``; map for each random grouping factor from levels to unique indices.
     :return:
     """
 
@@ -565,11 +1225,7 @@ def get_rangf_array(
     Y_rangf = []
 
     for _Y in Y:
-        _Y_rangf = _Y[rangf_names]
-        for i in range(len(rangf_names)):
-            c = rangf_names[i]
-            _Y_rangf[c] = pd.Series(_Y_rangf[c].astype(str)).map(rangf_map[i])
-        _Y_rangf = np.array(_Y_rangf, dtype=int)
+        _Y_rangf = map_gf_table(_Y[rangf_names], rangf_map).astype(int)
         Y_rangf.append(_Y_rangf)
 
     Y_rangf = np.concatenate(Y_rangf, axis=0)
@@ -577,66 +1233,40 @@ def get_rangf_array(
     return Y_rangf
 
 
-def get_time_windows(
-        X,
-        Y,
-        series_ids,
-        forward=False,
-        window_length=128,
-        t_delta_cutoff=None,
-        verbose=True
-):
+def get_series_codes(X, Y, series_ids):
     """
-    Compute row indices in **X** of initial and final impulses for each element of **y**.
-    Assumes time series are already sorted by **series_ids**.
+    Factorize the jointly unique values of **series_ids** in **X** and **Y** into shared integer codes.
 
     :param X: ``pandas`` ``DataFrame``; impulse (predictor) data.
     :param Y: ``pandas`` ``DataFrame``; response data.
     :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
-    :param forward: ``bool``; whether to compute forward windows (future inputs) or backward windows (past inputs, used if **forward** is ``False``).
-    :param window_length: ``int``; maximum size of time window to consider. If ``np.inf``, no bound on window size.
-    :param t_delta_cutoff: ``float`` or ``None``; maximum distance in time to consider (can help improve training stability on data with large gaps in time). If ``0`` or ``None``, no cutoff.
-    :param verbose: ``bool``; whether to report progress to stderr
-    :return: 2-tuple of ``numpy`` vectors; first and last impulse observations (respectively) for each response in **y**
+    :return: 2-tuple of ``numpy`` vectors; integer series codes for each row in **X** and each row in **Y**
     """
 
-    if window_length is None:
-        window_length = 0
-
     m = len(X)
     n = len(Y)
 
-    Y = Y.reset_index(drop=True)
+    if not series_ids:
+        return np.zeros(m, dtype='int64'), np.zeros(n, dtype='int64')
 
-    if forward: # Reverse the time dimension
-        X = X.copy()
-        X['time'] = -X['time']
-        X = X.sort_values(series_ids + ['time'])
-        Y = Y.copy()
-        Y['time'] = -Y['time']
-        Y = Y.sort_values(series_ids + ['time'])
+    codes = np.zeros(m + n, dtype='int64')
+    for col in series_ids:
+        vals = np.concatenate([np.asarray(X[col], dtype=object), np.asarray(Y[col], dtype=object)])
+        _codes, uniques = pd.factorize(vals)
+        codes = codes * (len(uniques) + 1) + _codes + 1
+        codes = pd.factorize(codes)[0].astype('int64')
 
-    X_time = np.array(X.time)
-    Y_time = np.array(Y.time)
+    return codes[:m], codes[m:]
 
-    X_id_vectors = []
-    Y_id_vectors = []
 
-    if series_ids:
-        for i in range(len(series_ids)):
-            col = series_ids[i]
-            X_id_vectors.append(np.array(X[col]))
-            Y_id_vectors.append(np.array(Y[col]))
-        X_id_vectors = np.stack(X_id_vectors, axis=1)
-        Y_id_vectors = np.stack(Y_id_vectors, axis=1)
-    else:
-        X_id_vectors = np.ones((len(X), 1))
-        Y_id_vectors = np.ones((len(Y), 1))
+def _get_time_window_bounds_loop(X_time, Y_time, X_id_vectors, Y_id_vectors, t_delta_cutoff=None, verbose=True):
+    m = len(X_time)
+    n = len(Y_time)
 
     Y_id = Y_id_vectors[0]
 
-    first_obs = np.zeros(len(Y)).astype('int32')
-    last_obs = np.zeros(len(Y)).astype('int32')
+    start_out = np.zeros(n, dtype='int64')
+    end_out = np.zeros(n, dtype='int64')
 
     # i iterates y
     i = 0
@@ -671,18 +1301,186 @@ def get_time_windows(
                 start = j
             end = j
 
-        if forward:
-            # We're slicing backward so first_obs is an included bound,
-            # need to shift it along the sorted X axis
-            # but make sure it doesn't go past the start index
-            first_obs[i] = max(end - 1, start)
-            last_obs[i] = start
-        else:
-            first_obs[i] = start
-            last_obs[i] = end
+        start_out[i] = start
+        end_out[i] = end
 
         i += 1
 
+    stderr('\n')
+
+    return start_out, end_out
+
+
+def _get_time_window_bounds_vectorized(X_time, Y_time, X_codes, Y_codes, t_delta_cutoff=None, use_jit=True):
+    m = len(X_time)
+    n = len(Y_time)
+    epsilon = np.finfo(np.float32).eps
+
+    start = np.zeros(n, dtype='int64')
+    end = np.zeros(n, dtype='int64')
+    if m == 0 or n == 0:
+        return start, end
+
+    # Series are contiguous in X, so each series occupies a single segment [seg_start, seg_end)
+    seg_start = np.concatenate([[0], np.flatnonzero(X_codes[1:] != X_codes[:-1]) + 1])
+    seg_codes = X_codes[seg_start]
+    assert len(np.unique(seg_codes)) == len(seg_codes), 'X must be sorted by series_ids.'
+    code2seg = np.full(max(X_codes.max(), Y_codes.max()) + 1, -1, dtype='int64')
+    code2seg[seg_codes] = np.arange(len(seg_codes))
+    X_seg = code2seg[X_codes]
+    Y_seg = code2seg[Y_codes]
+    Y_has_seg = Y_seg >= 0
+    Y_seg = np.maximum(Y_seg, 0)
+
+    # Rank all timestamps jointly so that (segment, time) pairs can be compared as exact integer keys
+    Y_time_upper = Y_time + epsilon
+    vals = [X_time, Y_time_upper]
+    if t_delta_cutoff:
+        vals.append(Y_time - t_delta_cutoff)
+    _, ranks = np.unique(np.concatenate(vals), return_inverse=True)
+    ranks = ranks.reshape(-1)
+    K = ranks.max() + 1
+    X_key = X_seg * K + ranks[:m]
+    Y_key_upper = Y_seg * K + ranks[m:m + n]
+
+    start = np.where(Y_has_seg, seg_start[Y_seg], 0)
+    end = np.where(Y_has_seg, np.searchsorted(X_key, Y_key_upper, side='right'), 0)
+
+    if t_delta_cutoff:
+        Y_key_lower = Y_seg * K + ranks[m + n:]
+        first_near = np.minimum(np.searchsorted(X_key, Y_key_lower, side='left'), end)
+        if use_jit and _apply_t_delta_cutoff_jit is not None:
+            apply_cutoff = _apply_t_delta_cutoff_jit
+        else:
+            apply_cutoff = _apply_t_delta_cutoff
+        start = apply_cutoff(X_time, Y_time, Y_seg, Y_has_seg, start, end, first_near, float(t_delta_cutoff))
+
+    return start, end
+
+
+def _apply_t_delta_cutoff(X_time, Y_time, Y_seg, Y_has_seg, start, end, first_near, t_delta_cutoff):
+    # The start pointer is only re-checked against the current response when the end pointer advances,
+    # so its value depends on the preceding response in the series. Resolve this short scalar recurrence
+    # over the precomputed bounds.
+    start = start.copy()
+    n = len(Y_time)
+    seg_prev = -1
+    s_prev = e_prev = 0
+    for i in range(n):
+        if not Y_has_seg[i]:
+            continue
+        if Y_seg[i] != seg_prev:
+            seg_prev = Y_seg[i]
+            s_prev = e_prev = start[i]
+        e = end[i]
+        s = s_prev
+        if e > e_prev and np.fabs(X_time[s] - Y_time[i]) > t_delta_cutoff:
+            s = max(e_prev + 1, first_near[i])
+            while s > e_prev + 1 and not np.fabs(X_time[s - 1] - Y_time[i]) > t_delta_cutoff:
+                s -= 1
+            while s < e and np.fabs(X_time[s] - Y_time[i]) > t_delta_cutoff:
+                s += 1
+            s = min(s, e)
+        start[i] = s
+        s_prev = s
+        e_prev = e
+
+    return start
+
+
+# Compiled version of the recurrence above, used automatically if numba is installed
+if numba is not None:
+    _apply_t_delta_cutoff_jit = numba.njit(cache=True)(_apply_t_delta_cutoff)
+else:
+    _apply_t_delta_cutoff_jit = None
+
+
+def get_time_windows(
+        X,
+        Y,
+        series_ids,
+        forward=False,
+        window_length=128,
+        t_delta_cutoff=None,
+        vectorized=True,
+        verbose=True
+):
+    """
+    Compute row indices in **X** of initial and final impulses for each element of **y**.
+    Assumes time series are already sorted by **series_ids**.
+
+    :param X: ``pandas`` ``DataFrame``; impulse (predictor) data.
+    :param Y: ``pandas`` ``DataFrame``; response data.
+    :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
+    :param forward: ``bool``; whether to compute forward windows (future inputs) or backward windows (past inputs, used if **forward** is ``False``).
+    :param window_length: ``int``; maximum size of time window to consider. If ``np.inf``, no bound on window size.
+    :param t_delta_cutoff: ``float`` or ``None``; maximum distance in time to consider (can help improve training stability on data with large gaps in time). If ``0`` or ``None``, no cutoff.
+    :param vectorized: ``bool``; whether to compute window bounds for all responses at once using ``np.searchsorted`` over per-series boundaries. If ``False``, walks the data row by row (slower, retained for reference).
+    :param verbose: ``bool``; whether to report progress to stderr
+    :return: 2-tuple of ``numpy`` vectors; first and last impulse observations (respectively) for each response in **y**
+    """
+
+    if window_length is None:
+        window_length = 0
+
+    Y = Y.reset_index(drop=True)
+
+    if forward: # Reverse the time dimension
+        X = X.copy()
+        X['time'] = -X['time']
+        X = X.sort_values(series_ids + ['time'])
+        Y = Y.copy()
+        Y['time'] = -Y['time']
+        Y = Y.sort_values(series_ids + ['time'])
+
+    X_time = np.array(X.time)
+    Y_time = np.array(Y.time)
+
+    if vectorized:
+        X_codes, Y_codes = get_series_codes(X, Y, series_ids)
+        start, end = _get_time_window_bounds_vectorized(
+            np.asarray(X_time, dtype='float64'),
+            np.asarray(Y_time, dtype='float64'),
+            X_codes,
+            Y_codes,
+            t_delta_cutoff=t_delta_cutoff
+        )
+        if verbose:
+            stderr('\r%d/%d\n' % (len(Y), len(Y)))
+    else:
+        X_id_vectors = []
+        Y_id_vectors = []
+
+        if series_ids:
+            for i in range(len(series_ids)):
+                col = series_ids[i]
+                X_id_vectors.append(np.array(X[col]))
+                Y_id_vectors.append(np.array(Y[col]))
+            X_id_vectors = np.stack(X_id_vectors, axis=1)
+            Y_id_vectors = np.stack(Y_id_vectors, axis=1)
+        else:
+            X_id_vectors = np.ones((len(X), 1))
+            Y_id_vectors = np.ones((len(Y), 1))
+
+        start, end = _get_time_window_bounds_loop(
+            X_time,
+            Y_time,
+            X_id_vectors,
+            Y_id_vectors,
+            t_delta_cutoff=t_delta_cutoff,
+            verbose=verbose
+        )
+
+    if forward:
+        # We're slicing backward so first_obs is an included bound,
+        # need to shift it along the sorted X axis
+        # but make sure it doesn't go past the start index
+        first_obs = np.maximum(end - 1, start)
+        last_obs = start
+    else:
+        first_obs = start
+        last_obs = end
+
     # Unsort X indices
     first_obs = X.index[first_obs]
     last_obs = np.concatenate([np.array(X.index), [len(X)]])[last_obs]
@@ -700,8 +1498,6 @@ def get_time_windows(
     elif np.isfinite(window_length): # Backward with finite window length
         first_obs = np.maximum(first_obs, last_obs - window_length)
 
-    stderr('\n')
-
     return first_obs, last_obs
 
 
@@ -843,8 +1639,64 @@ def compute_partition(y, modulus, n):
     return partition
 
 
+def pad_impulse_sequence(X, X_time, window_length, float_type='float32', time_type=None, fill=0.):
+    """
+    Prepend **window_length** padding rows to an impulse stream so that a window of length **window_length** ending at any row of **X** can be read as a strided view.
+
+    :param X: ``pandas`` ``DataFrame``; impulse (predictor) data.
+    :param X_time: ``pandas`` ``Series``; timestamps associated with each impulse in **X**.
+    :param window_length: ``int``; number of steps in time dimension of output
+    :param float_type: ``str``; name of float type.
+    :param time_type: ``str`` or ``None``; name of float type of timestamps. If ``None``, use **float_type**.
+    :param fill: ``float``; fill value for padding cells.
+    :return: 3-tuple; the padded impulse buffer with shape (window_length + len(X), K), the padded timestamp buffer with shape (window_length + len(X),), and **fill**.
+    """
+
+    FLOAT_NP = getattr(np, float_type)
+    TIME_NP = getattr(np, time_type or float_type)
+    X = np.array(X, dtype=FLOAT_NP)
+    X_time = np.array(X_time, dtype=TIME_NP)
+
+    X_pad = np.full((window_length + X.shape[0], X.shape[1]), fill, dtype=FLOAT_NP)
+    X_pad[window_length:] = X
+    X_time_pad = np.zeros(window_length + X_time.shape[0], dtype=TIME_NP)
+    X_time_pad[window_length:] = X_time
+
+    return X_pad, X_time_pad, fill
+
+
+def gather_impulse_windows(buffer, first_obs, last_obs, window_length):
+    """
+    Read right-aligned impulse windows out of a padded buffer from ``pad_impulse_sequence``.
+
+    :param buffer: 3-tuple; output of ``pad_impulse_sequence``.
+    :param first_obs: ``numpy`` vector of row indices in the (unpadded) impulse data of the first impulse in the time series associated with each response.
+    :param last_obs: ``numpy`` vector of row indices in the (unpadded) impulse data of the last preceding impulse in the time series associated with each response.
+    :param window_length: ``int``; number of steps in time dimension of output
+    :return: 3-tuple of ``numpy`` arrays; the expanded impulse array, the expanded timestamp array, and a boolean mask zeroing out locations of non-existent impulses.
+    """
+
+    X_pad, X_time_pad, fill = buffer
+    FLOAT_NP = X_pad.dtype.type
+    K = X_pad.shape[1]
+
+    # Row i of the window views covers unpadded rows [i - window_length, i)
+    X_windows = np.lib.stride_tricks.sliding_window_view(X_pad, window_length, axis=0)
+    X_time_windows = np.lib.stride_tricks.sliding_window_view(X_time_pad, window_length, axis=0)
+
+    src = last_obs[:, None] - window_length + np.arange(window_length)[None, :]
+    valid = src >= first_obs[:, None]
+
+    X_2d = np.where(valid[..., None], np.swapaxes(X_windows[last_obs], 1, 2), FLOAT_NP(fill))
+    time_X_2d = np.where(valid, X_time_windows[last_obs], FLOAT_NP(0))
+    time_X_2d = np.repeat(time_X_2d[..., None], K, axis=-1)
+    time_mask = np.repeat(valid[..., None], K, axis=-1).astype(FLOAT_NP)
+
+    return X_2d, time_X_2d, time_mask
+
+
 def expand_impulse_sequence(
-        X, X_time, first_obs, last_obs, window_length, int_type='int32', float_type='float32', fill=0.):
+        X, X_time, first_obs, last_obs, window_length, int_type='int32', float_type='float32', time_type=None, fill=0.):
     """
     Expand out impulse stream in **X** for each response in the target data.
 
@@ -855,30 +1707,61 @@ def expand_impulse_sequence(
     :param window_length: ``int``; number of steps in time dimension of output
     :param int_type: ``str``; name of int type.
     :param float_type: ``str``; name of float type.
+    :param time_type: ``str`` or ``None``; name of float type of timestamps. If ``None``, use **float_type**.
     :param fill: ``float``; fill value for padding cells.
     :return: 3-tuple of ``numpy`` arrays; the expanded impulse array, the expanded timestamp array, and a boolean mask zeroing out locations of non-existent impulses.
     """
 
     INT_NP = getattr(np, int_type)
-    FLOAT_NP = getattr(np, float_type)
     last_obs = np.array(last_obs, dtype=INT_NP)
     first_obs = np.array(first_obs, dtype=INT_NP)
-    X_time = np.array(X_time, dtype=FLOAT_NP)
-    X = np.array(X)
+    buffer = pad_impulse_sequence(X, X_time, window_length, float_type=float_type, time_type=time_type, fill=fill)
 
-    X_2d = np.full((first_obs.shape[0], window_length, X.shape[1]), fill, dtype=FLOAT_NP)
-    time_X_2d = np.zeros_like(X_2d)
-    time_mask = np.zeros_like(X_2d)
+    return gather_impulse_windows(buffer, first_obs, last_obs, window_length)
 
-    for i, first, last in zip(np.arange(first_obs.shape[0]), first_obs, last_obs):
-        if first < last:
-            sX = X[first:last]
-            sXt = X_time[first:last]
-            X_2d[i, -sX.shape[0]:] = sX
-            time_X_2d[i][-len(sXt):] = sXt[..., None]
-            time_mask[i][-len(sXt):] = 1
 
-    return X_2d, time_X_2d, time_mask
+def get_window_distances(E, first_obs, last_obs, window_length, metric='cosine', out=None):
+    """
+    Compute the distance between the most recent impulse embedding and each impulse embedding in the (right-aligned) window of each response.
+    Gives the same result as measuring distances over the output of ``expand_impulse_sequence`` (with distances to missing or padding cells set to 0), but embeddings are gathered one timestep at a time, so the full (N, T, D) window array is never materialized.
+
+    :param E: ``numpy`` array; impulse embeddings with shape (number of impulses, D).
+    :param first_obs: ``numpy`` vector of row indices in **E** of the first impulse in the time series associated with each response.
+    :param last_obs: ``numpy`` vector of row indices in **E** of the last preceding impulse in the time series associated with each response.
+    :param window_length: ``int``; number of steps in time dimension of output
+    :param metric: ``str``; distance metric, one of ``'cosine'`` (cosine similarity) or ``'euclidean'``.
+    :param out: ``numpy`` array or ``None``; array with shape (N, T) to write the distances into. If ``None``, a new array is allocated.
+    :return: ``numpy`` array; distances with shape (N, T).
+    """
+
+    assert metric in ('cosine', 'euclidean'), 'Unrecognized distance metric "%s"' % metric
+
+    first_obs = np.asarray(first_obs)
+    last_obs = np.asarray(last_obs)
+    if out is None:
+        out = np.zeros((len(last_obs), window_length), dtype=E.dtype)
+
+    base_ix = last_obs - 1
+    base_valid = base_ix >= first_obs
+    base_ix = np.maximum(base_ix, 0)
+    base = E[base_ix]
+    if metric == 'cosine':
+        norms = np.sqrt((E ** 2).sum(axis=1))
+        base_norms = norms[base_ix]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for t in range(window_length):
+            src = last_obs - window_length + t
+            valid = base_valid & (src >= first_obs)
+            src = np.maximum(src, 0)
+            E_t = E[src]
+            if metric == 'cosine':
+                d = (base * E_t).sum(axis=1) / (base_norms * norms[src])
+            else:
+                d = np.sqrt(((base - E_t) ** 2).sum(axis=1))
+            out[:, t] = np.where(valid & np.isfinite(d), d, 0.)
+
+    return out
 
 
 def compute_time_mask(
@@ -907,15 +1790,32 @@ def compute_time_mask(
     FLOAT_NP = getattr(np, float_type)
     first_obs = np.array(first_obs, dtype=INT_NP)
     last_obs = np.array(last_obs, dtype=INT_NP)
-    X_time = np.array(X_time, dtype=FLOAT_NP)
+    window_length = history_length + future_length
+
+    # Windows are right-aligned, so each row is unmasked over its last (number of observations in window) steps
+    n_obs = np.clip(np.minimum(last_obs, len(X_time)) - first_obs, 0, window_length)
+    time_mask = np.arange(window_length)[None, :] >= (window_length - n_obs)[:, None]
+
+    return time_mask.astype(FLOAT_NP)
+
+
+def get_data_hash(tables):
+    """
+    Compute a hash of the contents (values, index, column names, and dtypes) of one or more tables.
+
+    :param tables: ``pandas`` table or ``list`` of ``pandas`` tables; data to hash.
+    :return: ``str``; hexadecimal hash
+    """
 
-    time_mask = np.zeros((first_obs.shape[0], history_length + future_length), dtype=FLOAT_NP)
+    if not isinstance(tables, list):
+        tables = [tables]
 
-    for i, first, last in zip(np.arange(first_obs.shape[0]), first_obs, last_obs):
-        sXt = X_time[first:last]
-        time_mask[i][-len(sXt):] = 1
+    h = hashlib.sha1()
+    for table in tables:
+        h.update(repr([(str(c), str(table[c].dtype)) for c in table.columns]).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(table, index=True).values.tobytes())
 
-    return time_mask
+    return h.hexdigest()
 
 
 def preprocess_data(
@@ -928,6 +1828,8 @@ def preprocess_data(
         future_length=0,
         t_delta_cutoff=None,
         all_interactions=False,
+        vectorized_time_windows=True,
+        cache_dir=None,
         verbose=True,
         debug=False
 ):
@@ -943,6 +1845,8 @@ def preprocess_data(
     :param future_length: ``int``; maximum number of future (forward) observations.
     :param t_delta_cutoff: ``float`` or ``None``; maximum distance in time to consider (can help improve training stability on data with large gaps in time). If ``0`` or ``None``, no cutoff.
     :param all_interactions: ``bool``; add powerset of all conformable interactions.
+    :param vectorized_time_windows: ``bool``; whether to compute time windows for all responses at once (see ``get_time_windows``). If ``False``, uses the row-by-row implementation.
+    :param cache_dir: ``str`` or ``None``; directory in which to persist preprocessing artifacts, keyed by hashes of the input data and the preprocessing settings. Time windows are shared by all calls with the same data, **series_ids**, **filters**, **history_length**, **future_length**, and **t_delta_cutoff**, and fully preprocessed data are shared by all calls that additionally have the same formulas. If ``None``, no caching.
     :param verbose: ``bool``; whether to report progress to stderr
     :param debug: ``bool``; print debugging information
     :return: 7-tuple; predictor data, response data, filtering mask, response-aligned predictor names, response-aligned predictors, 2D predictor names, and 2D predictors
@@ -956,6 +1860,32 @@ def preprocess_data(
     if not isinstance(Y, list):
         Y = [Y]
 
+    if cache_dir is not None:
+        window_key = repr((
+            get_data_hash(X + Y),
+            list(series_ids),
+            filters,
+            history_length,
+            future_length,
+            t_delta_cutoff
+        ))
+        window_key = hashlib.sha1(window_key.encode('utf-8')).hexdigest()
+        window_path = os.path.join(cache_dir, 'windows_%s.pkl' % window_key)
+        artifact_key = repr((
+            window_key,
+            [str(x) for x in formula_list],
+            all_interactions
+        ))
+        artifact_key = hashlib.sha1(artifact_key.encode('utf-8')).hexdigest()
+        artifact_path = os.path.join(cache_dir, 'preprocessed_%s.pkl' % artifact_key)
+
+        cached = read_cache(artifact_path, verbose=verbose)
+        if cached is not None:
+            return cached
+        windows = read_cache(window_path, verbose=verbose)
+    else:
+        windows = None
+
     select = []
     for i, _Y in enumerate(Y):
         if filters is None:
@@ -968,8 +1898,12 @@ def preprocess_data(
 
     X_in_Y_names = None
 
-    if history_length or future_length:
-        X_new = []
+    if windows is not None:
+        for j, _Y in enumerate(Y):
+            for col in windows[j]:
+                _Y[col] = windows[j][col]
+            Y[j] = _Y
+    elif history_length or future_length:
         for i in range(len(X)):
             _X = X[i]
             if verbose:
@@ -983,7 +1917,9 @@ def preprocess_data(
                         _Y,
                         series_ids,
                         window_length=history_length,
-                        t_delta_cutoff=t_delta_cutoff
+                        t_delta_cutoff=t_delta_cutoff,
+                        vectorized=vectorized_time_windows,
+                        verbose=verbose
                     )
                     first_obs_b, last_obs_b = first_obs, last_obs
                 else:
@@ -997,7 +1933,9 @@ def preprocess_data(
                         series_ids,
                         forward=True,
                         window_length=future_length,
-                        t_delta_cutoff=t_delta_cutoff
+                        t_delta_cutoff=t_delta_cutoff,
+                        vectorized=vectorized_time_windows,
+                        verbose=verbose
                     )
                     first_obs_f, last_obs_f = _first_obs, last_obs
                     if first_obs is None:
@@ -1034,8 +1972,16 @@ def preprocess_data(
 
                 Y[j] = _Y
 
-            X_new.append(_X)
+        if cache_dir is not None:
+            windows = []
+            for _Y in Y:
+                windows.append({c: _Y[c].values for c in _Y.columns if c.startswith('first_obs') or c.startswith('last_obs')})
+            write_cache(windows, window_path, verbose=verbose)
 
+    if history_length or future_length:
+        # All formulas share one transform plan per table, so transforms common to several models are computed once
+        X_new = [TransformPlan(_X) for _X in X]
+        Y = [TransformPlan(_Y) for _Y in Y]
         for x in formula_list:
             x = x.re_transform(X_new)
             X_new, Y, X_in_Y_names = x.apply_formula(
@@ -1045,9 +1991,14 @@ def preprocess_data(
                 all_interactions=all_interactions,
                 series_ids=series_ids
             )
+        X_new = [_X.execute() for _X in X_new]
+        Y = [_Y.execute() for _Y in Y]
     else:
         X_new = X
 
+    if cache_dir is not None:
+        write_cache((X_new, Y, select, X_in_Y_names), artifact_path, verbose=verbose)
+
     return X_new, Y, select, X_in_Y_names
 
 
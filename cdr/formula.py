@@ -5,9 +5,9 @@ import ast
 import itertools
 import numpy as np
 
-from .data import z, c, s, compute_time_mask, expand_impulse_sequence
+from .data import z, c, s, compute_time_mask, get_window_distances, combine_gf_levels, apply_op, TransformPlan
 from .kwargs import NN_KWARGS, NN_BAYES_KWARGS
-from .util import names2ix, sn, stderr
+from .util import names2ix, prefetch_batches, sn, stderr
 
 sys.setrecursionlimit(100000)  # This prevents stackoverflow for formulas with lots of terms
 
@@ -1279,6 +1279,26 @@ class Formula(object):
 
         return [x.name() for x in self.dv_term]
 
+    def data_dependent_ops(self):
+        """
+        Get names of any ops in the formula whose outputs depend on statistics of the data they are applied to (centering, z-transformation, and scaling).
+
+        :return: ``list`` of ``str``; sorted names of data-dependent ops used by responses or predictors.
+        """
+
+        terms = self.dv_term + self.t.impulses(include_interactions=True, include_nn=True)
+        out = set()
+        for term in terms:
+            ops = list(getattr(term, 'ops', []))
+            if type(term).__name__ in ('ImpulseInteraction', 'NNImpulse'):
+                for x in term.impulses():
+                    ops += getattr(x, 'ops', [])
+            for op in ops:
+                if op in ['c', 'c.', 'z', 'z.', 's', 's.']:
+                    out.add(op)
+
+        return sorted(out)
+
     def apply_op(self, op, arr):
         """
         Apply op **op** to array **arr**.
@@ -1288,44 +1308,15 @@ class Formula(object):
         :return: ``numpy`` array; transformed data.
         """
 
-        if op in ['c', 'c.']:
-            out = c(arr)
-        elif op in ['z', 'z.']:
-            out = z(arr)
-        elif op in ['s', 's.']:
-            out = s(arr)
-        elif op == 'log':
-            out = np.log(np.maximum(arr, 1e-12))
-        elif op == 'log1p':
-            out = np.log(arr + 1)
-        elif op == 'exp':
-            out = np.exp(arr)
-        elif op.startswith('add'):
-            x = float(op[3:])
-            out = arr + x
-        elif op.startswith('subtract'):
-            x = float(op[8:])
-            out = arr - x
-        elif op.startswith('multiply'):
-            x = float(op[8:])
-            out = arr * x
-        elif op.startswith('divide'):
-            x = float(op[6:])
-            out = arr / x
-        elif op.startswith('pow'):
-            exponent = float(op[3:])
-            out = arr ** exponent
-        else:
-            raise ValueError('Unrecognized op: "%s".' % op)
-        return out
+        return apply_op(op, arr)
 
     def apply_ops(self, impulse, X):
         """
         Apply all ops defined for an impulse
 
         :param impulse: ``Impulse`` object; the impulse.
-        :param X: list of ``pandas`` tables; table containing the impulse data.
-        :return: ``pandas`` table; table augmented with transformed impulse.
+        :param X: list of ``pandas`` tables or of ``TransformPlan``; table containing the impulse data. If plans, transformed columns are registered in them but not yet computed.
+        :return: ``pandas`` table or ``TransformPlan``; table augmented with transformed impulse.
         """
 
         if not isinstance(X, list):
@@ -1336,34 +1327,36 @@ class Formula(object):
 
         for i in range(len(X)):
             _X = X[i]
+            if isinstance(_X, TransformPlan):
+                plan = _X
+            else:
+                plan = TransformPlan(_X)
             ops = impulse.ops
 
             expanded_impulses = None
-            if impulse.id not in _X:
+            if impulse.id not in plan:
                 if type(impulse).__name__ in ('ImpulseInteraction', 'NNImpulse'):
-                    _X, expanded_impulses, expanded_atomic_impulses = impulse.expand_categorical(_X)
+                    plan, expanded_impulses, expanded_atomic_impulses = impulse.expand_categorical(plan)
                     for x in expanded_atomic_impulses:
                         for a in x:
-                            _X = self.apply_ops(a, _X)
+                            plan = self.apply_ops(a, plan)
                     for x in expanded_impulses:
-                        if x.name() not in _X:
-                            _X[x.id] = _X[[y.name() for y in x.atomic_impulses]].product(axis=1)
+                        if x.name() not in plan:
+                            plan.add_interaction(x.id, [y.name() for y in x.atomic_impulses])
             else:
-                if type(impulse).__name__ == ('ImpulseInteraction', 'NNImpulse'):
-                    _X, expanded_impulses, _ = impulse.expand_categorical(_X)
+                if type(impulse).__name__ in ('ImpulseInteraction', 'NNImpulse'):
+                    plan, expanded_impulses, _ = impulse.expand_categorical(plan)
                 else:
-                    _X, expanded_impulses = impulse.expand_categorical(_X)
+                    plan, expanded_impulses = impulse.expand_categorical(plan)
 
             if expanded_impulses is not None:
                 for x in expanded_impulses:
-                    if x.name() not in _X:
-                        new_col = _X[x.id]
-                        for j in range(len(ops)):
-                            op = ops[j]
-                            new_col = self.apply_op(op, new_col)
-                        _X[x.name()] = new_col
+                    plan.add_ops(x.name(), x.id, ops)
 
-            X[i] = _X
+            if isinstance(_X, TransformPlan):
+                X[i] = plan
+            else:
+                X[i] = plan.execute()
 
         if delistify:
             X = X[0]
@@ -1378,16 +1371,25 @@ class Formula(object):
             last_obs,
             history_length=128,
             future_length=None,
-            minibatch_size=50000
+            minibatch_size=50000,
+            n_workers=1,
+            out_path=None,
+            float_type='float32'
     ):
         """
         Compute 2D predictor (predictor whose value depends on properties of the most recent impulse).
+        Minibatches are computed by a pool of **n_workers** threads and written into a single preallocated output array.
 
         :param predictor_name: ``str``; name of predictor
         :param X: ``pandas`` table; input data
         :param first_obs: ``pandas`` ``Series`` or 1D ``numpy`` array; row indices in ``X`` of the start of the series associated with each regression target.
         :param last_obs: ``pandas`` ``Series`` or 1D ``numpy`` array; row indices in ``X`` of the most recent observation in the series associated with each regression target.
+        :param history_length: ``int``; maximum number of history (backward) observations.
+        :param future_length: ``int`` or ``None``; maximum number of future (forward) observations. If ``None``, ``0``.
         :param minibatch_size: ``int``; minibatch size for computing predictor, can help with memory footprint
+        :param n_workers: ``int``; number of threads to use for computing minibatches.
+        :param out_path: ``str`` or ``None``; path to a ``.npy`` file to memory-map the output to (useful if the output does not fit in memory). If ``None``, the output is held in memory.
+        :param float_type: ``str``; name of float type of embeddings and output.
         :return: 2-tuple; new predictor name, ``numpy`` array of predictor values
         """
 
@@ -1398,6 +1400,8 @@ class Formula(object):
 
         assert predictor_name in supported, '2D predictor "%s" not currently supported' %predictor_name
 
+        if future_length is None:
+            future_length = 0
         window_length = history_length + future_length
 
         if predictor_name in ['cosdist2D', 'eucldist2D']:
@@ -1408,47 +1412,41 @@ class Formula(object):
 
             assert len(embedding_colnames) > 0, 'Model formula contains vector distance predictors but no embedding columns found in the input data'
 
-            new_2d_predictor = []
             if predictor_name == 'cosdist2D':
                 new_2d_predictor_name = 'cosdist2D'
+                metric = 'cosine'
                 stderr('Computing pointwise cosine distances...\n')
             elif predictor_name == 'eucldist2D':
                 stderr('Computing pointwise Euclidean distances...\n')
                 new_2d_predictor_name = 'eucldist2D'
+                metric = 'euclidean'
+
+            E = np.array(X[embedding_colnames], dtype=float_type)
+            first_obs = np.array(first_obs)
+            last_obs = np.array(last_obs)
+            shape = (len(first_obs), window_length, 1)
+            if out_path is None:
+                new_2d_predictor = np.zeros(shape, dtype=E.dtype)
+            else:
+                new_2d_predictor = np.lib.format.open_memmap(out_path, mode='w+', dtype=E.dtype, shape=shape)
 
-            for i in range(0, len(first_obs), minibatch_size):
-                stderr('\rProcessing batch %d/%d' %(i/minibatch_size + 1, math.ceil(float(len(first_obs))/minibatch_size)))
-                X_embeddings, _, _ = expand_impulse_sequence(
-                    np.array(X[embedding_colnames]),
-                    np.array(X['time']),
-                    np.array(first_obs)[i:i+minibatch_size],
-                    np.array(last_obs)[i:i+minibatch_size],
+            def compute_batch(i):
+                get_window_distances(
+                    E,
+                    first_obs[i:i+minibatch_size],
+                    last_obs[i:i+minibatch_size],
                     window_length,
-                    fill=np.nan
+                    metric=metric,
+                    out=new_2d_predictor[i:i+minibatch_size, :, 0]
                 )
-                X_bases = X_embeddings[:, -1:, :]
-
-                if predictor_name == 'cosdist2D':
-                    numerator = (X_bases * X_embeddings).sum(axis=2)
-                    denominator = np.sqrt((X_bases ** 2).sum(axis=2)) * np.sqrt((X_embeddings ** 2).sum(axis=2))
-                    cosine_distances = numerator / (denominator)
-
-                    cosine_distances = np.where(np.isfinite(cosine_distances), cosine_distances,
-                                                np.zeros(X_embeddings.shape[:2]))
 
-                    new_2d_predictor.append(np.expand_dims(cosine_distances, -1))
-
-                elif predictor_name == 'eucldist2D':
-                    diffs = X_bases - X_embeddings
-
-                    euclidean_distances = np.sqrt((diffs ** 2).sum(axis=2))
-                    euclidean_distances = np.where(np.isfinite(euclidean_distances), euclidean_distances,
-                                                   np.zeros(X_embeddings.shape[:2]))
-
-                    new_2d_predictor.append(np.expand_dims(euclidean_distances, -1))
+            starts = range(0, len(first_obs), minibatch_size)
+            n_batches = len(starts)
+            depth = n_workers if n_workers > 1 else 0
+            for j, _ in enumerate(prefetch_batches(compute_batch, starts, depth=depth, n_workers=n_workers)):
+                stderr('\rProcessing batch %d/%d' %(j + 1, n_batches))
 
             stderr('\n')
-            new_2d_predictor = np.concatenate(new_2d_predictor, axis=0)
 
         return new_2d_predictor_name, new_2d_predictor
 
@@ -1523,17 +1521,23 @@ class Formula(object):
         """
         Extract all data and compute all transforms required by the model formula.
 
-        :param X: list of ``pandas`` tables; impulse data.
-        :param Y: list of ``pandas`` tables; response data.
+        :param X: list of ``pandas`` tables or of ``TransformPlan``; impulse data.
+        :param Y: list of ``pandas`` tables or of ``TransformPlan``; response data.
         :param X_in_Y_names: ``list`` or ``None``; List of column names for response-aligned predictors (predictors measured for every response rather than for every input) if applicable, ``None`` otherwise.
         :param all_interactions: ``bool``; add powerset of all conformable interactions.
         :param series_ids: ``list`` of ``str`` or ``None``; list of ids to use as grouping factors for lagged effects. If ``None``, lagging will not be attempted.
-        :return: triple; transformed **X**, transformed **y**, response-aligned predictor names
+        :return: triple; transformed **X**, transformed **y**, response-aligned predictor names. Tables passed in as ``TransformPlan`` are returned as plans with the required columns registered, for the caller to ``execute`` (e.g. after applying other formulas to the same plans).
         """
 
         if not isinstance(X, list):
             X = [X]
 
+        # Register all derived columns first, then compute them and add them to each table in one pass
+        execute_X = [not isinstance(_X, TransformPlan) for _X in X]
+        execute_Y = [not isinstance(_Y, TransformPlan) for _Y in Y]
+        X = [_X if isinstance(_X, TransformPlan) else TransformPlan(_X) for _X in X]
+        Y = [_Y if isinstance(_Y, TransformPlan) else TransformPlan(_Y) for _Y in Y]
+
         for dv in self.dv_term:
             found = False
             for i, _Y in enumerate(Y):
@@ -1589,7 +1593,7 @@ class Formula(object):
                         for i in range(len(X)):
                             _X = X[i]
                             if x_id in _X:
-                                _X[x_id] = _X.groupby(series_ids)[x_id].shift_activations(n, fill_value=0.)
+                                _X[x_id] = _X.X.groupby(series_ids)[x_id].shift_activations(n, fill_value=0.)
                                 _X = self.apply_ops(x, _X)
                                 X[i] = _X
                                 break
@@ -1637,13 +1641,19 @@ class Formula(object):
             _X = X[i]
             for col in [x for x in _X.columns if spillover.match(x)]:
                 _X[col] = _X[col].fillna(0)
+            if execute_X[i]:
+                _X = _X.execute()
             X[i] = _X
 
-        for _Y in Y:
+        for i in range(len(Y)):
+            _Y = Y[i]
             for gf in self.rangf:
                 gf_s = gf.split(':')
                 if len(gf_s) > 1 and gf not in _Y:
-                    _Y[gf] = _Y[gf_s].agg(lambda x: '_'.join([str(_x) for _x in x]), axis=1)
+                    _Y[gf] = combine_gf_levels(_Y.X[gf_s])
+            if execute_Y[i]:
+                _Y = _Y.execute()
+            Y[i] = _Y
 
         return X, Y, X_in_Y_names
 
@@ -1,9 +1,87 @@
 import sys
+import os
+import bisect
+import hashlib
+import pickle
 import pandas as pd
 
 from .util import stderr
 
-def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, sep=' ', verbose=True):
+CACHE_VERSION = 1
+
+
+def read_cache(path, verbose=True):
+    """
+    Load a cached object written by ``write_cache``.
+
+    :param path: ``str``; path to cache file.
+    :param verbose: ``bool``; whether to log progress to stderr.
+    :return: cached object, or ``None`` if **path** does not exist.
+    """
+
+    if not os.path.exists(path):
+        return None
+    if verbose:
+        stderr('Loading cached data from %s...\n' % path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_cache(obj, path, verbose=True):
+    """
+    Save an object to a cache file.
+    The object is written to a temporary file first and then moved into place, so concurrent jobs never read a partial cache.
+
+    :param obj: object to cache.
+    :param path: ``str``; path to cache file.
+    :param verbose: ``bool``; whether to log progress to stderr.
+    :return: ``None``
+    """
+
+    if verbose:
+        stderr('Caching data to %s...\n' % path)
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def get_tabular_data_cache_key(X_paths, Y_paths, series_ids, categorical_columns=None, sep=' '):
+    """
+    Compute a key identifying the output of ``read_tabular_data`` for a given set of arguments.
+    The key depends on the location, modification time, and size of every source file (including each member of a ``;``-delimited path list), so it changes whenever any source file changes.
+
+    :param X_paths: ``list`` of ``str``; path(s) to impulse (predictor) data.
+    :param Y_paths: ``list`` of ``str``; path(s) to response data.
+    :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
+    :param categorical_columns: ``list`` of ``str``; column names that should be treated as categorical.
+    :param sep: ``str``; string representation of field delimiter in input data.
+    :return: ``str``; hexadecimal key
+    """
+
+    sources = []
+    for paths in (X_paths, Y_paths):
+        _sources = []
+        for path in paths:
+            __sources = []
+            for x in path.split(';'):
+                stat = os.stat(x)
+                __sources.append((os.path.realpath(x), stat.st_mtime_ns, stat.st_size))
+            _sources.append(__sources)
+        sources.append(_sources)
+
+    if categorical_columns is not None:
+        categorical_columns = sorted(categorical_columns)
+
+    key = repr((CACHE_VERSION, sources, list(series_ids), categorical_columns, sep))
+
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, sep=' ', cache_dir=None, verbose=True):
     """
     Read impulse and response data into pandas dataframes and perform basic pre-processing.
 
@@ -12,6 +90,7 @@ def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, se
     :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
     :param categorical_columns: ``list`` of ``str``; column names that should be treated as categorical.
     :param sep: ``str``; string representation of field delimiter in input data.
+    :param cache_dir: ``str`` or ``None``; directory in which to cache the sorted and typed tables in binary format, so that repeated calls over the same data skip parsing and sorting. Cached tables are automatically invalidated when any source file changes. If ``None``, no caching.
     :param verbose: ``bool``; whether to log progress to stderr.
     :return: 2-tuple of list(``pandas`` DataFrame); (impulse data, response data). X and Y each have one element for each dataset in X_paths/Y_paths, each containing the column-wise concatenation of all column files in the path.
     """
@@ -21,20 +100,37 @@ def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, se
     if not isinstance(Y_paths, list):
         Y_paths = [Y_paths]
 
+    for path in X_paths + Y_paths:
+        assert path is not None, 'No data path provided. Exiting.'
+
+    if cache_dir is not None:
+        cache_path = os.path.join(
+            cache_dir,
+            'data_%s.pkl' % get_tabular_data_cache_key(
+                X_paths,
+                Y_paths,
+                series_ids,
+                categorical_columns=categorical_columns,
+                sep=sep
+            )
+        )
+        cached = read_cache(cache_path, verbose=verbose)
+        if cached is not None:
+            X, Y = cached
+            return X, Y
+
     if verbose:
         stderr('Loading data...\n')
     X = []
     Y = []
 
     for path in X_paths:
-        assert path is not None, 'No data path provided. Exiting.'
         _X = []
         for x in path.split(';'):
             _X.append(pd.read_csv(x, sep=sep, skipinitialspace=True))
         X.append(_X)
 
     for path in Y_paths:
-        assert path is not None, 'No data path provided. Exiting.'
         _Y = []
         for y in path.split(';'):
             _Y.append(pd.read_csv(y, sep=sep, skipinitialspace=True))
@@ -68,6 +164,26 @@ def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, se
     for x in Y_new:
         Y.append(pd.concat(x, axis=0))
 
+    X, Y = finalize_tabular_data(X, Y, series_ids, categorical_columns=categorical_columns, verbose=verbose)
+
+    if cache_dir is not None:
+        write_cache((X, Y), cache_path, verbose=verbose)
+
+    return X, Y
+
+
+def finalize_tabular_data(X, Y, series_ids, categorical_columns=None, verbose=True):
+    """
+    Sort, type, and augment impulse and response tables after they have been read from disk.
+
+    :param X: ``list`` of ``pandas`` tables; impulse (predictor) data, one table per column file.
+    :param Y: ``list`` of ``pandas`` tables; response data, one table per column file.
+    :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
+    :param categorical_columns: ``list`` of ``str``; column names that should be treated as categorical.
+    :param verbose: ``bool``; whether to log progress to stderr.
+    :return: 2-tuple of list(``pandas`` DataFrame); (impulse data, response data).
+    """
+
     # Sort
 
     if verbose:
@@ -112,3 +228,134 @@ def read_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, se
                 _X['trial'] = _X.rate.cumsum()
 
     return X, Y
+
+
+class SeriesChunkReader(object):
+    """
+    Incrementally read a table that is sorted by **series_ids** from disk, releasing rows one group of complete time series at a time.
+
+    :param path: ``str``; path to table.
+    :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
+    :param sep: ``str``; string representation of field delimiter in input data.
+    :param chunk_size: ``int``; number of rows to parse at a time.
+    """
+
+    def __init__(self, path, series_ids, sep=' ', chunk_size=100000):
+        self.path = path
+        self.series_ids = series_ids
+        self.reader = pd.read_csv(path, sep=sep, skipinitialspace=True, chunksize=chunk_size)
+        self.buffer = None
+        self.keys = []
+        self.exhausted = False
+
+    def get_keys(self, df):
+        if self.series_ids:
+            return list(zip(*[df[col].tolist() for col in self.series_ids]))
+        return [()] * len(df)
+
+    def fill(self):
+        """
+        Read from disk until the buffer contains at least one complete time series or the table is exhausted.
+
+        :return: ``None``
+        """
+
+        while not self.exhausted and (not self.keys or self.keys[0] == self.keys[-1]):
+            try:
+                chunk = next(self.reader)
+            except StopIteration:
+                self.exhausted = True
+                break
+            keys = self.get_keys(chunk)
+            for i in range(1, len(keys)):
+                if keys[i] < keys[i-1]:
+                    raise ValueError('Streaming requires %s to be sorted by %s on disk.' % (self.path, self.series_ids))
+            if self.keys and keys and keys[0] < self.keys[-1]:
+                raise ValueError('Streaming requires %s to be sorted by %s on disk.' % (self.path, self.series_ids))
+            if self.buffer is None:
+                self.buffer = chunk
+            else:
+                self.buffer = pd.concat([self.buffer, chunk], axis=0)
+            self.keys += keys
+
+    def last_key(self):
+        """
+        Get the key of the last (possibly incomplete) time series in the buffer.
+
+        :return: ``tuple`` or ``None``; key, or ``None`` if the buffer is empty or the table is exhausted (in which case all buffered series are complete).
+        """
+
+        if self.exhausted or not self.keys:
+            return None
+        return self.keys[-1]
+
+    def pop(self, cutoff=None):
+        """
+        Remove and return all buffered rows from time series whose key precedes **cutoff**.
+
+        :param cutoff: ``tuple`` or ``None``; key of the first time series to retain. If ``None``, return all buffered rows.
+        :return: ``pandas`` ``DataFrame``
+        """
+
+        if cutoff is None:
+            n = len(self.keys)
+        else:
+            n = bisect.bisect_left(self.keys, cutoff)
+        out = self.buffer.iloc[:n]
+        self.buffer = self.buffer.iloc[n:]
+        self.keys = self.keys[n:]
+
+        return out
+
+
+def iter_tabular_data(X_paths, Y_paths, series_ids, categorical_columns=None, sep=' ', chunk_size=100000, verbose=True):
+    """
+    Read impulse and response data from disk incrementally, yielding tables that contain complete time series, in the same format as ``read_tabular_data``.
+    Data files must already be sorted by **series_ids** on disk. Only a single dataset (each path may still be a ``;``-delimited list of column files) is supported.
+    Statistics computed from the data (e.g. by ``z.()`` or ``c.()`` transforms in a model formula) will be computed separately for each yielded chunk.
+
+    :param X_paths: ``str`` or ``list`` of ``str``; path to impulse (predictor) data.
+    :param Y_paths: ``str`` or ``list`` of ``str``; path to response data.
+    :param series_ids: ``list`` of ``str``; column names whose jointly unique values define unique time series.
+    :param categorical_columns: ``list`` of ``str``; column names that should be treated as categorical.
+    :param sep: ``str``; string representation of field delimiter in input data.
+    :param chunk_size: ``int``; approximate number of rows per file to read at a time.
+    :param verbose: ``bool``; whether to log progress to stderr.
+    :return: generator of 2-tuples of list(``pandas`` DataFrame); (impulse data, response data).
+    """
+
+    if not isinstance(X_paths, list):
+        X_paths = [X_paths]
+    if not isinstance(Y_paths, list):
+        Y_paths = [Y_paths]
+
+    assert len(X_paths) == 1 and len(Y_paths) == 1, 'Streaming only supports a single impulse dataset and a single response dataset.'
+
+    X_readers = [SeriesChunkReader(x, series_ids, sep=sep, chunk_size=chunk_size) for x in X_paths[0].split(';')]
+    Y_readers = [SeriesChunkReader(y, series_ids, sep=sep, chunk_size=chunk_size) for y in Y_paths[0].split(';')]
+    readers = X_readers + Y_readers
+
+    n_chunk = 0
+    n_rows = 0
+    while True:
+        for reader in readers:
+            reader.fill()
+        if not sum(len(reader.keys) for reader in readers):
+            break
+
+        # Release only the series that are complete in every file
+        cutoff = [reader.last_key() for reader in readers]
+        cutoff = [x for x in cutoff if x is not None]
+        cutoff = min(cutoff) if cutoff else None
+
+        X = [reader.pop(cutoff) for reader in X_readers]
+        Y = [reader.pop(cutoff) for reader in Y_readers]
+        if not sum(len(_Y) for _Y in Y):
+            continue
+
+        n_chunk += 1
+        n_rows += sum(len(_Y) for _Y in Y)
+        if verbose:
+            stderr('Chunk %d (%d response rows read)...\n' % (n_chunk, n_rows))
+
+        yield finalize_tabular_data(X, Y, series_ids, categorical_columns=categorical_columns, verbose=False)
@@ -373,11 +373,41 @@ MODEL_INITIALIZATION_KWARGS = [
         "Size of minibatches to use for fitting (full-batch if ``None``).",
         aliases=['batch_size']
     ),
+    Kwarg(
+        'precise_t_delta',
+        False,
+        bool,
+        "Whether to compute temporal offsets between impulses and responses in ``float64`` on the host and feed them to the model, rather than subtracting **float_type** timestamps inside the model. Avoids loss of precision in offsets when absolute timestamps are large (e.g. epoch-based clock times), at the cost of holding impulse timestamps in ``float64`` in host memory."
+    ),
+    Kwarg(
+        'impulse_storage_type',
+        None,
+        [str, None],
+        "Name of float type (e.g. ``'float16'``) in which to hold precomputed expanded impulse arrays in host memory during training (ignored with **optimize_memory**). The mask is then stored as ``bool`` and timestamps as ``float32`` offsets from the response time (no more precise than the timestamps themselves, which are held in **float_type** unless **precise_t_delta** is ``True``), and each minibatch is converted back to **float_type** when it is fed. Can cut host memory for training data by half or more. If ``None``, store in **float_type**."
+    ),
     Kwarg(
         'eval_minibatch_size',
         1024,
+        [int, "auto"],
+        "Size of minibatches to use for prediction/evaluation. If ``'auto'``, the size is chosen from an estimate of the memory footprint per row (given the history length, number of impulses, response dimensionality, and output reduction) and **eval_memory_budget**, and is halved as needed if allocation fails."
+    ),
+    Kwarg(
+        'eval_data_cache_size',
+        1,
         int,
-        "Size of minibatches to use for prediction/evaluation."
+        "Maximum number of evaluation datasets (e.g. the dev set used for periodic evaluation during training) whose model-ready arrays are memoized between calls, with least-recently-used eviction. If ``0``, no memoization."
+    ),
+    Kwarg(
+        'trim_impulse_padding',
+        True,
+        bool,
+        "Whether to drop timesteps that contain no observed impulses in any row of a minibatch before running the model, so that compute scales with the longest observed history in the minibatch rather than with **history_length** + **future_length**. Predictions and likelihoods are unchanged, since dropped timesteps are fully masked. Trimming is skipped during training for models that use batch normalization or activity/context regularization, whose training-time moments and penalties are computed over all timesteps (including padding), so that the training objective is also unchanged."
+    ),
+    Kwarg(
+        'eval_memory_budget',
+        None,
+        [float, None],
+        "Approximate memory budget (in MB) per evaluation minibatch, used only if **eval_minibatch_size** is ``'auto'``. If ``None``, use a quarter of the available system memory."
     ),
     Kwarg(
         'n_samples_eval',
@@ -385,6 +415,42 @@ MODEL_INITIALIZATION_KWARGS = [
         int,
         "Number of posterior predictive samples to draw for prediction/evaluation. Ignored for evaluating CDR MLE models."
     ),
+    Kwarg(
+        'prefetch_depth',
+        2,
+        int,
+        "Number of training minibatches to prepare ahead of time in background threads (shuffling, gathering, and, if memory is being optimized, expanding impulse windows) while the current minibatch is being processed. If ``0``, minibatches are prepared synchronously."
+    ),
+    Kwarg(
+        'n_prefetch_workers',
+        1,
+        int,
+        "Number of background threads to use for preparing training minibatches. Ignored if **prefetch_depth** is ``0``."
+    ),
+    Kwarg(
+        'n_expansion_workers',
+        0,
+        int,
+        "Number of worker processes to use for expanding impulse windows when memory is being optimized (``optimize_memory``). Workers read the impulse data from shared memory and prepare upcoming minibatches in parallel. If ``0`` or ``1``, windows are expanded in the main process."
+    ),
+    Kwarg(
+        'save_in_background',
+        True,
+        bool,
+        "Whether to write checkpoints in a background thread. Parameter values are snapshotted when a save is requested and written to disk while training continues, and redundant pending saves are coalesced. If ``False``, each save blocks until its files have been written."
+    ),
+    Kwarg(
+        'graph_epoch',
+        False,
+        bool,
+        "Whether to stage training data in graph memory in chunks of many minibatches and run the minibatch updates of each chunk against the staged data, accumulating losses in the graph. Removes per-minibatch feeding and fetching, which dominates training time for models with small per-step graphs (e.g. kernel-based CDR on CPU), at the cost of holding a chunk of expanded impulse data in graph memory."
+    ),
+    Kwarg(
+        'graph_epoch_n_minibatch',
+        32,
+        [int, None],
+        "Number of minibatches per chunk of training data staged in graph memory when **graph_epoch** is used. Larger chunks save more feeding overhead but require more graph memory, and (with **optimize_memory**) expand more impulse windows on the host at once. If ``None``, stage the entire (shuffled) epoch at once, which is not supported with **optimize_memory**, since it would materialize the full expanded impulse data."
+    ),
     Kwarg(
         'optim_name',
         'Adam',
@@ -621,6 +687,12 @@ MODEL_INITIALIZATION_KWARGS = [
         int,
         "Frequency (in iterations) with which to evaluate on dev data (or ``0`` to turn off incremental evaluation)."
     ),
+    Kwarg(
+        'dev_eval_subsample',
+        None,
+        [int, None],
+        "Maximum number of rows per response file to use for incremental evaluation on dev data during training. Rows are selected at evenly spaced positions in the (series-sorted) dev data, so the subsample is fixed across evaluations and stratified across time series, and log likelihoods are rescaled to the size of the full dev set. The final evaluation after training always uses the full dev data. If ``None``, use all rows."
+    ),
     Kwarg(
         'log_freq',
         1,
@@ -1,6 +1,6 @@
 import textwrap
 import time as pytime
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, namedtuple
 import subprocess
 
 import scipy.interpolate
@@ -10,8 +10,8 @@ import scipy.stats
 from sklearn.metrics import accuracy_score, f1_score
 
 from .backend import *
-from .data import build_CDR_impulse_data, build_CDR_response_data, corr, get_first_last_obs_lists, \
-    split_cdr_outputs, concat_nested
+from .data import build_CDR_impulse_data, build_CDR_response_data, ImpulseWindows, ParallelImpulseWindows, trim_impulse_windows, \
+    compress_impulse_data, decompress_impulse_data, get_t_delta, get_gf_lookup, corr, get_first_last_obs_lists, split_cdr_outputs, concat_nested
 from .formula import *
 from .kwargs import MODEL_INITIALIZATION_KWARGS
 from .opt import *
@@ -21,6 +21,9 @@ NN_KWARG_BY_KEY = {x.key: x for x in NN_KWARGS + NN_BAYES_KWARGS}
 ENSEMBLE = re.compile('\.m\d+')
 CROSSVAL = re.compile('\.CV([^.~]+)~([^.~]+)')
 N_MCIFIED_DIST_RESAMP = 10000
+EVAL_MEMORY_OVERHEAD = 4 # Rough multiplier on the size of IRF-weighted impulses to account for graph intermediates
+EVAL_ROW_KEYS = ('X', 'X_time', 'X_mask', 'Y', 'Y_time', 'Y_mask', 'Y_gf')
+METADATA_VERSION = 1 # Version of the metadata format packed by CDRModel._pack_metadata()
 
 import tensorflow as tf
 if int(tf.__version__.split('.')[0]) == 1:
@@ -439,6 +442,80 @@ tf_config.gpu_options.allow_growth = True
 
 pd.options.mode.chained_assignment = None
 
+GraphRef = namedtuple('GraphRef', ['kind', 'name'])
+GRAPH_REF_PLAIN_TYPES = (str, bool, int, float, np.number, np.ndarray)
+
+
+def get_graph_refs(x):
+    """
+    Get a picklable description of a graph object, or of a nested ``dict``/``list``/``tuple`` of them, in which each tensor, operation, and variable is replaced by a ``GraphRef`` to its name.
+    Leaves that are ``None`` or plain values (strings, numbers, arrays) are kept as-is.
+    Raises ``TypeError`` if **x** contains anything else.
+
+    :param x: TensorFlow tensor, operation, or variable, or nested ``dict``/``list``/``tuple`` of these.
+    :return: description of **x** with the same nesting as **x**.
+    """
+
+    if isinstance(x, tf.Variable):
+        return GraphRef('variable', x.name)
+    if isinstance(x, tf.Tensor):
+        return GraphRef('tensor', x.name)
+    if isinstance(x, tf.Operation):
+        return GraphRef('operation', x.name)
+    if x is None or isinstance(x, GRAPH_REF_PLAIN_TYPES):
+        return x
+    if isinstance(x, dict):
+        out = OrderedDict() if isinstance(x, OrderedDict) else {}
+        for k in x:
+            out[k] = get_graph_refs(x[k])
+        return out
+    if type(x) in (list, tuple):
+        return type(x)(get_graph_refs(v) for v in x)
+    raise TypeError('Cannot describe object of type %s in terms of graph names.' % type(x).__name__)
+
+
+def has_graph_refs(refs):
+    """
+    Check whether an output of ``get_graph_refs()`` refers to any graph objects.
+
+    :param refs: output of ``get_graph_refs()``.
+    :return: ``bool``; whether **refs** contains any ``GraphRef``.
+    """
+
+    if isinstance(refs, GraphRef):
+        return True
+    if isinstance(refs, dict):
+        return any(has_graph_refs(v) for v in refs.values())
+    if type(refs) in (list, tuple):
+        return any(has_graph_refs(v) for v in refs)
+    return False
+
+
+def resolve_graph_refs(refs, graph, variables):
+    """
+    Inverse of ``get_graph_refs()``: replace each ``GraphRef`` in **refs** with the graph object of that name in **graph**.
+
+    :param refs: output of ``get_graph_refs()``.
+    :param graph: TensorFlow graph; graph in which to look up names.
+    :param variables: ``dict``; map from names to variable objects. Variable names not found here resolve to their tensors.
+    :return: graph objects with the same nesting as **refs**.
+    """
+
+    if isinstance(refs, GraphRef):
+        if refs.kind == 'variable' and refs.name in variables:
+            return variables[refs.name]
+        if refs.kind == 'operation':
+            return graph.get_operation_by_name(refs.name)
+        return graph.get_tensor_by_name(refs.name)
+    if isinstance(refs, dict):
+        out = OrderedDict() if isinstance(refs, OrderedDict) else {}
+        for k in refs:
+            out[k] = resolve_graph_refs(refs[k], graph, variables)
+        return out
+    if type(refs) in (list, tuple):
+        return type(refs)(resolve_graph_refs(v, graph, variables) for v in refs)
+    return refs
+
 
 class CDRModel(object):
     _INITIALIZATION_KWARGS = MODEL_INITIALIZATION_KWARGS
@@ -861,7 +938,7 @@ class CDRModel(object):
                     _first_obs, _last_obs = cols
                     _first_obs = np.array(_first_obs, dtype=getattr(np, self.int_type))
                     _last_obs = np.array(_last_obs, dtype=getattr(np, self.int_type))
-                    _X_time = np.array(X[i].time, dtype=getattr(np, self.float_type))
+                    _X_time = np.array(X[i].time, dtype=np.float64 if self.precise_t_delta else getattr(np, self.float_type))
                     X_time.append(_X_time)
                     n_cells = len(_first_obs) * self.history_length
                     step = max(1, np.round(n_cells / 1e8))
@@ -1002,6 +1079,9 @@ class CDRModel(object):
 
         self.prop_bwd = self.history_length / (self.history_length + self.future_length)
         self.prop_fwd = self.future_length / (self.history_length + self.future_length)
+        self.time_type = 'float64' if self.precise_t_delta else self.float_type
+
+        self.eval_data_cache = OrderedDict()
 
         f = self.form
         self.responses = f.responses()
@@ -1164,6 +1244,8 @@ class CDRModel(object):
         self.rangf_map = []
         for i in range(len(self.rangf_map_base)):
             self.rangf_map.append(defaultdict((lambda x: lambda: x)(self.rangf_n_levels[i] - 1), self.rangf_map_base[i]))
+        # Vectorized versions of the maps above, reused when converting levels to indices for each call to fit/predict/etc.
+        self.rangf_lookup = [get_gf_lookup(x) for x in self.rangf_map]
 
         self.rangf_map_ix_2_levelname = []
 
@@ -1561,6 +1643,7 @@ class CDRModel(object):
 
     def _pack_metadata(self):
         md = {
+            'metadata_version': METADATA_VERSION,
             'form_str': self.form_str,
             'form': self.form,
             'n_train': self.n_train,
@@ -1617,6 +1700,8 @@ class CDRModel(object):
         return md
 
     def _unpack_metadata(self, md):
+        metadata_version = md.pop('metadata_version', 0)
+        assert metadata_version <= METADATA_VERSION, 'Model metadata has version %d, but this version of CDR can only read metadata up to version %d. Upgrade CDR to load this model.' % (metadata_version, METADATA_VERSION)
         self.form_str = md.pop('form_str')
         self.form = md.pop('form', Formula(self.form_str))
         self.n_train = md.pop('n_train')
@@ -1699,12 +1784,23 @@ class CDRModel(object):
                 self.sum_outputs_along_T = tf.placeholder_with_default(tf.constant(True, dtype=tf.bool), shape=[], name='reduce_preds_along_T')
                 self.sum_outputs_along_K = tf.placeholder_with_default(tf.constant(True, dtype=tf.bool), shape=[], name='reduce_preds_along_K')
 
+                if self.graph_epoch:
+                    self._initialize_graph_epoch_buffers()
+
                 # Impulses
-                self.X = tf.placeholder(
-                    shape=[None, None, self.n_impulse],
-                    dtype=self.FLOAT_TF,
-                    name='X'
-                )
+                if self.graph_epoch:
+                    # If not fed, read the current minibatch of the training chunk staged in graph memory
+                    self.X = tf.placeholder_with_default(
+                        self._get_graph_epoch_input('X'),
+                        shape=[None, None, self.n_impulse],
+                        name='X'
+                    )
+                else:
+                    self.X = tf.placeholder(
+                        shape=[None, None, self.n_impulse],
+                        dtype=self.FLOAT_TF,
+                        name='X'
+                    )
                 X_shape = tf.shape(self.X)
                 self.X_batch_dim = X_shape[0]
                 self.X_time_dim = X_shape[1]
@@ -1717,45 +1813,64 @@ class CDRModel(object):
                     X_processed /= scale
                 self.X_processed = X_processed
                 self.X_time = tf.placeholder_with_default(
-                    tf.zeros(
-                        tf.convert_to_tensor([
-                            self.X_batch_dim,
-                            self.history_length + self.future_length,
-                            self.n_impulse
-                        ]),
-                        dtype=self.FLOAT_TF
+                    self._get_graph_epoch_input(
+                        'X_time',
+                        tf.zeros(
+                            tf.convert_to_tensor([
+                                self.X_batch_dim,
+                                self.history_length + self.future_length,
+                                self.n_impulse
+                            ]),
+                            dtype=self.FLOAT_TF
+                        )
                     ),
                     shape=[None, None, self.n_impulse],
                     name='X_time'
                 )
                 self.X_mask = tf.placeholder_with_default(
-                    tf.ones(
-                        tf.convert_to_tensor([
-                            self.X_batch_dim,
-                            self.history_length + self.future_length,
-                            self.n_impulse
-                        ]),
-                        dtype=self.FLOAT_TF
+                    self._get_graph_epoch_input(
+                        'X_mask',
+                        tf.ones(
+                            tf.convert_to_tensor([
+                                self.X_batch_dim,
+                                self.history_length + self.future_length,
+                                self.n_impulse
+                            ]),
+                            dtype=self.FLOAT_TF
+                        )
                     ),
                     shape=[None, None, self.n_impulse],
                     name='X_mask'
                 )
 
                 # Responses
-                self.Y = tf.placeholder(
-                    shape=[None, self.n_response],
-                    dtype=self.FLOAT_TF,
-                    name=sn('Y')
-                )
+                if self.graph_epoch:
+                    self.Y = tf.placeholder_with_default(
+                        self._get_graph_epoch_input('Y'),
+                        shape=[None, self.n_response],
+                        name=sn('Y')
+                    )
+                else:
+                    self.Y = tf.placeholder(
+                        shape=[None, self.n_response],
+                        dtype=self.FLOAT_TF,
+                        name=sn('Y')
+                    )
                 Y_shape = tf.shape(self.Y)
                 self.Y_batch_dim = Y_shape[0]
                 self.Y_time = tf.placeholder_with_default(
-                    tf.ones(tf.convert_to_tensor([self.Y_batch_dim]), dtype=self.FLOAT_TF),
+                    self._get_graph_epoch_input(
+                        'Y_time',
+                        tf.ones(tf.convert_to_tensor([self.Y_batch_dim]), dtype=self.FLOAT_TF)
+                    ),
                     shape=[None],
                     name=sn('Y_time')
                 )
                 self.Y_mask = tf.placeholder_with_default(
-                    tf.ones(tf.convert_to_tensor([self.Y_batch_dim, self.n_response]), dtype=self.FLOAT_TF),
+                    self._get_graph_epoch_input(
+                        'Y_mask',
+                        tf.ones(tf.convert_to_tensor([self.Y_batch_dim, self.n_response]), dtype=self.FLOAT_TF)
+                    ),
                     shape=[None, self.n_response],
                     name='Y_mask'
                 )
@@ -1768,7 +1883,13 @@ class CDRModel(object):
                 # shape (B, T, n_impulse)
                 _X_time = self.X_time
                 # shape (B, T, n_impulse)
-                t_delta = _Y_time - _X_time
+                # Can be fed directly with offsets computed at higher precision on the host (see ``precise_t_delta``)
+                self.t_delta_in = tf.placeholder_with_default(
+                    self._get_graph_epoch_input('t_delta_in', _Y_time - _X_time) if self.precise_t_delta else _Y_time - _X_time,
+                    shape=[None, None, self.n_impulse],
+                    name='t_delta_in'
+                )
+                t_delta = self.t_delta_in
                 if self.history_length and not self.future_length:
                     # Floating point precision issues can allow the response to precede the impulse for simultaneous x/y,
                     # which can break causal IRFs where t_delta must be >= 0. The correction below prevents this.
@@ -1776,7 +1897,7 @@ class CDRModel(object):
                 self.t_delta = t_delta
                 self.gf_defaults = np.expand_dims(np.array(self.rangf_n_levels, dtype=self.INT_NP), 0) - 1
                 self.Y_gf = tf.placeholder_with_default(
-                    tf.cast(self.gf_defaults, dtype=self.INT_TF),
+                    self._get_graph_epoch_input('Y_gf', tf.cast(self.gf_defaults, dtype=self.INT_TF)),
                     shape=[None, len(self.rangf)],
                     name='Y_gf'
                 )
@@ -2164,8 +2285,109 @@ class CDRModel(object):
                         )
 
                 self.resample_ops = [] # Only used by CDRNN, defined here for global API
+                self.session_callables = {} # Compiled session callables, keyed by caller-specified name
                 self.regularizable_layers = {} # Only used by CDRNN, defined here for global API
 
+                if self.graph_epoch:
+                    # Map from model inputs to the buffers in which they are staged (see ``run_train_chunk``)
+                    self.graph_epoch_inputs = {}
+                    for name in self.graph_epoch_buffers:
+                        self.graph_epoch_inputs[getattr(self, name)] = name
+
+    def _initialize_graph_epoch_buffers(self):
+        with self.session.as_default():
+            with self.session.graph.as_default():
+                # Buffers holding the current chunk of training data. They are kept out of all variable collections,
+                # so they are neither initialized nor saved with the model parameters.
+                buffer_specs = [
+                    ('X', self.FLOAT_TF, [0, 0, self.n_impulse]),
+                    ('X_time', self.FLOAT_TF, [0, 0, self.n_impulse]),
+                    ('X_mask', self.FLOAT_TF, [0, 0, self.n_impulse]),
+                    ('Y', self.FLOAT_TF, [0, self.n_response]),
+                    ('Y_time', self.FLOAT_TF, [0]),
+                    ('Y_mask', self.FLOAT_TF, [0, self.n_response]),
+                    ('Y_gf', self.INT_TF, [0, len(self.rangf)])
+                ]
+                if self.precise_t_delta:
+                    buffer_specs.append(('t_delta_in', self.FLOAT_TF, [0, 0, self.n_impulse]))
+
+                self.graph_epoch_buffers = {}
+                self.graph_epoch_buffers_in = {}
+                stage_ops = []
+                for name, dtype, shape in buffer_specs:
+                    buffer = tf.Variable(
+                        tf.zeros(shape, dtype=dtype),
+                        trainable=False,
+                        collections=[],
+                        validate_shape=False,
+                        name='graph_epoch_%s' % name
+                    )
+                    buffer_in = tf.placeholder(dtype, shape=[None] * len(shape), name='graph_epoch_%s_in' % name)
+                    self.graph_epoch_buffers[name] = buffer
+                    self.graph_epoch_buffers_in[name] = buffer_in
+                    stage_ops.append(tf.assign(buffer, buffer_in, validate_shape=False))
+
+                self.graph_epoch_active = tf.placeholder_with_default(
+                    tf.constant(False, dtype=tf.bool),
+                    shape=[],
+                    name='graph_epoch_active'
+                )
+                self.graph_epoch_minibatch_size = tf.placeholder_with_default(
+                    tf.constant(0, dtype=self.INT_TF),
+                    shape=[],
+                    name='graph_epoch_minibatch_size'
+                )
+                # Row offset of the current minibatch in the staged chunk
+                self.graph_epoch_start = tf.Variable(
+                    0,
+                    dtype=self.INT_TF,
+                    trainable=False,
+                    collections=[],
+                    name='graph_epoch_start'
+                )
+
+                # Loss totals over the staged chunk
+                total_names = ['loss', 'reg_loss']
+                if self.loss_cutoff_n_sds:
+                    total_names.append('n_dropped')
+                if self.is_bayesian:
+                    total_names.append('kl_loss')
+                self.graph_epoch_totals = {}
+                for name in total_names:
+                    self.graph_epoch_totals[name] = tf.Variable(
+                        0.,
+                        dtype=self.FLOAT_TF,
+                        trainable=False,
+                        collections=[],
+                        name='graph_epoch_%s_total' % name
+                    )
+
+                stage_ops.append(tf.assign(self.graph_epoch_start, 0))
+                for name in self.graph_epoch_totals:
+                    stage_ops.append(tf.assign(self.graph_epoch_totals[name], 0.))
+                self.stage_graph_epoch_chunk = tf.group(*stage_ops)
+
+                self.session.run(
+                    tf.variables_initializer(
+                        list(self.graph_epoch_buffers.values()) +
+                        [self.graph_epoch_start] +
+                        list(self.graph_epoch_totals.values())
+                    )
+                )
+
+    def _get_graph_epoch_input(self, name, default=None):
+        if not self.graph_epoch:
+            return default
+
+        def get_minibatch(name=name):
+            start = self.graph_epoch_start
+            return self.graph_epoch_buffers[name][start:start + self.graph_epoch_minibatch_size]
+
+        if default is None:
+            return get_minibatch()
+
+        return tf.cond(self.graph_epoch_active, get_minibatch, lambda: default)
+
     def _get_prior_sd(self, response_name):
         with self.session.as_default():
             with self.session.graph.as_default():
@@ -5734,9 +5956,46 @@ class CDRModel(object):
         with self.session.as_default():
             with self.session.graph.as_default():
                 self.saver = tf.train.Saver()
+                self.checkpoint_vars = tf.global_variables()
+                if getattr(self, 'checkpoint_writer', None) is not None:
+                    self.checkpoint_writer.close()
+                self.checkpoint_writer = None # Built on first save (see ``save()``)
 
                 self.check_numerics_ops = [tf_check_numerics(v, 'Numerics check failed') for v in tf.trainable_variables()]
 
+                # Fused training step: parameter update, moving averages, batch step increment, and numerics check,
+                # so that each training minibatch requires a single session call (see ``run_train_step``).
+                with tf.control_dependencies([self.train_op] + self.ema_ops):
+                    incr_global_batch_step = tf.assign(self.global_batch_step, self.global_batch_step + 1)
+                with tf.control_dependencies([incr_global_batch_step]):
+                    check_numerics_ops = [
+                        tf_check_numerics(tf.identity(v), 'Numerics check failed') for v in tf.trainable_variables()
+                    ]
+                self.train_step_op = tf.group(incr_global_batch_step, *check_numerics_ops)
+
+                if self.graph_epoch:
+                    # Training step against the staged chunk: accumulate losses in the graph, then advance to the
+                    # next minibatch once the update is complete.
+                    losses = {
+                        'loss': self.loss_func,
+                        'reg_loss': self.reg_loss
+                    }
+                    if self.loss_cutoff_n_sds:
+                        losses['n_dropped'] = self.n_dropped
+                    if self.is_bayesian:
+                        losses['kl_loss'] = self.kl_loss
+                    accumulate_ops = []
+                    for name in losses:
+                        loss = tf.cast(losses[name], dtype=self.FLOAT_TF)
+                        if name == 'loss':
+                            loss = tf.where(tf.is_finite(loss), loss, tf.zeros_like(loss))
+                        accumulate_ops.append(tf.assign_add(self.graph_epoch_totals[name], loss))
+                    with tf.control_dependencies([self.train_step_op] + accumulate_ops):
+                        self.graph_epoch_train_step_op = tf.assign_add(
+                            self.graph_epoch_start,
+                            self.graph_epoch_minibatch_size
+                        )
+
     def _initialize_ema(self):
         with self.session.as_default():
             with self.session.graph.as_default():
@@ -6227,37 +6486,70 @@ class CDRModel(object):
     def run_train_step(self, feed_dict):
         """
         Update the model from a batch of training data.
+        The update, moving average updates, batch step increment, and check that all parameters remain finite are run together with the loss fetches in a single session call.
+        Raises ``tf.errors.InvalidArgumentError`` if gradients or updated parameters are non-finite (in the latter case, the message contains ``'Numerics check failed'``).
 
         :param feed_dict: ``dict``; A dictionary of predictor and response values
-        :return: ``numpy`` array; Predicted responses, one for each training sample
+        :return: ``dict``; losses for the batch, with keys ``'loss'``, ``'reg_loss'``, and (if applicable) ``'n_dropped'`` and ``'kl_loss'``.
         """
 
         with self.session.as_default():
             with self.session.graph.as_default():
-                to_run = [self.train_op]
-                to_run += self.ema_ops
-
-                to_run += [self.loss_func, self.reg_loss]
-                to_run_names = ['loss', 'reg_loss']
+                to_run = {
+                    'train_step': self.train_step_op,
+                    'loss': self.loss_func,
+                    'reg_loss': self.reg_loss
+                }
 
                 if self.loss_cutoff_n_sds:
-                    to_run_names.append('n_dropped')
-                    to_run.append(self.n_dropped)
+                    to_run['n_dropped'] = self.n_dropped
 
                 if self.is_bayesian:
-                    to_run_names.append('kl_loss')
-                    to_run.append(self.kl_loss)
+                    to_run['kl_loss'] = self.kl_loss
 
-                out = self.session.run(
+                out_dict = self.session.run(
                     to_run,
                     feed_dict=feed_dict
                 )
-                self.session.run(self.incr_global_batch_step)
-
-                out_dict = {x: y for x, y in zip(to_run_names, out[-len(to_run_names):])}
+                del out_dict['train_step']
 
                 return out_dict
 
+    def run_train_chunk(self, feed_dict, n_minibatch, minibatch_size):
+        """
+        Update the model from a chunk of training data in **graph_epoch** mode.
+        The chunk is staged in graph memory in a single session call, after which each minibatch update reads its inputs from the staged data, so that no data are fed or fetched per minibatch.
+        Losses are accumulated in the graph and fetched once at the end of the chunk.
+        Raises ``tf.errors.InvalidArgumentError`` under the same conditions as ``run_train_step``.
+
+        :param feed_dict: ``dict``; A dictionary of predictor and response values for the entire chunk, in minibatch order.
+        :param n_minibatch: ``int``; number of minibatches in the chunk.
+        :param minibatch_size: ``int``; minibatch size.
+        :return: ``dict``; loss totals over the chunk, with keys ``'loss'``, ``'reg_loss'``, and (if applicable) ``'n_dropped'`` and ``'kl_loss'``.
+        """
+
+        assert self.graph_epoch, 'run_train_chunk() requires a model initialized with ``graph_epoch=True``.'
+
+        with self.session.as_default():
+            with self.session.graph.as_default():
+                stage_fd = {}
+                for x in feed_dict:
+                    if x in self.graph_epoch_inputs and feed_dict[x] is not None:
+                        stage_fd[self.graph_epoch_buffers_in[self.graph_epoch_inputs[x]]] = feed_dict[x]
+                training = feed_dict.get(self.training, True)
+
+                train_step = self.get_session_callable(
+                    ('graph_epoch_train_step',),
+                    self.graph_epoch_train_step_op,
+                    feed_names=['training', 'graph_epoch_active', 'graph_epoch_minibatch_size']
+                )
+
+                self.session.run(self.stage_graph_epoch_chunk, feed_dict=stage_fd)
+                for _ in range(n_minibatch):
+                    train_step(training, True, minibatch_size)
+
+                return self.session.run(self.graph_epoch_totals)
+
 
 
 
@@ -6527,6 +6819,8 @@ class CDRModel(object):
         else:
             self.outdir = outdir
 
+        attrs_prebuild = set(self.__dict__.keys())
+
         with self.session.as_default():
             with self.session.graph.as_default():
                 if verbose:
@@ -6714,8 +7008,39 @@ class CDRModel(object):
 
                 self._initialize_convergence_checking()
 
+                self.graph_attrs = self._pack_graph_attrs(attrs_prebuild)
+
                 # self.sess.graph.finalize()
 
+    def _pack_graph_attrs(self, attrs_prebuild):
+        # Serialize the state added to the model by ``build()`` in terms of graph names, so that it can be restored
+        # against an imported graph definition (see ``rehydrate()``). Attributes that refer to graph objects are
+        # described by name, other new attributes are kept if they can be pickled, and the rest (e.g. layer objects)
+        # are dropped.
+        graph_refs = {}
+        values = {}
+        for k in self.__dict__:
+            if k == 'graph_attrs':
+                continue
+            v = self.__dict__[k]
+            try:
+                refs = get_graph_refs(v)
+            except TypeError:
+                refs = None
+            if refs is not None and has_graph_refs(refs):
+                graph_refs[k] = refs
+            elif k not in attrs_prebuild:
+                try:
+                    values[k] = pickle.dumps(v)
+                except Exception:
+                    pass
+
+        return pickle.dumps({
+            'metadata_version': METADATA_VERSION,
+            'graph_refs': graph_refs,
+            'values': values
+        })
+
     def check_numerics(self):
         """
         Check that all trainable parameters are finite. Throws an error if not.
@@ -6746,6 +7071,8 @@ class CDRModel(object):
     def save(self, dir=None, suffix=''):
         """
         Save the CDR model.
+        Parameter values and model metadata are snapshotted immediately, and the checkpoint and object files (primary and backup) are written by a ``CheckpointWriter``.
+        If **save_in_background** is ``True``, this method returns before the files are written (see ``flush_saves()``).
 
         :param dir: ``str``; output directory. If ``None``, use model default.
         :param suffix: ``str``; file suffix.
@@ -6758,28 +7085,69 @@ class CDRModel(object):
             dir = self.outdir
         with self.session.as_default():
             with self.session.graph.as_default():
-                failed = True
-                i = 0
+                if self.checkpoint_writer is None:
+                    self.checkpoint_writer = CheckpointWriter(
+                        self.checkpoint_vars,
+                        meta_graph_def=self.saver.export_meta_graph().SerializeToString()
+                    )
+                values = self.session.run(self.checkpoint_vars)
+                obj = pickle.dumps(self)
+                self.checkpoint_writer.write(dir, suffix, values, obj, graph_attrs=self.graph_attrs)
+                if not self.save_in_background:
+                    self.checkpoint_writer.flush()
 
-                # Try/except to handle race conditions in Windows
-                while failed and i < 10:
-                    try:
-                        self.saver.save(self.session, dir + '/model%s.ckpt' % suffix)
-                        with open(dir + '/m%s.obj' % suffix, 'wb') as f:
-                            pickle.dump(self, f)
-                        self.saver.save(self.session, dir + '/model%s_backup.ckpt' % suffix)
-                        with open(dir + '/m%s_backup.obj' % suffix, 'wb') as f:
-                            pickle.dump(self, f)
-                        failed = False
-                    except:
-                        stderr('Write failure during save. Retrying...\n')
-                        pytime.sleep(1)
-                        i += 1
-                if i >= 10:
-                    stderr('Could not save model to checkpoint file. Saving to backup...\n')
-                    self.saver.save(self.session, dir + '/model%s_backup.ckpt' % suffix)
-                    with open(dir + '/m%s_backup.obj' % suffix, 'wb') as f:
-                        pickle.dump(self, f)
+    def flush_saves(self):
+        """
+        Block until all pending saves have been written to disk.
+
+        :return: ``None``
+        """
+
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.flush()
+
+    def rehydrate(self, outdir=None, suffix=''):
+        """
+        Reconstruct the CDR(NN) network from the graph definition exported with a saved model, rather than rebuilding it from the model definition with ``build()``.
+        This is much faster for large models, but state held only by Python objects (e.g. network layers) is not restored, so rehydrated models support inference (prediction, likelihood, evaluation, and convolution) but should be rebuilt with ``build()`` for training or plotting.
+        Weights are not restored; call ``load()`` afterward.
+
+        :param outdir: ``str``; directory containing the saved model. If ``None``, use model default.
+        :param suffix: ``str``; file suffix.
+        :return: ``bool``; whether the network was rehydrated. ``False`` if no exported graph definition was found (e.g. for models saved by older versions of CDR), in which case the model is left unchanged.
+        """
+
+        if outdir is None:
+            outdir = self.outdir
+        meta_path = outdir + '/model%s.ckpt.meta' % suffix
+        graph_attrs_path = outdir + '/m%s.graph' % suffix
+        if not (os.path.exists(meta_path) and os.path.exists(graph_attrs_path)):
+            return False
+
+        with open(graph_attrs_path, 'rb') as f:
+            graph_attrs = f.read()
+        state = pickle.loads(graph_attrs)
+        assert state['metadata_version'] <= METADATA_VERSION, 'Exported graph has version %d, but this version of CDR can only read versions up to %d. Upgrade CDR to load this model.' % (state['metadata_version'], METADATA_VERSION)
+
+        self.outdir = outdir
+        with self.session.as_default():
+            with self.session.graph.as_default():
+                saver = tf.train.import_meta_graph(meta_path, clear_devices=True)
+                variables = {v.name: v for v in tf.global_variables() + tf.local_variables()}
+                for k in state['graph_refs']:
+                    setattr(self, k, resolve_graph_refs(state['graph_refs'][k], self.session.graph, variables))
+                for k in state['values']:
+                    setattr(self, k, pickle.loads(state['values'][k]))
+
+                # Graph-level Python objects that are not captured by name
+                self.saver = saver
+                self.checkpoint_writer = None
+                self.ema = tf.train.ExponentialMovingAverage(decay=self.ema_decay if self.ema_decay else 0.)
+                self.ema_saver = tf.train.Saver(self.ema_map)
+                self.writer = tf.summary.FileWriter(self.outdir + '/tensorboard/cdr')
+                self.graph_attrs = graph_attrs
+
+        return True
 
     def load(self, outdir=None, suffix='', predict=False, restore=True, allow_missing=True):
         """
@@ -6796,6 +7164,7 @@ class CDRModel(object):
 
         if outdir is None:
             outdir = self.outdir
+        self.flush_saves()
         with self.session.as_default():
             with self.session.graph.as_default():
                 if not self.initialized():
@@ -6811,15 +7180,19 @@ class CDRModel(object):
                             pred_path = path
                     else:
                         pred_path = path
+                    backup_path = get_checkpoint_path(path[:-5] + '%s_backup.ckpt' % suffix)
+                    pred_backup_path = get_checkpoint_path(pred_path[:-5] + '%s_backup.ckpt' % suffix)
+                    path = get_checkpoint_path(path)
+                    pred_path = get_checkpoint_path(pred_path)
                     try:
                         self.saver.restore(self.session, path)
                         if predict and self.ema_decay:
                             self.ema_saver.restore(self.session, pred_path)
                     except tf.errors.DataLossError:
                         stderr('Read failure during load. Trying from backup...\n')
-                        self.saver.restore(self.session, path[:-5] + '%s_backup.ckpt' % suffix)
+                        self.saver.restore(self.session, backup_path)
                         if predict:
-                            self.ema_saver.restore(self.session, pred_path[:-5] + '%s_backup.ckpt' % suffix)
+                            self.ema_saver.restore(self.session, pred_backup_path)
                     except tf.errors.NotFoundError as err:  # Model contains variables that are missing in checkpoint, special handling needed
                         if allow_missing:
                             reader = tf.train.NewCheckpointReader(path)
@@ -6880,7 +7253,222 @@ class CDRModel(object):
         """
 
         if self.resample_ops:
-            self.session.run(self.resample_ops)
+            self.get_session_callable(('resample',), self.resample_ops)()
+
+    def get_session_callable(self, key, fetches, feed_names=None):
+        """
+        Get a compiled session callable for **fetches**, building and caching it on first use.
+        Calling the result avoids the per-call fetch and feed resolution of ``session.run``, which dominates the cost of repeatedly evaluating small graphs (e.g. once per posterior sample).
+
+        :param key: hashable; cache key identifying **fetches** (the feed names are appended automatically).
+        :param fetches: tensor, op, or (nested) ``list``/``dict`` of tensors/ops to fetch.
+        :param feed_names: ``list`` of ``str`` or ``None``; names of model attributes (e.g. ``'X'``, ``'Y_time'``) to feed, in the order in which their values will be passed to the callable. If ``None``, nothing is fed.
+        :return: callable; takes the feed values positionally and returns values with the same structure as **fetches**.
+        """
+
+        if feed_names is None:
+            feed_names = []
+        key = tuple(key) + tuple(feed_names)
+        if key not in self.session_callables:
+            with self.session.as_default():
+                with self.session.graph.as_default():
+                    feed_list = [getattr(self, x) for x in feed_names]
+                    self.session_callables[key] = self.session.make_callable(fetches, feed_list=feed_list)
+
+        return self.session_callables[key]
+
+    def sample_outputs(self, key, get_fetches, feed_dict, n_samples, verbose=True):
+        """
+        Evaluate the fetches returned by **get_fetches** on a batch of data once for each of **n_samples** draws from the model posterior.
+        The feed is assembled once and the resampling and evaluation steps are run through cached session callables.
+
+        :param key: hashable; cache key identifying the fetches.
+        :param get_fetches: callable; takes no arguments and returns the tensor or (nested) ``list``/``dict`` of tensors to fetch. Called after each resampling step, since ensembles may switch the active model (and therefore graph).
+        :param feed_dict: ``dict``; A dictionary mapping string input names (e.g. ``'X'``, ``'Y'``) to their values.
+        :param n_samples: ``int``; number of posterior samples to draw.
+        :param verbose: ``bool``; Send progress reports to standard error.
+        :return: generator of evaluated fetches, one per posterior sample.
+        """
+
+        feed_names = sorted(feed_dict.keys())
+        feed_vals = [feed_dict[x] for x in feed_names]
+
+        if verbose:
+            pb = keras.utils.Progbar(n_samples)
+
+        for i in range(n_samples):
+            self.resample_model()
+            # Look up after resampling, since ensembles may switch the active model
+            run = self.get_session_callable(key, get_fetches(), feed_names=feed_names)
+            yield run(*feed_vals)
+            if verbose:
+                pb.update(i + 1)
+
+    def get_eval_minibatch_size(self, n=None, sum_outputs_along_T=True, sum_outputs_along_K=True):
+        """
+        Get the size of minibatches to use for prediction/evaluation.
+        If ``eval_minibatch_size`` is ``'auto'``, estimate the memory footprint per row of evaluation from the history length, the number of impulses, the dimensionality of the responses, and the output reduction flags, and return the largest power of 2 that fits within ``eval_memory_budget``.
+
+        :param n: ``int`` or ``None``; number of rows to evaluate. If not ``None``, the result is capped at **n**.
+        :param sum_outputs_along_T: ``bool``; whether outputs will be summed along the time dimension.
+        :param sum_outputs_along_K: ``bool``; whether outputs will be summed along the predictor dimension.
+        :return: ``int``; minibatch size.
+        """
+
+        if self.eval_minibatch_size != 'auto':
+            return self.eval_minibatch_size
+
+        T = self.history_length + self.future_length
+        K = max(1, self.n_impulse)
+        n_param = sum(self.get_response_nparam(x) * self.get_response_ndim(x) for x in self.response_names)
+        n_out = 1
+        if not sum_outputs_along_T:
+            n_out *= T
+        if not sum_outputs_along_K:
+            n_out *= K
+
+        # Impulse inputs (values, timestamps, mask), IRF-weighted impulses per response parameter, and outputs
+        bytes_per_row = T * K * (3 + EVAL_MEMORY_OVERHEAD * n_param) + EVAL_MEMORY_OVERHEAD * n_out * n_param
+        bytes_per_row *= np.dtype(self.FLOAT_NP).itemsize
+
+        if self.eval_memory_budget is None:
+            budget = get_available_memory()
+            if budget is None:
+                budget = 1024 * 2 ** 20
+            else:
+                budget = budget // 4
+        else:
+            budget = self.eval_memory_budget * 2 ** 20
+
+        B = 2 ** int(max(0, math.floor(math.log2(max(1, budget / bytes_per_row)))))
+        if n is not None:
+            B = max(1, min(B, n))
+
+        return B
+
+    def run_eval_op(self, run_op, feed_dict, batch_size, **kwargs):
+        """
+        Run an evaluation op (e.g. ``run_predict_op``) on a minibatch of data.
+        If ``eval_minibatch_size`` is ``'auto'``, the minibatch is evaluated in sub-batches of at most ``batch_size['value']`` rows, which is halved (and kept halved for subsequent calls) whenever evaluation fails to allocate memory.
+        If ``trim_impulse_padding`` is ``True``, timesteps that are padding for every row of a (sub-)batch are dropped before evaluation (unless outputs are returned per timestep).
+        If ``precise_t_delta`` is ``True``, temporal offsets are computed from the (``float64``) timestamps at this point and fed to the model directly.
+
+        :param run_op: callable; the evaluation op, which takes a feed dict and returns a (possibly nested) ``dict`` of ``numpy`` arrays or a ``numpy`` array with one row per response.
+        :param feed_dict: ``dict``; A dictionary mapping string input names (e.g. ``'X'``, ``'Y'``) to their values.
+        :param batch_size: ``dict``; mutable state holding the current sub-batch size at key ``'value'``.
+        :param kwargs: additional keyword arguments passed to **run_op**.
+        :return: outputs of **run_op**.
+        """
+
+        trim = self.trim_impulse_padding and feed_dict.get('sum_outputs_along_T', True) and 'X_mask' in feed_dict
+        precise = self.precise_t_delta and 'X_time' in feed_dict and 'Y_time' in feed_dict
+
+        def run(fd):
+            if trim or precise:
+                fd = fd.copy()
+            if trim:
+                fd['X'], fd['X_time'], fd['X_mask'] = trim_impulse_windows(fd['X'], fd['X_time'], fd['X_mask'])
+            if precise:
+                fd['t_delta_in'] = get_t_delta(fd['X_time'], fd['Y_time'], float_type=self.float_type)
+                fd['X_time'] = fd['X_time'].astype(self.FLOAT_NP)
+            return run_op(fd, **kwargs)
+
+        if self.eval_minibatch_size != 'auto':
+            return run(feed_dict)
+
+        n = len(feed_dict['Y_time'])
+        while True:
+            B = max(1, min(n, batch_size['value']))
+            try:
+                out = []
+                for j in range(0, n, B):
+                    if B < n:
+                        fd = {
+                            x: feed_dict[x][j:j + B] if x in EVAL_ROW_KEYS and feed_dict[x] is not None else feed_dict[x]
+                            for x in feed_dict
+                        }
+                    else:
+                        fd = feed_dict
+                    out.append(run(fd))
+                break
+            except (tf.errors.ResourceExhaustedError, MemoryError):
+                if B == 1:
+                    raise
+                batch_size['value'] = B // 2
+                stderr('\nAllocation failed at evaluation minibatch size %d. Retrying with size %d.\n' % (B, B // 2))
+
+        if len(out) == 1:
+            return out[0]
+        if isinstance(out[0], dict):
+            return concat_nested(out)
+
+        return np.concatenate(out, axis=0)
+
+    def get_eval_data(self, tables, settings, build_fn):
+        """
+        Get model-ready evaluation arrays built from **tables**, memoizing them in a least-recently-used cache of up to ``eval_data_cache_size`` entries.
+        Entries are keyed by the identity of the input tables (which the cache keeps alive) and by **settings**, so this is only valid for tables that are not modified in place.
+        Used to avoid rebuilding dev set arrays at each periodic evaluation during training.
+
+        :param tables: ``list`` of ``pandas`` tables; the source data.
+        :param settings: hashable; any other settings that affect the output of **build_fn**.
+        :param build_fn: callable; function of no arguments that builds the arrays from **tables**.
+        :return: output of **build_fn**.
+        """
+
+        if not self.eval_data_cache_size:
+            return build_fn()
+
+        key = tuple(id(x) for x in tables) + (settings,)
+        entry = self.eval_data_cache.get(key, None)
+        if entry is not None and len(entry[0]) == len(tables) and all(a is b for a, b in zip(entry[0], tables)):
+            self.eval_data_cache.move_to_end(key)
+            return entry[1]
+
+        data = build_fn()
+        self.eval_data_cache[key] = (list(tables), data)
+        while len(self.eval_data_cache) > self.eval_data_cache_size:
+            _, (_, evicted) = self.eval_data_cache.popitem(last=False)
+            self.close_eval_data(evicted)
+
+        return data
+
+    def release_eval_data(self, data):
+        """
+        Release evaluation arrays obtained from ``get_eval_data`` (or built directly) once they are no longer needed.
+        Arrays that are memoized in the evaluation data cache are left open for reuse.
+
+        :param data: ``tuple``; the evaluation arrays.
+        :return: ``None``
+        """
+
+        for _, _data in self.eval_data_cache.values():
+            if _data is data:
+                return
+        self.close_eval_data(data)
+
+    def close_eval_data(self, data):
+        """
+        Release any resources (e.g. expansion worker processes and shared memory) held by evaluation arrays.
+
+        :param data: ``tuple``; the evaluation arrays.
+        :return: ``None``
+        """
+
+        for x in data:
+            if isinstance(x, (ImpulseWindows, ParallelImpulseWindows)):
+                x.close()
+
+    def clear_eval_data_cache(self):
+        """
+        Clear memoized evaluation arrays (see ``get_eval_data``), releasing any resources they hold.
+
+        :return: ``None``
+        """
+
+        for _, data in self.eval_data_cache.values():
+            self.close_eval_data(data)
+        self.eval_data_cache.clear()
 
     def finalize(self):
         """
@@ -7730,7 +8318,7 @@ class CDRModel(object):
         :param X_in_Y_names: ``list`` of ``str``; names of predictors contained in **Y** rather than **X** (must be present in all elements of **Y**). If ``None``, no such predictors.
         :param n_iter: ``int`` or ``None``; maximum number of training iterations. Training will stop either at convergence or **n_iter**, whichever happens first. If ``None``, uses model default.
         :param force_training_evaluation: ``bool``; (Re-)run post-fitting evaluation, even if resuming a model whose training is already complete.
-        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.
         """
 
         if not isinstance(X, list):
@@ -7752,6 +8340,20 @@ class CDRModel(object):
             assert X_dev is not None, '``X_dev`` must be specified if early stopping is used'
             assert Y_dev is not None, '``Y_dev`` must be specified if early stopping is used'
 
+        # Fixed dev subsample for incremental evaluation
+        Y_dev_eval = Y_dev
+        dev_loglik_scale = None
+        if self.eval_freq > 0 and Y_dev is not None and self.dev_eval_subsample:
+            Y_dev_eval = []
+            dev_loglik_scale = {}
+            for ix, _Y in enumerate(Y_dev):
+                _n = len(_Y)
+                if _n > self.dev_eval_subsample:
+                    sel = np.unique(np.linspace(0, _n - 1, self.dev_eval_subsample).round().astype(int))
+                    _Y = _Y.iloc[sel]
+                Y_dev_eval.append(_Y)
+                dev_loglik_scale[ix] = _n / max(1, len(_Y))
+
         # Preprocess data
         # Training data
         if self.use_crossval:
@@ -7764,6 +8366,19 @@ class CDRModel(object):
         else:
             minibatch_size = self.minibatch_size
         n_minibatch = int(math.ceil(n / minibatch_size))
+        if self.graph_epoch:
+            # Training data are fed in chunks of many minibatches, which are then run in the graph
+            assert self.graph_epoch_n_minibatch or not optimize_memory, 'Staging the entire epoch in graph memory ' \
+                                                                         '(graph_epoch_n_minibatch=None) is not supported ' \
+                                                                         'with optimize_memory, since it would materialize ' \
+                                                                         'the full expanded impulse data. Set ' \
+                                                                         'graph_epoch_n_minibatch to a number of minibatches.'
+            if self.graph_epoch_n_minibatch:
+                batch_size = min(n, minibatch_size * self.graph_epoch_n_minibatch)
+            else:
+                batch_size = n
+        else:
+            batch_size = minibatch_size
 
         stderr('*' * 100 + '\n' + self.initialization_summary() + '*' * 100 + '\n\n')
         with open(self.outdir + '/initialization_summary.txt', 'w') as i_file:
@@ -7787,10 +8402,27 @@ class CDRModel(object):
             Y_category_map=self.response_category_to_ix,
             response_to_df_ix=self.response_to_df_ix,
             gf_names=self.rangf,
-            gf_map=self.rangf_map
+            gf_map=self.rangf_lookup
         )
 
-        if not optimize_memory:
+        if optimize_memory:
+            # Training data, expanded lazily for each minibatch
+            impulse_windows = ImpulseWindows(
+                X_in,
+                first_obs,
+                last_obs,
+                X_in_Y_names=X_in_Y_names,
+                X_in_Y=X_in_Y,
+                history_length=self.history_length,
+                future_length=self.future_length,
+                impulse_names=self.impulse_names,
+                int_type=self.int_type,
+                float_type=self.float_type,
+                time_type=self.time_type
+            )
+            if self.n_expansion_workers > 1:
+                impulse_windows = impulse_windows.parallelize(self.n_expansion_workers, batch_size=minibatch_size)
+        else:
             # Training data
             X, X_time, X_mask = build_CDR_impulse_data(
                 X_in,
@@ -7803,7 +8435,27 @@ class CDRModel(object):
                 impulse_names=self.impulse_names,
                 int_type=self.int_type,
                 float_type=self.float_type,
+                time_type=self.time_type
             )
+            if self.impulse_storage_type:
+                X, X_time, X_mask = compress_impulse_data(X, X_time, X_mask, Y_time, self.impulse_storage_type)
+
+        prefetch_depth = self.prefetch_depth
+        n_prefetch_workers = self.n_prefetch_workers
+        if optimize_memory and self.n_expansion_workers > 1:
+            # Keep every expansion worker busy
+            prefetch_depth = max(prefetch_depth, self.n_expansion_workers)
+            n_prefetch_workers = max(n_prefetch_workers, self.n_expansion_workers)
+
+        # Batch normalization moments and activity/context regularization penalties are computed over all
+        # timesteps (including padding, whose activations are nonzero due to biases), so trimming padding
+        # would change the training objective.
+        trim_impulse_padding = self.trim_impulse_padding and not any(
+            self.get_nn_meta('use_batch_normalization', nn_id) or
+            self.get_nn_meta('activity_regularizer_name', nn_id) is not None or
+            self.get_nn_meta('context_regularizer_name', nn_id) is not None
+            for nn_id in self.nn_meta
+        )
 
         if False:
             self.make_plots(prefix='plt')
@@ -7841,14 +8493,18 @@ class CDRModel(object):
 
                     t0_iter = pytime.time()
 
+                    # Host-side mirror of the global step, to avoid a session call every time it is checked
+                    global_step = self.global_step.eval(session=self.session)
+
                     while not self.has_converged() and \
-                            self.global_step.eval(session=self.session) < n_iter:
+                            global_step < n_iter:
                         if failed:
                             stderr('Restarting from most recent checkpoint (restart #%d from this checkpoint).\n' % n_failed)
                             self.load() # Reload from previous save point
+                            global_step = self.global_step.eval(session=self.session)
                         p, p_inv = get_random_permutation(n)
                         stderr('-' * 50 + '\n')
-                        stderr('Iteration %d\n' % int(self.global_step.eval(session=self.session) + 1))
+                        stderr('Iteration %d\n' % int(global_step + 1))
                         stderr('\n')
                         if self.optim_name is not None and self.lr_decay_family is not None:
                             stderr('Learning rate: %s\n' % self.lr.eval(session=self.session))
@@ -7862,63 +8518,60 @@ class CDRModel(object):
                         if self.loss_cutoff_n_sds:
                             n_dropped = 0.
 
-                        failed = False
-                        for i in range(0, n, minibatch_size):
-                            indices = p[i:i+minibatch_size]
+                        def get_minibatch(i, p=p):
+                            indices = p[i:i+batch_size]
                             if optimize_memory:
-                                _Y = Y[indices]
-                                _first_obs = [x[indices] for x in first_obs]
-                                _last_obs = [x[indices] for x in last_obs]
-                                _Y_time = Y_time[indices]
-                                _Y_mask = Y_mask[indices]
-                                _Y_gf = None if Y_gf is None else Y_gf[indices]
-                                _X_in_Y = None if X_in_Y is None else X_in_Y[indices]
-                                _X, _X_time, _X_mask = build_CDR_impulse_data(
-                                    X_in,
-                                    _first_obs,
-                                    _last_obs,
-                                    X_in_Y_names=X_in_Y_names,
-                                    X_in_Y=_X_in_Y,
-                                    history_length=self.history_length,
-                                    future_length=self.future_length,
-                                    impulse_names=self.impulse_names,
-                                    int_type=self.int_type,
-                                    float_type=self.float_type,
-                                )
-                                fd = {
-                                    self.X: _X,
-                                    self.X_time: _X_time,
-                                    self.X_mask: _X_mask,
-                                    self.Y: _Y,
-                                    self.Y_time: _Y_time,
-                                    self.Y_mask: _Y_mask,
-                                    self.Y_gf: _Y_gf,
-                                    self.training: not self.predict_mode
-                                }
+                                _X, _X_time, _X_mask = impulse_windows[indices]
                             else:
-                                fd = {
-                                    self.X: X[indices],
-                                    self.X_time: X_time[indices],
-                                    self.X_mask: X_mask[indices],
-                                    self.Y: Y[indices],
-                                    self.Y_time: Y_time[indices],
-                                    self.Y_mask: Y_mask[indices],
-                                    self.Y_gf: None if Y_gf is None else Y_gf[indices],
-                                    self.training: not self.predict_mode
-                                }
-
-                            try:
-                                info_dict = self.run_train_step(fd)
-                            except tf.errors.InvalidArgumentError as e:
-                                failed = True
-                                stderr('\nDid not pass stability check.\nNon-finite gradients.\n')
-                                break
+                                _X, _X_time, _X_mask = X[indices], X_time[indices], X_mask[indices]
+                                if self.impulse_storage_type:
+                                    _X, _X_time, _X_mask = decompress_impulse_data(
+                                        _X,
+                                        _X_time,
+                                        _X_mask,
+                                        Y_time[indices],
+                                        float_type=self.float_type,
+                                        time_type=self.time_type
+                                    )
+                            if trim_impulse_padding:
+                                _X, _X_time, _X_mask = trim_impulse_windows(_X, _X_time, _X_mask)
+                            fd = {
+                                self.X: _X,
+                                self.X_time: _X_time,
+                                self.X_mask: _X_mask,
+                                self.Y: Y[indices],
+                                self.Y_time: Y_time[indices],
+                                self.Y_mask: Y_mask[indices],
+                                self.Y_gf: None if Y_gf is None else Y_gf[indices],
+                                self.training: not self.predict_mode
+                            }
+                            if self.precise_t_delta:
+                                fd[self.t_delta_in] = get_t_delta(_X_time, Y_time[indices], float_type=self.float_type)
+                                fd[self.X_time] = _X_time.astype(self.FLOAT_NP)
+                            return fd
+
+                        minibatches = prefetch_batches(
+                            get_minibatch,
+                            range(0, n, batch_size),
+                            depth=prefetch_depth,
+                            n_workers=n_prefetch_workers
+                        )
 
+                        failed = False
+                        for i, fd in zip(range(0, n, batch_size), minibatches):
                             try:
-                                self.check_numerics()
+                                if self.graph_epoch:
+                                    n_step = int(math.ceil(min(batch_size, n - i) / minibatch_size))
+                                    info_dict = self.run_train_chunk(fd, n_step, minibatch_size)
+                                else:
+                                    n_step = 1
+                                    info_dict = self.run_train_step(fd)
                             except tf.errors.InvalidArgumentError as e:
                                 failed = True
-                                stderr('\nDid not pass stability check.\nNon-finite parameter values.\n')
+                                if 'Numerics check failed' in e.message:
+                                    stderr('\nDid not pass stability check.\nNon-finite parameter values.\n')
+                                else:
+                                    stderr('\nDid not pass stability check.\nNon-finite gradients.\n')
                                 break
 
                             if self.loss_cutoff_n_sds:
@@ -7933,17 +8586,20 @@ class CDRModel(object):
                                 loss_cur = 0
                             loss_total += loss_cur
 
-                            pb_update = [('loss', loss_cur)]
+                            # Progress bar values are per-minibatch means
+                            pb_update = [('loss', loss_cur / n_step)]
                             if 'reg_loss' in info_dict:
                                 reg_loss_cur = info_dict['reg_loss']
                                 reg_loss_total += reg_loss_cur
-                                pb_update.append(('reg', reg_loss_cur))
+                                pb_update.append(('reg', reg_loss_cur / n_step))
                             if 'kl_loss' in info_dict:
                                 kl_loss_cur = info_dict['kl_loss']
                                 kl_loss_total += kl_loss_cur
-                                pb_update.append(('kl', kl_loss_cur))
+                                pb_update.append(('kl', kl_loss_cur / n_step))
 
-                            pb.update((i/minibatch_size) + 1, values=pb_update)
+                            pb.update((i/minibatch_size) + n_step, values=pb_update)
+
+                        minibatches.close()
 
                         if failed:
                             n_failed += 1
@@ -7953,19 +8609,17 @@ class CDRModel(object):
                             continue
 
                         self.session.run(self.incr_global_step)
+                        global_step += 1
 
                         if self.eval_freq > 0 and \
-                                self.global_step.eval(session=self.session) % self.eval_freq == 0:
+                                global_step % self.eval_freq == 0:
                             self.save()
-                            if self.crossval_use_dev_fold:
-                                partition_name = 'CVdev'
-                            else:
-                                partition_name = 'dev'
-                            dev_results, _ = self.evaluate(
+                            dev_results = self.evaluate_metrics(
                                 X_dev,
-                                Y_dev,
+                                Y_dev_eval,
                                 X_in_Y_names=X_in_Y_names,
-                                partition=partition_name,
+                                loglik_scale=dev_loglik_scale,
+                                cache_data=True,
                                 optimize_memory=optimize_memory
                             )
                             dev_ll = dev_results['full_log_lik']
@@ -7984,7 +8638,7 @@ class CDRModel(object):
                             )
                             self.writer.add_summary(
                                 summary_dev,
-                                self.global_step.eval(session=self.session)
+                                global_step
                             )
                         else:
                             dev_ll = None
@@ -8001,7 +8655,7 @@ class CDRModel(object):
                                 self.run_convergence_check(verbose=False, feed_dict=fd)
 
                         if self.log_freq > 0 and \
-                                self.global_step.eval(session=self.session) % self.log_freq == 0:
+                                global_step % self.log_freq == 0:
                             loss_total /= n_minibatch
                             reg_loss_total /= n_minibatch
                             log_fd = {self.loss_total: loss_total, self.reg_loss_total: reg_loss_total}
@@ -8013,18 +8667,18 @@ class CDRModel(object):
                             summary_train_loss = self.session.run(self.summary_opt, feed_dict=log_fd)
                             self.writer.add_summary(
                                 summary_train_loss,
-                                self.global_step.eval(session=self.session)
+                                global_step
                             )
                             summary_params = self.session.run(self.summary_params)
                             self.writer.add_summary(
                                 summary_params,
-                                self.global_step.eval(session=self.session)
+                                global_step
                             )
                             if self.log_random and self.is_mixed_model:
                                 summary_random = self.session.run(self.summary_random)
                                 self.writer.add_summary(
                                     summary_random,
-                                    self.global_step.eval(session=self.session)
+                                    global_step
                                 )
                             self.writer.flush()
 
@@ -8035,11 +8689,11 @@ class CDRModel(object):
                         stderr('Iteration time: %.2fs\n' % t_iter)
 
                         if self.save_freq > 0 and \
-                                self.global_step.eval(session=self.session) % self.save_freq == 0:
+                                global_step % self.save_freq == 0:
                             n_failed = 0
                             self.save()
                         if self.plot_freq > 0 and \
-                                self.global_step.eval(session=self.session) % self.plot_freq == 0:
+                                global_step % self.plot_freq == 0:
                             self.make_plots(prefix='plt')
 
                         if self.check_convergence:
@@ -8086,8 +8740,10 @@ class CDRModel(object):
                             X_in_Y_names=X_in_Y_names,
                             dump=True,
                             partition=dev_name,
+                            cache_data=True,
                             optimize_memory=optimize_memory
                         )
+                        self.clear_eval_data_cache()
                         
                     # Extract and save losses
                     ll_full = sum([_ll for r in self.response_names for _ll in metrics['log_lik'][r]])
@@ -8118,6 +8774,8 @@ class CDRModel(object):
                     self.set_training_complete(True)
                     self.save()
 
+                self.flush_saves()
+
     def run_predict_op(
             self,
             feed_dict,
@@ -8126,6 +8784,7 @@ class CDRModel(object):
             algorithm='MAP',
             return_preds=True,
             return_loglik=False,
+            return_sd=False,
             verbose=True
     ):
         """
@@ -8137,8 +8796,9 @@ class CDRModel(object):
         :param algorithm: ``str``; Algorithm (``MAP`` or ``sampling``) to use for extracting predictions. Only relevant for variational Bayesian models. If ``MAP``, uses posterior means as point estimates for the parameters (no sampling). If ``sampling``, draws **n_samples** from the posterior.
         :param return_preds: ``bool``; whether to return predictions.
         :param return_loglik: ``bool``; whether to return elementwise log likelihoods. Requires that **Y** is not ``None``.
+        :param return_sd: ``bool``; whether to also return the standard deviation of predictions over posterior samples (real-valued responses only). Ignored unless **algorithm** is ``sampling``.
         :param verbose: ``bool``; Send progress reports to standard error.
-        :return: ``dict`` of ``numpy`` arrays; Predicted responses and/or log likelihoods, one for each training sample. Key order: <('preds'|'log_lik'), response>.
+        :return: ``dict`` of ``numpy`` arrays; Predicted responses and/or log likelihoods (and optionally prediction SDs), one for each training sample. Key order: <('preds'|'log_lik'|'preds_sd'), response>.
         """
 
         assert 'Y' in feed_dict or not return_loglik, 'Cannot return log likelihood when Y is not provided.'
@@ -8166,57 +8826,53 @@ class CDRModel(object):
                 if n_samples is None:
                     n_samples = self.n_samples_eval
 
-                if verbose:
-                    pb = keras.utils.Progbar(n_samples)
-
-                out = {}
+                # Reduce over samples online so that memory does not scale with n_samples
+                pred_reducers = {}
                 if return_preds:
-                    out['preds'] = {x: np.zeros((len(feed_dict['Y_time']), n_samples)) for x in responses}
+                    for _response in responses:
+                        if self.get_response_dist_name(_response) == 'categorical':
+                            pred_reducers[_response] = RunningModeCounts()
+                        else:
+                            pred_reducers[_response] = RunningMoments(var=return_sd)
                 if return_loglik:
-                    out['log_lik'] = {x: np.zeros((len(feed_dict['Y_time']), n_samples)) for x in responses}
-
-                for i in range(n_samples):
-                    self.resample_model()
+                    loglik_reducers = {x: RunningMoments(var=False) for x in responses}
 
+                def get_fetches():
                     to_run = {}
                     if return_preds:
-                        to_run_preds = {x: self.prediction[x] for x in responses}
-                        to_run['preds'] = to_run_preds
-                    else:
-                        to_run_preds = None
+                        to_run['preds'] = {x: self.prediction[x] for x in responses}
                     if return_loglik:
-                        to_run_loglik = {x: self.ll_by_var[x] for x in responses}
-                        to_run['log_lik'] = to_run_loglik
-                    else:
-                        to_run_loglik = None
-                    fd = {getattr(self, x): feed_dict[x] for x in feed_dict}
-                    _out = self.session.run(to_run, feed_dict=fd)
-                    if to_run_preds:
-                        _preds = _out['preds']
-                        for _response in _preds:
-                            out['preds'][_response][:, i] = _preds[_response]
-                    if to_run_loglik:
-                        _log_lik = _out['log_lik']
-                        for _response in _log_lik:
-                            out['log_lik'][_response][:, i] = _log_lik[_response]
-                    if verbose:
-                        pb.update(i + 1)
+                        to_run['log_lik'] = {x: self.ll_by_var[x] for x in responses}
+                    return to_run
+                key = ('predict', return_preds, return_loglik) + tuple(responses)
+
+                for _out in self.sample_outputs(key, get_fetches, feed_dict, n_samples, verbose=verbose):
+                    if return_preds:
+                        for _response in _out['preds']:
+                            pred_reducers[_response].update(_out['preds'][_response])
+                    if return_loglik:
+                        for _response in _out['log_lik']:
+                            loglik_reducers[_response].update(_out['log_lik'][_response])
 
+                out = {}
                 if return_preds:
-                    for _response in out['preds']:
-                        _preds = out['preds'][_response]
+                    out['preds'] = {}
+                    if return_sd:
+                        out['preds_sd'] = {}
+                    for _response in pred_reducers:
                         dist_name = self.get_response_dist_name(_response)
                         if dist_name == 'bernoulli':  # Majority vote
-                            _preds = np.round(np.mean(_preds, axis=1)).astype('int')
+                            _preds = np.round(pred_reducers[_response].mean).astype('int')
                         elif dist_name == 'categorical':  # Majority vote
-                            _preds = scipy.stats.mode(_preds, axis=1)
+                            _preds = pred_reducers[_response].mode
                         else:  # Average
-                            _preds = _preds.mean(axis=1)
+                            _preds = pred_reducers[_response].mean
+                            if return_sd:
+                                out['preds_sd'][_response] = pred_reducers[_response].sd
                         out['preds'][_response] = _preds
 
                 if return_loglik:
-                    for _response in out['log_lik']:
-                        out['log_lik'][_response] = out['log_lik'][_response].mean(axis=1)
+                    out['log_lik'] = {x: loglik_reducers[x].mean for x in loglik_reducers}
 
             return out
 
@@ -8238,23 +8894,14 @@ class CDRModel(object):
             fd = {getattr(self, x): feed_dict[x] for x in feed_dict}
             loss = self.session.run(self.loss_func, feed_dict=fd)
         else:
-            feed_dict[self.use_MAP_mode] = False
             if n_samples is None:
                 n_samples = self.n_samples_eval
 
-            if verbose:
-                pb = keras.utils.Progbar(n_samples)
-
-            loss = np.zeros((len(feed_dict[self.Y_time]), n_samples))
-
-            for i in range(n_samples):
-                self.resample_model()
-                fd = {getattr(self, x): feed_dict[x] for x in feed_dict}
-                loss[:, i] = self.session.run(self.loss_func, feed_dict=fd)
-                if verbose:
-                    pb.update(i + 1)
+            loss = RunningMoments(var=False)
+            for _loss in self.sample_outputs(('loss',), lambda: self.loss_func, feed_dict, n_samples, verbose=verbose):
+                loss.update(_loss)
 
-            loss = loss.mean(axis=1)
+            loss = loss.mean
 
         return loss
 
@@ -8294,33 +8941,21 @@ class CDRModel(object):
             fd = {getattr(self, x): feed_dict[x] for x in feed_dict}
             X_conv = self.session.run(to_run, feed_dict=fd)
         else:
-            X_conv = {}
-            for _response in responses:
-                nparam = self.get_response_nparam(_response)
-                ndim = self.get_response_ndim(_response)
-                X_conv[_response] = np.zeros(
-                    (len(feed_dict[self.Y_time]), len(self.terminal_names), nparam, ndim, n_samples)
-                )
-
             if n_samples is None:
                 n_samples = self.n_samples_eval
-            if verbose:
-                pb = keras.utils.Progbar(n_samples)
 
-            for i in range(0, n_samples):
-                self.resample_model()
-                to_run = {}
-                for _response in responses:
-                    to_run[_response] = self.X_conv_delta[_response]
-                fd = {getattr(self, x): feed_dict[x] for x in feed_dict}
-                _X_conv = self.session.run(to_run, feed_dict=fd)
+            X_conv = {x: RunningMoments(var=False) for x in responses}
+
+            def get_fetches():
+                return {x: self.X_conv_delta[x] for x in responses}
+            key = ('conv',) + tuple(responses)
+
+            for _X_conv in self.sample_outputs(key, get_fetches, feed_dict, n_samples, verbose=verbose):
                 for _response in _X_conv:
-                    X_conv[_response][..., i] = _X_conv[_response]
-                if verbose:
-                    pb.update(i + 1, force=True)
+                    X_conv[_response].update(_X_conv[_response])
 
             for _response in X_conv:
-                X_conv[_response] = X_conv[_response].mean(axis=2)
+                X_conv[_response] = X_conv[_response].mean
 
         # Break things out by response dimension
         out = {}
@@ -8351,11 +8986,14 @@ class CDRModel(object):
             algorithm='MAP',
             return_preds=True,
             return_loglik=False,
+            return_sd=False,
             sum_outputs_along_T=True,
             sum_outputs_along_K=True,
             dump=False,
             extra_cols=False,
             partition=None,
+            append=False,
+            cache_data=False,
             optimize_memory=False,
             verbose=True
     ):
@@ -8397,13 +9035,16 @@ class CDRModel(object):
         :param algorithm: ``str``; algorithm to use for extracting predictions, one of [``MAP``, ``sampling``].
         :param return_preds: ``bool``; whether to return predictions.
         :param return_loglik: ``bool``; whether to return elementwise log likelihoods. Requires that **Y** is not ``None``.
+        :param return_sd: ``bool``; whether to also return (and dump, as column ``CDRpredsSD``) the standard deviation of predictions over posterior samples for real-valued responses. Ignored unless **algorithm** is ``sampling``.
         :param sum_outputs_along_T: ``bool``; whether to sum IRF-weighted predictors along the time dimension. Must be ``True`` for valid convolution. Setting to ``False`` is useful for timestep-specific evaluation.
         :param sum_outputs_along_K: ``bool``; whether to sum IRF-weighted predictors along the predictor dimension. Must be ``True`` for valid convolution. Setting to ``False`` is useful for impulse-specific evaluation.
         :param dump: ``bool``; whether to save generated predictions (and log likelihood vectors if applicable) to disk.
         :param extra_cols: ``bool``; whether to include columns from **Y** in output tables. Ignored unless **dump** is ``True``.
         :param partition: ``str`` or ``None``; name of data partition (or ``None`` if no partition name), used for output file naming. Ignored unless **dump** is ``True``.
+        :param cache_data: ``bool``; whether to memoize the model-ready arrays built from **X** and **Y** (see ``get_eval_data``), so that repeated calls on the same tables skip preprocessing. Only used if **first_obs**, **last_obs**, **Y_time**, **Y_gf**, and **X_in_Y** are ``None``. **X** and **Y** must not be modified in place while cached.
+        :param append: ``bool``; whether to append rows (without a header) to existing output tables rather than overwriting them. Used to write predictions incrementally over chunks of data. Ignored unless **dump** is ``True``.
         :param verbose: ``bool``; Report progress and metrics to standard error.
-        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.
         :return: 1D ``numpy`` array; mean network predictions for regression targets (same length and sort order as ``y_time``).
         """
 
@@ -8456,181 +9097,224 @@ class CDRModel(object):
             X_in_Y_names = [x for x in X_in_Y_names if x in self.impulse_names]
         X_in_Y_in = X_in_Y
 
-        Y, first_obs, last_obs, Y_time, Y_mask, Y_gf, X_in_Y = build_CDR_response_data(
-            self.response_names,
-            Y=Y_in,
-            first_obs=first_obs,
-            last_obs=last_obs,
-            Y_gf=Y_gf_in,
-            X_in_Y_names=X_in_Y_names,
-            X_in_Y=X_in_Y_in,
-            Y_category_map=self.response_category_to_ix,
-            response_to_df_ix=self.response_to_df_ix,
-            gf_names=self.rangf,
-            gf_map=self.rangf_map
-        )
-
-        if not optimize_memory:
-            X, X_time, X_mask = build_CDR_impulse_data(
-                X_in,
-                first_obs,
-                last_obs,
+        def build_data(first_obs=first_obs, last_obs=last_obs):
+            Y, first_obs, last_obs, Y_time, Y_mask, Y_gf, X_in_Y = build_CDR_response_data(
+                self.response_names,
+                Y=Y_in,
+                first_obs=first_obs,
+                last_obs=last_obs,
+                Y_gf=Y_gf_in,
                 X_in_Y_names=X_in_Y_names,
-                X_in_Y=X_in_Y,
-                history_length=self.history_length,
-                future_length=self.future_length,
-                impulse_names=self.impulse_names,
-                int_type=self.int_type,
-                float_type=self.float_type,
+                X_in_Y=X_in_Y_in,
+                Y_category_map=self.response_category_to_ix,
+                response_to_df_ix=self.response_to_df_ix,
+                gf_names=self.rangf,
+                gf_map=self.rangf_lookup
             )
 
-        if return_preds or return_loglik:
-            with self.session.as_default():
-                with self.session.graph.as_default():
-                    self.set_predict_mode(True)
-
-                    out = {}
-                    out_shape = (n,)
-                    if not sum_outputs_along_T:
-                        out_shape = out_shape + (self.history_length + self.future_length,)
-                    if not sum_outputs_along_K:
-                        n_impulse = self.n_impulse
-                        out_shape = out_shape + (n_impulse,)
+            if optimize_memory:
+                impulse_windows = ImpulseWindows(
+                    X_in,
+                    first_obs,
+                    last_obs,
+                    X_in_Y_names=X_in_Y_names,
+                    X_in_Y=X_in_Y,
+                    history_length=self.history_length,
+                    future_length=self.future_length,
+                    impulse_names=self.impulse_names,
+                    int_type=self.int_type,
+                    float_type=self.float_type,
+                    time_type=self.time_type
+                )
+                if self.n_expansion_workers > 1:
+                    impulse_windows = impulse_windows.parallelize(
+                        self.n_expansion_workers,
+                        batch_size=self.get_eval_minibatch_size(n, sum_outputs_along_T, sum_outputs_along_K)
+                    )
+            else:
+                X, X_time, X_mask = build_CDR_impulse_data(
+                    X_in,
+                    first_obs,
+                    last_obs,
+                    X_in_Y_names=X_in_Y_names,
+                    X_in_Y=X_in_Y,
+                    history_length=self.history_length,
+                    future_length=self.future_length,
+                    impulse_names=self.impulse_names,
+                    int_type=self.int_type,
+                    float_type=self.float_type,
+                    time_type=self.time_type
+                )
+            if optimize_memory:
+                return Y, first_obs, last_obs, Y_time, Y_mask, Y_gf, X_in_Y, impulse_windows
+            return Y, first_obs, last_obs, Y_time, Y_mask, Y_gf, X_in_Y, (X, X_time, X_mask)
+
+        if cache_data and first_obs is None and last_obs is None and Y_time is None and Y_gf is None and X_in_Y is None:
+            data = self.get_eval_data(
+                X_in + Y_in,
+                ('predict', tuple(X_in_Y_names) if X_in_Y_names else None, optimize_memory),
+                build_data
+            )
+        else:
+            data = build_data()
+        Y, first_obs, last_obs, Y_time, Y_mask, Y_gf, X_in_Y, impulse_data = data
+        if optimize_memory:
+            impulse_windows = impulse_data
+        else:
+            X, X_time, X_mask = impulse_data
 
-                    if return_preds:
-                        out['preds'] = {}
-                        for _response in responses:
-                            if self.is_real(_response):
-                                dtype = self.FLOAT_NP
-                            else:
-                                dtype = self.INT_NP
-                            out['preds'][_response] = np.zeros(out_shape, dtype=dtype)
-                    if return_loglik:
-                        out['log_lik'] = {x: np.zeros(out_shape) for x in responses}
+        try:
+            if return_preds or return_loglik:
+                with self.session.as_default():
+                    with self.session.graph.as_default():
+                        self.set_predict_mode(True)
+
+                        out = {}
+                        out_shape = (n,)
+                        if not sum_outputs_along_T:
+                            out_shape = out_shape + (self.history_length + self.future_length,)
+                        if not sum_outputs_along_K:
+                            n_impulse = self.n_impulse
+                            out_shape = out_shape + (n_impulse,)
 
-                    B = self.eval_minibatch_size
-                    n_eval_minibatch = math.ceil(n / B)
-                    for i in range(0, n, B):
-                        if verbose:
-                            stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
+                        if return_preds:
+                            out['preds'] = {}
+                            for _response in responses:
+                                if self.is_real(_response):
+                                    dtype = self.FLOAT_NP
+                                else:
+                                    dtype = self.INT_NP
+                                out['preds'][_response] = np.zeros(out_shape, dtype=dtype)
+                        if return_loglik:
+                            out['log_lik'] = {x: np.zeros(out_shape) for x in responses}
+                        return_sd = return_sd and return_preds and algorithm.lower() != 'map'
+                        if return_sd:
+                            out['preds_sd'] = {x: np.zeros(out_shape) for x in responses if self.is_real(x)}
+
+                        B = self.get_eval_minibatch_size(n, sum_outputs_along_T, sum_outputs_along_K)
+                        batch_size = {'value': B}
+                        n_eval_minibatch = math.ceil(n / B)
                         if optimize_memory:
-                            _Y = None if Y is None else Y[i:i + B]
-                            _first_obs = [x[i:i + B] for x in first_obs]
-                            _last_obs = [x[i:i + B] for x in last_obs]
-                            _Y_time = Y_time[i:i + B]
-                            _Y_mask = Y_mask[i:i + B]
-                            _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
-                            _X_in_Y = None if X_in_Y is None else X_in_Y[i:i + B]
+                            impulse_batches = impulse_windows.iter_batches([slice(j, j + B) for j in range(0, n, B)])
+                        for i in range(0, n, B):
+                            if verbose:
+                                stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
+                            if optimize_memory:
+                                _Y = None if Y is None else Y[i:i + B]
+                                _Y_time = Y_time[i:i + B]
+                                _Y_mask = Y_mask[i:i + B]
+                                _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
 
-                            _X, _X_time, _X_mask = build_CDR_impulse_data(
-                                X_in,
-                                _first_obs,
-                                _last_obs,
-                                X_in_Y_names=X_in_Y_names,
-                                X_in_Y=_X_in_Y,
-                                history_length=self.history_length,
-                                future_length=self.future_length,
-                                impulse_names=self.impulse_names,
-                                int_type=self.int_type,
-                                float_type=self.float_type,
+                                _X, _X_time, _X_mask = next(impulse_batches)
+                                fd = {
+                                    'X': _X,
+                                    'X_time': _X_time,
+                                    'X_mask': _X_mask,
+                                    'Y_time': _Y_time,
+                                    'Y_mask': _Y_mask,
+                                    'Y_gf': _Y_gf,
+                                    'training': not self.predict_mode,
+                                    'sum_outputs_along_T': sum_outputs_along_T,
+                                    'sum_outputs_along_K': sum_outputs_along_K
+                                }
+                                if return_loglik:
+                                    fd['Y'] = _Y
+                            else:
+                                fd = {
+                                    'X': X[i:i + B],
+                                    'X_time': X_time[i:i + B],
+                                    'X_mask': X_mask[i:i + B],
+                                    'Y_time': Y_time[i:i + B],
+                                    'Y_mask': Y_mask[i:i + B],
+                                    'Y_gf': None if Y_gf is None else Y_gf[i:i + B],
+                                    'training': not self.predict_mode,
+                                    'sum_outputs_along_T': sum_outputs_along_T,
+                                    'sum_outputs_along_K': sum_outputs_along_K
+                                }
+                                if return_loglik:
+                                    fd['Y'] = Y[i:i + B]
+                            _out = self.run_eval_op(
+                                self.run_predict_op,
+                                fd,
+                                batch_size,
+                                responses=responses,
+                                n_samples=n_samples,
+                                algorithm=algorithm,
+                                return_preds=return_preds,
+                                return_loglik=return_loglik,
+                                return_sd=return_sd,
+                                verbose=verbose
                             )
-                            fd = {
-                                'X': _X,
-                                'X_time': _X_time,
-                                'X_mask': _X_mask,
-                                'Y_time': _Y_time,
-                                'Y_mask': _Y_mask,
-                                'Y_gf': _Y_gf,
-                                'training': not self.predict_mode,
-                                'sum_outputs_along_T': sum_outputs_along_T,
-                                'sum_outputs_along_K': sum_outputs_along_K
-                            }
-                            if return_loglik:
-                                fd['Y'] = _Y
-                        else:
-                            fd = {
-                                'X': X[i:i + B],
-                                'X_time': X_time[i:i + B],
-                                'X_mask': X_mask[i:i + B],
-                                'Y_time': Y_time[i:i + B],
-                                'Y_mask': Y_mask[i:i + B],
-                                'Y_gf': None if Y_gf is None else Y_gf[i:i + B],
-                                'training': not self.predict_mode,
-                                'sum_outputs_along_T': sum_outputs_along_T,
-                                'sum_outputs_along_K': sum_outputs_along_K
-                            }
+
+                            if return_preds:
+                                for _response in _out['preds']:
+                                    out['preds'][_response][i:i + B] = _out['preds'][_response]
                             if return_loglik:
-                                fd['Y'] = Y[i:i + B]
-                        _out = self.run_predict_op(
-                            fd,
-                            responses=responses,
-                            n_samples=n_samples,
-                            algorithm=algorithm,
-                            return_preds=return_preds,
-                            return_loglik=return_loglik,
-                            verbose=verbose
-                        )
+                                for _response in _out['log_lik']:
+                                    out['log_lik'][_response][i:i + B] = _out['log_lik'][_response]
+                            if return_sd:
+                                for _response in _out['preds_sd']:
+                                    out['preds_sd'][_response][i:i + B] = _out['preds_sd'][_response]
 
-                        if return_preds:
-                            for _response in _out['preds']:
-                                out['preds'][_response][i:i + B] = _out['preds'][_response]
-                        if return_loglik:
-                            for _response in _out['log_lik']:
-                                out['log_lik'][_response][i:i + B] = _out['log_lik'][_response]
+                        self.last_eval_minibatch_size = min(B, batch_size['value'])
 
-                    # Convert predictions to category labels, if applicable
-                    if return_preds:
-                        for _response in out['preds']:
-                            if self.is_categorical(_response):
-                                mapper = np.vectorize(lambda x: self.response_ix_to_category[_response].get(x, x))
-                                out['preds'][_response] = mapper(out['preds'][_response])
+                        # Convert predictions to category labels, if applicable
+                        if return_preds:
+                            for _response in out['preds']:
+                                if self.is_categorical(_response):
+                                    mapper = np.vectorize(lambda x: self.response_ix_to_category[_response].get(x, x))
+                                    out['preds'][_response] = mapper(out['preds'][_response])
 
-                    # Split into per-file predictions.
-                    # Exclude the length of last file because it will be inferred.
-                    out = split_cdr_outputs(out, [x for x in lengths[:-1]])
+                        # Split into per-file predictions.
+                        # Exclude the length of last file because it will be inferred.
+                        out = split_cdr_outputs(out, [x for x in lengths[:-1]])
 
-                    if verbose:
-                        stderr('\n\n')
+                        if verbose:
+                            stderr('\n\n')
 
-                    self.set_predict_mode(False)
+                        self.set_predict_mode(False)
 
-                    if dump:
-                        response_keys = responses[:]
+                        if dump:
+                            response_keys = responses[:]
 
-                        if partition and not partition.startswith('_'):
-                            partition_str = '_' + partition
-                        else:
-                            partition_str = ''
-
-                        for _response in response_keys:
-                            file_ix = self.response_to_df_ix[_response]
-                            multiple_files = len(file_ix) > 1
-                            for ix in file_ix:
-                                df = {}
-                                if return_preds and _response in out['preds']:
-                                    df['CDRpreds'] = out['preds'][_response][ix]
-                                if return_loglik:
-                                    df['CDRloglik'] = out['log_lik'][_response][ix]
-                                if Y is not None and _response in Y[ix]:
-                                    df['CDRobs'] = Y[ix][_response]
-                                df = pd.DataFrame(df)
-                                if extra_cols:
-                                    if Y is None:
-                                        df_new = {x: Y_gf_in[i] for i, x in enumerate(self.rangf)}
-                                        df_new['time'] = Y_time_in[ix]
-                                        df_new = pd.DataFrame(df_new)
+                            if partition and not partition.startswith('_'):
+                                partition_str = '_' + partition
+                            else:
+                                partition_str = ''
+
+                            for _response in response_keys:
+                                file_ix = self.response_to_df_ix[_response]
+                                multiple_files = len(file_ix) > 1
+                                for ix in file_ix:
+                                    df = {}
+                                    if return_preds and _response in out['preds']:
+                                        df['CDRpreds'] = out['preds'][_response][ix]
+                                    if return_sd and _response in out['preds_sd']:
+                                        df['CDRpredsSD'] = out['preds_sd'][_response][ix]
+                                    if return_loglik:
+                                        df['CDRloglik'] = out['log_lik'][_response][ix]
+                                    if Y is not None and _response in Y[ix]:
+                                        df['CDRobs'] = Y[ix][_response]
+                                    df = pd.DataFrame(df)
+                                    if extra_cols:
+                                        if Y is None:
+                                            df_new = {x: Y_gf_in[i] for i, x in enumerate(self.rangf)}
+                                            df_new['time'] = Y_time_in[ix]
+                                            df_new = pd.DataFrame(df_new)
+                                        else:
+                                            df_new = Y[ix]
+                                        df = pd.concat([df.reset_index(drop=True), df_new.reset_index(drop=True)], axis=1)
+
+                                    if multiple_files:
+                                        name_base = '%s_f%s%s' % (sn(_response), ix, partition_str)
                                     else:
-                                        df_new = Y[ix]
-                                    df = pd.concat([df.reset_index(drop=True), df_new.reset_index(drop=True)], axis=1)
-
-                                if multiple_files:
-                                    name_base = '%s_f%s%s' % (sn(_response), ix, partition_str)
-                                else:
-                                    name_base = '%s%s' % (sn(_response), partition_str)
-                                df.to_csv(self.outdir + '/CDRpreds_%s.csv' % name_base, sep=' ', na_rep='NaN',
-                                          index=False)
-        else:
-            out = {}
+                                        name_base = '%s%s' % (sn(_response), partition_str)
+                                    df.to_csv(self.outdir + '/CDRpreds_%s.csv' % name_base, sep=' ', na_rep='NaN',
+                                              index=False, mode='a' if append else 'w', header=not append)
+            else:
+                out = {}
+        finally:
+            self.release_eval_data(data)
 
         return out
 
@@ -8754,7 +9438,7 @@ class CDRModel(object):
         :param n_samples: ``int`` or ``None``; number of posterior samples to draw if Bayesian, ignored otherwise. If ``None``, use model defaults.
         :param algorithm: ``str``; algorithm to use for extracting predictions, one of [``MAP``, ``sampling``].
         :param training: ``bool``; Whether to compute loss in training mode.
-        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.
         :param verbose: ``bool``; Report progress and metrics to standard error.
         :return: ``numpy`` array of shape [len(X)], log likelihood of each data point.
         """
@@ -8783,10 +9467,26 @@ class CDRModel(object):
             Y_category_map=self.response_category_to_ix,
             response_to_df_ix=self.response_to_df_ix,
             gf_names=self.rangf,
-            gf_map=self.rangf_map
+            gf_map=self.rangf_lookup
         )
 
-        if not optimize_memory:
+        if optimize_memory:
+            impulse_windows = ImpulseWindows(
+                X_in,
+                first_obs,
+                last_obs,
+                X_in_Y_names=X_in_Y_names,
+                X_in_Y=X_in_Y,
+                history_length=self.history_length,
+                future_length=self.future_length,
+                impulse_names=self.impulse_names,
+                int_type=self.int_type,
+                float_type=self.float_type,
+                time_type=self.time_type
+            )
+            if self.n_expansion_workers > 1:
+                impulse_windows = impulse_windows.parallelize(self.n_expansion_workers, batch_size=self.get_eval_minibatch_size(n))
+        else:
             X, X_time, X_mask = build_CDR_impulse_data(
                 X_in,
                 first_obs,
@@ -8798,81 +9498,76 @@ class CDRModel(object):
                 impulse_names=self.impulse_names,
                 int_type=self.int_type,
                 float_type=self.float_type,
+                time_type=self.time_type
             )
 
-        with self.session.as_default():
-            with self.session.graph.as_default():
-                self.set_predict_mode(True)
+        try:
+            with self.session.as_default():
+                with self.session.graph.as_default():
+                    self.set_predict_mode(True)
 
-                if training is None:
-                    training = not self.predict_mode
+                    if training is None:
+                        training = not self.predict_mode
 
-                B = self.eval_minibatch_size
-                n = sum([len(_Y) for _Y in Y])
-                n_minibatch = math.ceil(n / B)
-                loss = np.zeros((n,))
-                for i in range(0, n, B):
-                    if verbose:
-                        stderr('\rMinibatch %d/%d' % (i + 1, n_minibatch))
+                    B = self.get_eval_minibatch_size(n)
+                    batch_size = {'value': B}
+                    n_minibatch = math.ceil(n / B)
+                    loss = np.zeros((n,))
                     if optimize_memory:
-                        _Y = Y[i:i + B]
-                        _first_obs = [x[i:i + B] for x in first_obs]
-                        _last_obs = [x[i:i + B] for x in last_obs]
-                        _Y_time = Y_time[i:i + B]
-                        _Y_mask = Y_mask[i:i + B]
-                        _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
-                        _X_in_Y = None if X_in_Y is None else X_in_Y[i:i + B]
-
-                        _X, _X_time, _X_mask = build_CDR_impulse_data(
-                            X_in,
-                            _first_obs,
-                            _last_obs,
-                            X_in_Y_names=X_in_Y_names,
-                            X_in_Y=_X_in_Y,
-                            history_length=self.history_length,
-                            future_length=self.future_length,
-                            impulse_names=self.impulse_names,
-                            int_type=self.int_type,
-                            float_type=self.float_type,
-                        )
-                        _Y = None if Y is None else [_y[i:i + B] for _y in Y]
-                        _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
+                        impulse_batches = impulse_windows.iter_batches([slice(j, j + B) for j in range(0, n, B)])
+                    for i in range(0, n, B):
+                        if verbose:
+                            stderr('\rMinibatch %d/%d' % (i + 1, n_minibatch))
+                        if optimize_memory:
+                            _Y = Y[i:i + B]
+                            _Y_time = Y_time[i:i + B]
+                            _Y_mask = Y_mask[i:i + B]
+                            _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
 
-                        fd = {
-                            'X': _X,
-                            'X_time': _X_time,
-                            'X_mask': _X_mask,
-                            'Y': _Y,
-                            'Y_time': _Y_time,
-                            'Y_mask': _Y_mask,
-                            'Y_gf': _Y_gf,
-                            'training': not self.predict_mode
-                        }
-                    else:
-                        fd = {
-                            'X': X[i:i + B],
-                            'X_time': X_time[i:i + B],
-                            'X_mask': X_mask[i:i + B],
-                            'Y_time': Y_time[i:i + B],
-                            'Y_mask': Y_mask[i:i + B],
-                            'Y_gf': None if Y_gf is None else Y_gf[i:i + B],
-                            'Y': Y[i:i + B],
-                            'training': training
-                        }
-                    loss[i:i + B] = self.run_loss_op(
-                        fd,
-                        n_samples=n_samples,
-                        algorithm=algorithm,
-                        verbose=verbose
-                    )
-                loss = loss.mean()
+                            _X, _X_time, _X_mask = next(impulse_batches)
+                            _Y = None if Y is None else [_y[i:i + B] for _y in Y]
+                            _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
 
-                if verbose:
-                    stderr('\n\n')
+                            fd = {
+                                'X': _X,
+                                'X_time': _X_time,
+                                'X_mask': _X_mask,
+                                'Y': _Y,
+                                'Y_time': _Y_time,
+                                'Y_mask': _Y_mask,
+                                'Y_gf': _Y_gf,
+                                'training': not self.predict_mode
+                            }
+                        else:
+                            fd = {
+                                'X': X[i:i + B],
+                                'X_time': X_time[i:i + B],
+                                'X_mask': X_mask[i:i + B],
+                                'Y_time': Y_time[i:i + B],
+                                'Y_mask': Y_mask[i:i + B],
+                                'Y_gf': None if Y_gf is None else Y_gf[i:i + B],
+                                'Y': Y[i:i + B],
+                                'training': training
+                            }
+                        loss[i:i + B] = self.run_eval_op(
+                            self.run_loss_op,
+                            fd,
+                            batch_size,
+                            n_samples=n_samples,
+                            algorithm=algorithm,
+                            verbose=verbose
+                        )
+                    loss = loss.mean()
 
-                self.set_predict_mode(False)
+                    if verbose:
+                        stderr('\n\n')
 
-                return loss
+                    self.set_predict_mode(False)
+
+                    return loss
+        finally:
+            if optimize_memory:
+                impulse_windows.close()
 
     def evaluate(
             self,
@@ -8888,6 +9583,7 @@ class CDRModel(object):
             dump=False,
             extra_cols=False,
             partition=None,
+            cache_data=False,
             optimize_memory=False,
             verbose=True
     ):
@@ -8920,7 +9616,8 @@ class CDRModel(object):
         :param dump: ``bool``; whether to save generated data and evaluations to disk.
         :param extra_cols: ``bool``; whether to include columns from **Y** in output tables. Ignored unless **dump** is ``True``.
         :param partition: ``str`` or ``None``; name of data partition (or ``None`` if no partition name), used for output file naming. Ignored unless **dump** is ``True``.
-        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).
+        :param cache_data: ``bool``; whether to memoize the model-ready arrays built from **X** and **Y** for reuse by later calls on the same tables (see ``get_eval_data``).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.
         :param verbose: ``bool``; Report progress and metrics to standard error.
         :return: pair of <``dict``, ``str``>; Dictionary of evaluation metrics, human-readable evaluation summary string.
         """
@@ -8949,6 +9646,7 @@ class CDRModel(object):
             sum_outputs_along_T=sum_outputs_along_T,
             sum_outputs_along_K=sum_outputs_along_K,
             dump=False,
+            cache_data=cache_data,
             optimize_memory=optimize_memory,
             verbose=verbose
         )
@@ -9174,6 +9872,8 @@ class CDRModel(object):
             summary_header += '  ' + self.form_str + '\n\n'
             summary_header += 'Partition: %s\n' % partition
             summary_header += 'Training iterations completed: %d\n\n' % self.global_step.eval(session=self.session)
+            if self.eval_minibatch_size == 'auto':
+                summary_header += 'Evaluation minibatch size: %d (auto)\n\n' % self.last_eval_minibatch_size
             summary_header += 'Full log likelihood: %s\n\n' % np.squeeze(metrics['full_log_lik'])
 
             summary += summary_header
@@ -9219,6 +9919,95 @@ class CDRModel(object):
 
         return metrics, summary
 
+    def evaluate_metrics(
+            self,
+            X,
+            Y,
+            X_in_Y_names=None,
+            n_samples=None,
+            algorithm='MAP',
+            loglik_scale=None,
+            cache_data=False,
+            optimize_memory=False,
+            verbose=False
+    ):
+        """
+        Lightweight alternative to ``evaluate`` for use inside the training loop.
+        Computes only the full log likelihood and the per-response metrics tracked on dev data during training (log likelihood, plus MSE, correlation, and percent variance explained for real-valued responses, or F1 and accuracy for discrete responses), without building summaries, running KS tests, or writing anything to disk.
+
+        :param X: list of ``pandas`` tables; matrices of independent variables, grouped by series and temporally sorted (see ``evaluate``).
+        :param Y: ``list`` of ``pandas`` tables; matrices of dependent variables, grouped by series and temporally sorted (see ``evaluate``).
+        :param X_in_Y_names: ``list`` of ``str``; names of predictors contained in **Y** rather than **X** (must be present in all elements of **Y**). If ``None``, no such predictors.
+        :param n_samples: ``int`` or ``None``; number of posterior samples to draw if Bayesian, ignored otherwise. If ``None``, use model defaults.
+        :param algorithm: ``str``; algorithm to use for extracting predictions, one of [``MAP``, ``sampling``].
+        :param loglik_scale: ``dict`` or ``None``; map from response file index to a factor by which to rescale summed log likelihoods (e.g. to extrapolate from a subsample to the full data). If ``None``, no rescaling.
+        :param cache_data: ``bool``; whether to memoize the model-ready arrays built from **X** and **Y** for reuse by later calls on the same tables (see ``get_eval_data``).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing.
+        :param verbose: ``bool``; Report progress to standard error.
+        :return: ``dict``; evaluation metrics with the same key structure as the metrics returned by ``evaluate``. Metrics that are unavailable are ``NaN``.
+        """
+
+        return_preds = True
+        for response in self.response_names:
+            if self.get_response_dist_name(response) in ('sinharcsinh', 'johnsonsu'):
+                return_preds = False  # These distributions must bootstrap the mode, which is slow
+
+        cdr_out = self.predict(
+            X,
+            Y=Y,
+            X_in_Y_names=X_in_Y_names,
+            n_samples=n_samples,
+            algorithm=algorithm,
+            return_preds=return_preds,
+            return_loglik=True,
+            cache_data=cache_data,
+            optimize_memory=optimize_memory,
+            verbose=verbose
+        )
+
+        metrics = {x: {} for x in ('mse', 'rho', 'percent_variance_explained', 'f1', 'acc', 'log_lik')}
+        metrics['full_log_lik'] = 0.
+
+        for _response in self.response_names:
+            for x in metrics:
+                if x != 'full_log_lik':
+                    metrics[x][_response] = {}
+            for ix in self.response_to_df_ix[_response]:
+                for x in metrics:
+                    if x != 'full_log_lik':
+                        metrics[x][_response][ix] = np.nan
+                _Y = Y[ix]
+                if _response not in _Y:
+                    continue
+                _y = _Y[_response]
+                dtype = _y.dtype
+                if dtype.name not in ('object', 'category') and np.issubdtype(dtype, np.number):
+                    sel = np.isfinite(_y).values
+                else:
+                    sel = np.ones(len(_y), dtype=bool)
+                _y = _y.values[sel]
+
+                _ll = np.reshape(cdr_out['log_lik'][_response][ix], (-1,))[sel].sum()
+                if loglik_scale is not None:
+                    _ll *= loglik_scale[ix]
+                metrics['log_lik'][_response][ix] = _ll
+                metrics['full_log_lik'] += _ll
+
+                if return_preds:
+                    _preds = np.reshape(cdr_out['preds'][_response][ix], (-1,))[sel]
+                    if self.is_binary(_response):
+                        metrics['f1'][_response][ix] = f1_score(_y, _preds, average='binary')
+                        metrics['acc'][_response][ix] = accuracy_score(_y, _preds)
+                    elif self.is_categorical(_response):
+                        metrics['f1'][_response][ix] = f1_score(_y, _preds, average='macro')
+                        metrics['acc'][_response][ix] = accuracy_score(_y, _preds)
+                    else:
+                        metrics['mse'][_response][ix] = mse(_y, _preds)
+                        metrics['rho'][_response][ix] = np.corrcoef(_y, _preds, rowvar=False)[0, 1]
+                        metrics['percent_variance_explained'][_response][ix] = percent_variance_explained(_y, _preds)
+
+        return metrics
+
     def convolve_inputs(
             self,
             X,
@@ -9277,7 +10066,7 @@ class CDRModel(object):
         :param extra_cols: ``bool``; whether to include columns from **Y** in output tables.
         :param dump; ``bool``; whether to save generated log likelihood vectors to disk.
         :param partition: ``str`` or ``None``; name of data partition (or ``None`` if no partition name), used for output file naming. Ignored unless **dump** is ``True``.
-        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly rather than pre-computing. Can reduce memory consumption by orders of magnitude but adds computational overhead at each minibatch, slowing training (typically around 1.5-2x the unoptimized training time).
+        :param optimize_memory: ``bool``; Compute expanded impulse arrays on the fly for each minibatch from a windowed view of the impulse data rather than pre-computing. Can reduce memory consumption by orders of magnitude at the cost of a small amount of computational overhead at each minibatch.
         :param verbose: ``bool``; Report progress and metrics to standard error.
         :return: ``numpy`` array of shape [len(X)], log likelihood of each data point.
         """
@@ -9342,9 +10131,26 @@ class CDRModel(object):
             Y_category_map=self.response_category_to_ix,
             response_to_df_ix=self.response_to_df_ix,
             gf_names=self.rangf,
-            gf_map=self.rangf_map
+            gf_map=self.rangf_lookup
         )
 
+        if optimize_memory:
+            impulse_windows = ImpulseWindows(
+                X_in,
+                first_obs,
+                last_obs,
+                X_in_Y_names=X_in_Y_names,
+                X_in_Y=X_in_Y,
+                history_length=self.history_length,
+                future_length=self.future_length,
+                impulse_names=self.impulse_names,
+                int_type=self.int_type,
+                float_type=self.float_type,
+                time_type=self.time_type
+            )
+            if self.n_expansion_workers > 1:
+                impulse_windows = impulse_windows.parallelize(self.n_expansion_workers, batch_size=self.get_eval_minibatch_size(n))
+
         if not optimize_memory or not np.isfinite(self.minibatch_size):
             X, X_time, X_mask = build_CDR_impulse_data(
                 X_in,
@@ -9357,128 +10163,124 @@ class CDRModel(object):
                 impulse_names=self.impulse_names,
                 int_type=self.int_type,
                 float_type=self.float_type,
+                time_type=self.time_type
             )
 
-        with self.session.as_default():
-            with self.session.graph.as_default():
-                self.set_predict_mode(True)
-                B = self.eval_minibatch_size
-                n_eval_minibatch = math.ceil(n / B)
-                X_conv = {}
-                for _response in responses:
-                    X_conv[_response] = {}
-                    for _response_param in response_params:
-                        dim_names = self.expand_param_name(_response, _response_param)
-                        for _dim_name in dim_names:
-                            X_conv[_response][_dim_name] = np.zeros(
-                                (n, len(self.terminal_names))
-                            )
-                for i in range(0, n, B):
-                    if verbose:
-                        stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
+        try:
+            with self.session.as_default():
+                with self.session.graph.as_default():
+                    self.set_predict_mode(True)
+                    B = self.get_eval_minibatch_size(n)
+                    batch_size = {'value': B}
+                    n_eval_minibatch = math.ceil(n / B)
+                    X_conv = {}
+                    for _response in responses:
+                        X_conv[_response] = {}
+                        for _response_param in response_params:
+                            dim_names = self.expand_param_name(_response, _response_param)
+                            for _dim_name in dim_names:
+                                X_conv[_response][_dim_name] = np.zeros(
+                                    (n, len(self.terminal_names))
+                                )
                     if optimize_memory:
-                        _Y = None if Y is None else Y[i:i + B]
-                        _first_obs = [x[i:i + B] for x in first_obs]
-                        _last_obs = [x[i:i + B] for x in last_obs]
-                        _Y_time = Y_time[i:i + B]
-                        _Y_mask = Y_mask[i:i + B]
-                        _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
-                        _X_in_Y = None if X_in_Y is None else X_in_Y[i:i + B]
-
-                        _X, _X_time, _X_mask = build_CDR_impulse_data(
-                            X_in,
-                            _first_obs,
-                            _last_obs,
-                            X_in_Y_names=X_in_Y_names,
-                            X_in_Y=_X_in_Y,
-                            history_length=self.history_length,
-                            future_length=self.future_length,
-                            impulse_names=self.impulse_names,
-                            int_type=self.int_type,
-                            float_type=self.float_type,
+                        impulse_batches = impulse_windows.iter_batches([slice(j, j + B) for j in range(0, n, B)])
+                    for i in range(0, n, B):
+                        if verbose:
+                            stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
+                        if optimize_memory:
+                            _Y = None if Y is None else Y[i:i + B]
+                            _Y_time = Y_time[i:i + B]
+                            _Y_mask = Y_mask[i:i + B]
+                            _Y_gf = None if Y_gf is None else Y_gf[i:i + B]
+
+                            _X, _X_time, _X_mask = next(impulse_batches)
+                            fd = {
+                                'X': _X,
+                                'X_time': _X_time,
+                                'X_mask': _X_mask,
+                                'Y_time': _Y_time,
+                                'Y_mask': _Y_mask,
+                                'Y_gf': _Y_gf,
+                                'training': not self.predict_mode
+                            }
+                        else:
+                            fd = {
+                                'X': X[i:i + B],
+                                'X_time': X_time[i:i + B],
+                                'X_mask': X_mask[i:i + B],
+                                'Y_time': Y_time[i:i + B],
+                                'Y_mask': Y_mask[i:i + B],
+                                'Y_gf': None if Y_gf is None else Y_gf[i:i + B],
+                                'training': not self.predict_mode
+                            }
+                        if verbose:
+                            stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
+                        _X_conv = self.run_eval_op(
+                            self.run_conv_op,
+                            fd,
+                            batch_size,
+                            responses=responses,
+                            response_param=response_params,
+                            n_samples=n_samples,
+                            algorithm=algorithm,
+                            verbose=verbose
                         )
-                        fd = {
-                            self.X: _X,
-                            self.X_time: _X_time,
-                            self.X_mask: _X_mask,
-                            self.Y_time: _Y_time,
-                            self.Y_mask: _Y_mask,
-                            self.Y_gf: _Y_gf,
-                            self.training: not self.predict_mode
-                        }
-                    else:
-                        fd = {
-                            self.X: X[i:i + B],
-                            self.X_time: X_time[i:i + B],
-                            self.X_mask: X_mask[i:i + B],
-                            self.Y_time: Y_time[i:i + B],
-                            self.Y_mask: Y_mask[i:i + B],
-                            self.Y_gf: None if Y_gf is None else Y_gf[i:i + B],
-                            self.training: not self.predict_mode
-                        }
-                    if verbose:
-                        stderr('\rMinibatch %d/%d' % ((i / B) + 1, n_eval_minibatch))
-                    _X_conv = self.run_conv_op(
-                        fd,
-                        responses=responses,
-                        response_param=response_params,
-                        n_samples=n_samples,
-                        algorithm=algorithm,
-                        verbose=verbose
-                    )
-                    for _response in _X_conv:
-                        for _dim_name in _X_conv[_response]:
-                            _X_conv_batch = _X_conv[_response][_dim_name]
-                            X_conv[_response][_dim_name][i:i + B] = _X_conv_batch
+                        for _response in _X_conv:
+                            for _dim_name in _X_conv[_response]:
+                                _X_conv_batch = _X_conv[_response][_dim_name]
+                                X_conv[_response][_dim_name][i:i + B] = _X_conv_batch
 
-                # Split into per-file predictions.
-                # Exclude the length of last file because it will be inferred.
-                X_conv = split_cdr_outputs(X_conv, [x for x in lengths[:-1]])
+                    # Split into per-file predictions.
+                    # Exclude the length of last file because it will be inferred.
+                    X_conv = split_cdr_outputs(X_conv, [x for x in lengths[:-1]])
 
-                if verbose:
-                    stderr('\n\n')
+                    if verbose:
+                        stderr('\n\n')
 
-                self.set_predict_mode(False)
+                    self.set_predict_mode(False)
 
-                out = {}
-                names = []
-                for x in self.terminal_names:
-                    if self.node_table[x].p.irfID is None:
-                        names.append(sn(''.join(x.split('-')[:-1])))
-                    else:
-                        names.append(sn(x))
-                for _response in responses:
-                    out[_response] = {}
-                    file_ix = self.response_to_df_ix[_response]
-                    multiple_files = len(file_ix) > 1
-                    for ix in file_ix:
-                        for dim_name in X_conv[_response]:
-                            if dim_name not in out[_response]:
-                                out[_response][dim_name] = []
-
-                            df = pd.DataFrame(X_conv[_response][dim_name][ix], columns=names, dtype=self.FLOAT_NP)
-                            if extra_cols:
-                                if Y is None:
-                                    df_extra = {x: Y_gf_in[i] for i, x in enumerate(self.rangf)}
-                                    df_extra['time'] = Y_time_in[ix]
-                                    df_extra = pd.DataFrame(df_extra)
-                                else:
-                                    new_cols = []
-                                    for c in Y[ix].columns:
-                                        if c not in df:
-                                            new_cols.append(c)
-                                    df_extra = Y[ix][new_cols].reset_index(drop=True)
-                                df = pd.concat([df, df_extra], axis=1)
-                            out[_response][dim_name].append(df)
+                    out = {}
+                    names = []
+                    for x in self.terminal_names:
+                        if self.node_table[x].p.irfID is None:
+                            names.append(sn(''.join(x.split('-')[:-1])))
+                        else:
+                            names.append(sn(x))
+                    for _response in responses:
+                        out[_response] = {}
+                        file_ix = self.response_to_df_ix[_response]
+                        multiple_files = len(file_ix) > 1
+                        for ix in file_ix:
+                            for dim_name in X_conv[_response]:
+                                if dim_name not in out[_response]:
+                                    out[_response][dim_name] = []
 
-                        if dump:
-                            if multiple_files:
-                                name_base = '%s_%s_f%s%s' % (sn(_response), sn(dim_name), ix, partition_str)
-                            else:
-                                name_base = '%s_%s%s' % (sn(_response), sn(dim_name), partition_str)
-                            df.to_csv(self.outdir + '/X_conv_%s.csv' % name_base, sep=' ', na_rep='NaN', index=False)
+                                df = pd.DataFrame(X_conv[_response][dim_name][ix], columns=names, dtype=self.FLOAT_NP)
+                                if extra_cols:
+                                    if Y is None:
+                                        df_extra = {x: Y_gf_in[i] for i, x in enumerate(self.rangf)}
+                                        df_extra['time'] = Y_time_in[ix]
+                                        df_extra = pd.DataFrame(df_extra)
+                                    else:
+                                        new_cols = []
+                                        for c in Y[ix].columns:
+                                            if c not in df:
+                                                new_cols.append(c)
+                                        df_extra = Y[ix][new_cols].reset_index(drop=True)
+                                    df = pd.concat([df, df_extra], axis=1)
+                                out[_response][dim_name].append(df)
+
+                            if dump:
+                                if multiple_files:
+                                    name_base = '%s_%s_f%s%s' % (sn(_response), sn(dim_name), ix, partition_str)
+                                else:
+                                    name_base = '%s_%s%s' % (sn(_response), sn(dim_name), partition_str)
+                                df.to_csv(self.outdir + '/X_conv_%s.csv' % name_base, sep=' ', na_rep='NaN', index=False)
 
-                return out
+                    return out
+        finally:
+            if optimize_memory:
+                impulse_windows.close()
 
     def error_theoretical_quantiles(
             self,
@@ -10020,7 +10822,7 @@ class CDRModel(object):
             for response in responses:
                 to_run[response] = {}
                 for response_param in response_params:
-                    _b = (self.history_length + self.future_length) * self.eval_minibatch_size
+                    _b = (self.history_length + self.future_length) * self.get_eval_minibatch_size()
                     if b is None:
                         b = _b
                     if response_param == 'mean' and not self.has_analytical_mean[response]:
@@ -11256,11 +12058,12 @@ class CDREnsemble(CDRModel):
     _doc_args = """
         :param outdir_top: ``str``; path to the config file's top-level output directory (i.e. the ``outdir`` argument of the config)
         :param name: ``str``; name of the ensemble as defined in the config file
+        :param predict_only: ``bool``; whether the ensemble will only be used for inference, in which case its models are loaded from their exported graph definitions where available (see ``load_cdr()``).
     \n"""
 
     __doc__ = _doc_header + _doc_args
 
-    def __init__(self, outdir_top, name):
+    def __init__(self, outdir_top, name, predict_only=False):
 
         self.weight_type = 'uniform'
         self.outdir_top = os.path.normpath(outdir_top)
@@ -11273,7 +12076,7 @@ class CDREnsemble(CDRModel):
         self.models = []
         for i, mpath in enumerate(mpaths):
             stderr('Loading model %s...\n' % mpath)
-            self.models.append(load_cdr(mpath))
+            self.models.append(load_cdr(mpath, predict_only=predict_only))
 
         assert self.models, 'An ensemble must contain at least one model. Exiting...'
         # self.__setstate__(self.models[0].__getstate__())
@@ -11340,7 +12143,7 @@ class CDREnsemble(CDRModel):
         self.model_index = self.sample_model_index()
 
         if self.resample_ops:
-            self.session.run(self.resample_ops)
+            self.get_session_callable(('resample',), self.resample_ops)()
 
     def load(self, *args, **kwargs):
         for model in self.models:
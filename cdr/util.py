@@ -4,6 +4,8 @@ import os
 import re
 import math
 import pickle
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from scipy import linalg, special
@@ -241,6 +243,141 @@ def get_random_permutation(n):
     return p, p_inv
 
 
+def prefetch_batches(make_batch, batch_args, depth=2, n_workers=1):
+    """
+    Generate batches in order, preparing up to **depth** batches ahead of time in background threads.
+    Lets host-side batch construction (shuffling, gathering, expanding impulse windows) overlap with
+    computation on the current batch.
+
+    :param make_batch: callable; function mapping an element of **batch_args** to a batch.
+    :param batch_args: iterable; arguments for each batch, in order.
+    :param depth: ``int``; maximum number of batches to prepare ahead of the consumer. If ``0``, batches are prepared synchronously.
+    :param n_workers: ``int``; number of background threads.
+    :return: generator of batches
+    """
+
+    if depth < 1:
+        for arg in batch_args:
+            yield make_batch(arg)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, n_workers))
+    pending = collections.deque()
+    try:
+        for arg in batch_args:
+            pending.append(executor.submit(make_batch, arg))
+            if len(pending) > depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def get_available_memory():
+    """
+    Get the amount of physical memory currently available to the system.
+
+    :return: ``int`` or ``None``; available memory in bytes, or ``None`` if it cannot be determined on this platform.
+    """
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class RunningMoments(object):
+    """
+    Online (Welford) accumulator for the elementwise mean and variance of a sequence of equally-shaped arrays.
+    Memory usage is constant in the number of arrays accumulated.
+
+    :param var: ``bool``; whether to track the variance in addition to the mean.
+    """
+
+    def __init__(self, var=True):
+        self.track_var = var
+        self.n = 0
+        self._mean = None
+        self._m2 = None
+
+    def update(self, x):
+        """
+        Accumulate an array.
+
+        :param x: ``numpy`` array; new value.
+        :return: ``None``
+        """
+
+        x = np.asarray(x, dtype=float)
+        self.n += 1
+        if self._mean is None:
+            self._mean = x.copy()
+            if self.track_var:
+                self._m2 = np.zeros_like(self._mean)
+        else:
+            delta = x - self._mean
+            self._mean += delta / self.n
+            if self.track_var:
+                self._m2 += delta * (x - self._mean)
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def var(self):
+        assert self.track_var, 'Variance was not tracked by this accumulator.'
+        if self._m2 is None:
+            return None
+        return self._m2 / self.n
+
+    @property
+    def sd(self):
+        var = self.var
+        if var is None:
+            return None
+        return np.sqrt(var)
+
+
+class RunningModeCounts(object):
+    """
+    Online accumulator for the elementwise mode (majority vote) of a sequence of equally-shaped integer arrays.
+    Memory usage is proportional to the number of distinct values seen, not to the number of arrays accumulated.
+    Ties are broken in favor of the smallest value.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.counts = None
+
+    def update(self, x):
+        """
+        Accumulate an array of non-negative integer labels.
+
+        :param x: ``numpy`` array; new value.
+        :return: ``None``
+        """
+
+        x = np.asarray(x).astype(int)
+        k = x.max() + 1 if x.size else 1
+        if self.counts is None:
+            self.counts = np.zeros(x.shape + (k,), dtype=int)
+        elif self.counts.shape[-1] < k:
+            pad = [(0, 0)] * x.ndim + [(0, k - self.counts.shape[-1])]
+            self.counts = np.pad(self.counts, pad)
+        np.put_along_axis(self.counts, x[..., None], np.take_along_axis(self.counts, x[..., None], -1) + 1, -1)
+        self.n += 1
+
+    @property
+    def mode(self):
+        if self.counts is None:
+            return None
+        return self.counts.argmax(axis=-1)
+
+
 def sn(string):
     """
     Compute a valid scope name version of a string.
@@ -463,7 +600,7 @@ def get_numerical_sd(sd, in_dim=1, out_dim=1):
     return out
 
 
-def load_cdr(dir_path, suffix=''):
+def load_cdr(dir_path, suffix='', predict_only=False):
     """
     Convenience method for reconstructing a saved CDR object. First loads in metadata from ``m.obj``, then uses
     that metadata to construct the computation graph. Then, if saved weights are found, these are loaded into the
@@ -471,12 +608,14 @@ def load_cdr(dir_path, suffix=''):
 
     :param dir_path: Path to directory containing the CDR checkpoint files.
     :param suffix: ``str``; file suffix.
+    :param predict_only: ``bool``; whether the model will only be used for inference. If ``True``, the computation graph is imported from the graph definition exported with the checkpoint (see ``CDRModel.rehydrate()``) if available, which is much faster than constructing it.
     :return: The loaded CDR instance.
     """
 
     with open(dir_path + '/m%s.obj' % suffix, 'rb') as f:
         m = pickle.load(f)
-    m.build(outdir=dir_path, verbose=False)
+    if not (predict_only and m.rehydrate(outdir=dir_path, suffix=suffix)):
+        m.build(outdir=dir_path, verbose=False)
     m.load(outdir=dir_path, suffix=suffix)
     return m
 